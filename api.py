@@ -0,0 +1,240 @@
+"""JSON API to the calculator that bypasses the Dash callbacks.
+
+All endpoints accept a JSON body via POST and return numeric results:
+    /luci/api/v1/calculate   {"setups":[{...}, ...], "visibility":false}
+    /luci/api/v1/resolve     {"names":["3C196", "P214+40"]}
+    /luci/api/v1/visibility  {"targets":[{"name":..., "coord":...}], "date":...,
+                              "n_int":0}
+    /luci/api/v1/distances   {"targets":[{"name":..., "coord":...}], "date":...}
+    /luci/api/v1/pdf         {"setups":[{...}, ...]},
+                             then GET /luci/api/v1/pdf/<job>
+    /luci/api/v1/lotss       {"coord":"10h00m00s +40d00m00s", "radius":3} or
+                             {"coord":..., "n":5}
+Setups use the same fields as batch.py. A single setup or target can also be
+passed directly instead of a list. A request can contain at most
+MAX_REQUEST_ITEMS setups, targets, or names, and at most MAX_VISIBILITY_SETUPS
+setups if visibility is requested. Larger requests are rejected with HTTP 413.
+"""
+
+import math
+from datetime import date
+import flask
+import batch
+import pdfjobs as pj
+import lotss
+import resolver
+import skycoords as sc
+import stations as st
+import targetvis as tv
+
+api = flask.Blueprint('api', __name__, url_prefix='/luci/api/v1')
+
+# Maximum size of a request body in bytes
+MAX_REQUEST_BYTES = 1024*1024
+
+# Maximum number of setups, targets, or names in a request. The results are
+# computed in the request thread, so the work per request must stay bounded.
+MAX_REQUEST_ITEMS = 100
+
+# Maximum number of setups in a /calculate request with visibility
+MAX_VISIBILITY_SETUPS = 10
+
+class APIError(Exception):
+    """Raised when a request cannot be processed. Reported as HTTP 400."""
+    status = 400
+
+class PayloadTooLargeError(APIError):
+    """Raised when a request is too large. Reported as HTTP 413."""
+    status = 413
+
+@api.errorhandler(APIError)
+def handle_api_error(err):
+    """Report an invalid request as a JSON error message"""
+    return flask.jsonify({'error':str(err)}), err.status
+
+@api.before_request
+def check_request_size():
+    """Reject request bodies larger than MAX_REQUEST_BYTES before they are
+       read"""
+    length = flask.request.content_length
+    if length is not None and length > MAX_REQUEST_BYTES:
+        raise PayloadTooLargeError('Request body cannot be larger than ' + \
+                                   '{} bytes'.format(MAX_REQUEST_BYTES))
+    if length is None and flask.request.method == 'POST':
+        return flask.jsonify({'error':'Content-Length is required'}), 411
+    return None
+
+def clean_json(value):
+    """Recursively replace NaN and infinite floats with None so that the
+       value can be serialized to valid JSON"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key:clean_json(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [clean_json(val) for val in value]
+    return value
+
+def get_request_list(key):
+    """Return the JSON body of the request and the list stored under key in
+       it. A single item is wrapped in a list."""
+    body = flask.request.get_json(silent=True)
+    if not isinstance(body, dict) or key not in body:
+        raise APIError('Request body must be a JSON object with a ' + \
+                       '"{}" key'.format(key))
+    items = body[key]
+    if isinstance(items, (dict, str)):
+        items = [items]
+    if not isinstance(items, list):
+        raise APIError('"{}" must be a list'.format(key))
+    if len(items) > MAX_REQUEST_ITEMS:
+        raise PayloadTooLargeError('"{}" cannot have more than '.format(key) + \
+                                   '{} items'.format(MAX_REQUEST_ITEMS))
+    return body, items
+
+def get_setups():
+    """Return the body and the setups of a request. Every setup must be a
+       JSON object."""
+    body, setups = get_request_list('setups')
+    for idx, setup in enumerate(setups):
+        if not isinstance(setup, dict):
+            raise APIError('Setup {} must be a JSON object'.format(idx))
+    return body, setups
+
+def get_targets():
+    """Return the JSON body, and the target names, coordinates, and date of a
+       visibility or distance request"""
+    body, targets = get_request_list('targets')
+    names, coords = [], []
+    for idx, target in enumerate(targets):
+        if isinstance(target, str):
+            target = {'coord':target}
+        try:
+            sc.parse_coord(target['coord'])
+        except Exception:
+            raise APIError('Invalid coordinate for target {}'.format(idx))
+        coords.append(target['coord'])
+        names.append(str(target.get('name', 'Target {}'.format(idx+1))))
+    obs_date = body.get('date', date.today().isoformat())
+    return body, names, coords, obs_date
+
+@api.route('/calculate', methods=['POST'])
+def calculate():
+    """Evaluate a batch of setups. Returns one result per setup in the same
+       format as batch.py."""
+    body, setups = get_setups()
+    visibility = bool(body.get('visibility', False))
+    if visibility and len(setups) > MAX_VISIBILITY_SETUPS:
+        raise PayloadTooLargeError('Visibility can be computed for at most ' + \
+                                   '{} setups '.format(MAX_VISIBILITY_SETUPS) + \
+                                   'per request')
+    results = list(batch.run_batch(setups, visibility=visibility))
+    return flask.jsonify(clean_json({'results':results}))
+
+@api.route('/resolve', methods=['POST'])
+def resolve():
+    """Resolve a batch of source names. The names are resolved concurrently
+       and independently, so that one unknown or slow name does not affect
+       the others. Each result has its own error message."""
+    _, names = get_request_list('names')
+    if not all(isinstance(name, str) for name in names):
+        raise APIError('Source names must be strings')
+    results = []
+    for result in resolver.resolve_names(names):
+        if result['coord'] is None:
+            results.append({'name':result['name'], 'coord':None, 'ra':None,
+                            'dec':None, 'error':result['error']})
+        else:
+            ra, dec = sc.parse_coord(result['coord'])
+            results.append({'name':result['name'], 'coord':result['coord'],
+                            'ra':ra, 'dec':dec, 'error':None})
+    return flask.jsonify({'results':results})
+
+@api.route('/visibility', methods=['POST'])
+def visibility():
+    """Return the elevation in degrees of each target and of the bright solar
+       system objects on the requested date. Elevations below the horizon are
+       returned as null. Also return the rise, transit, and set times of each
+       target with respect to the optional elevation_limit (default 0 deg).
+       The elevation is the lowest over the stations given by the optional
+       n_core, n_remote (default: all), and n_int (default 0)."""
+    body, names, coords, obs_date = get_targets()
+    try:
+        n_int = int(body.get('n_int', 0))
+        stations = st.select_stations(body.get('n_core', len(st.CORE_STATIONS)),
+                                      body.get('n_remote', len(st.REMOTE_STATIONS)),
+                                      n_int)
+        elevation_limit = float(body.get('elevation_limit', 0.))
+        traces = tv.find_target_elevation(','.join(names), coords, obs_date, n_int,
+                                          stations)
+        target_events = tv.get_target_events(','.join(names), coords, obs_date,
+                                             n_int, elevation_limit, stations)
+    except (TypeError, ValueError):
+        raise APIError('Invalid date, number of stations, or elevation limit')
+    times = [time.isoformat() for time in traces[0]['x']]
+    elevation = [{'name':trace['name'], 'elevation':list(trace['y'])} \
+                 for trace in traces]
+    for item in target_events:
+        for event in ['rise', 'transit', 'set']:
+            if item[event] is not None:
+                item[event] = item[event].isoformat()
+    return flask.jsonify(clean_json({'date':obs_date, 'times':times,
+                                     'results':elevation, 'events':target_events}))
+
+@api.route('/distances', methods=['POST'])
+def distances():
+    """Return the angular distance in degrees between each target and the
+       A-team sources, Sun, Moon (min, max), and Jupiter on the requested date"""
+    _, names, coords, obs_date = get_targets()
+    try:
+        dists = tv.compute_target_distances(coords, obs_date)
+    except ValueError:
+        raise APIError('Invalid date')
+    results = [dict(name=name, **dist) for name, dist in zip(names, dists)]
+    return flask.jsonify(clean_json({'date':obs_date, 'results':results}))
+
+@api.route('/pdf', methods=['POST'])
+def pdf():
+    """Queue the generation of a summary pdf file for each setup in a batch
+       (see pdfjobs.py). Returns the id of each job, or the validation
+       message for invalid setups. Poll /pdf/<job> for the link to the file."""
+    _, setups = get_setups()
+    results = []
+    for setup in setups:
+        parsed, msg = batch.parse_setup_fields(setup)
+        if parsed is None:
+            results.append({'id':setup.get('id'), 'job':None, 'msg':msg})
+            continue
+        job_id = pj.PDF_JOBS.submit(parsed, make=pj.make_setup_pdf)
+        results.append({'id':setup.get('id'), 'job':job_id, 'msg':''})
+    return flask.jsonify({'results':results})
+
+@api.route('/pdf/<job_id>', methods=['GET'])
+def pdf_job(job_id):
+    """Return the status of a pdf job (pending, done, or failed) and the link
+       to the pdf file once it is done"""
+    job = pj.PDF_JOBS.get(job_id)
+    if job is None:
+        return flask.jsonify({'error':'Unknown job'}), 404
+    link = None if job['path'] is None else '/luci/{}'.format(job['path'])
+    return flask.jsonify({'job':job_id, 'status':job['status'], 'pdf':link,
+                          'error':job['error']})
+
+@api.route('/lotss', methods=['POST'])
+def lotss_pointings():
+    """Return the LoTSS pointings within radius degrees of a coordinate, or
+       the n nearest ones (default 5) if no radius is given, sorted by
+       distance in degrees"""
+    body = flask.request.get_json(silent=True)
+    if not isinstance(body, dict) or 'coord' not in body:
+        raise APIError('Request body must be a JSON object with a "coord" key')
+    try:
+        if body.get('radius') is not None:
+            results = lotss.find_pointings_within(body['coord'],
+                                                  float(body['radius']))
+        else:
+            n_nearest = int(body.get('n', lotss.DEFAULT_N_NEAREST))
+            results = lotss.find_nearest_pointings(body['coord'], n_nearest)
+    except (TypeError, ValueError):
+        raise APIError('Invalid coordinate, radius, or number of pointings')
+    return flask.jsonify({'results':results})
@@ -0,0 +1,209 @@
+"""Precomputed all-sky visibility atlas.
+
+The elevation of a fixed source only depends on its apparent declination, its
+hour angle, and the latitude of the site. The atlas tabulates the elevation
+(including refraction) on a dense (dec, hour angle, site) grid for every
+distinct site position, and a second table holds the sidereal time at 00:00
+UTC of every date. Elevation curves of any number of targets then become a
+table interpolation. Both tables are stored as .npy files and memory-mapped,
+so all worker processes share a single copy through the page cache.
+
+Refraction increases monotonically with altitude, so the lowest refracted
+elevation over several sites is the refracted lowest altitude, and the
+atlas can be combined over sites directly. Every extra site costs four table
+lookups per time step, however, while the direct computation in elevation.py
+only costs one cosine, so the atlas is only used for observations whose
+stations share a single position (see compute_elevation).
+
+Run this module to build the tables, e.g. when deploying a new release."""
+
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import elevation as el
+import events as ev
+import paths
+
+# Directory in which the atlas files are stored, in the data root (see
+# paths.py)
+ATLAS_DIR = paths.get_data_path('atlas')
+
+# Version of the file format. Bump this when the contents change so that old
+# files are ignored.
+ATLAS_VERSION = 1
+
+# Step of the declination and hour angle axes in degrees. Bilinear
+# interpolation on this grid agrees with compute_common_elevation to about
+# 0.003 degree below an elevation of 80 degrees. Close to the zenith, where the
+# elevation has a kink at transit, the difference grows to ~0.1 degree.
+ATLAS_STEP = 0.5
+
+# Dates covered by the sidereal time table. Other dates are computed directly.
+SIDEREAL_FIRST_DATE = datetime(2000, 1, 1)
+SIDEREAL_N_DAYS = 36525
+
+# Maximum number of distinct site positions for which compute_elevation uses
+# the atlas instead of the direct computation
+ATLAS_MAX_POSITIONS = 1
+
+def get_atlas_sites():
+    """Return the site names that make up the site axis of the atlas: one
+       for every distinct position in el.SITES"""
+    return el.get_unique_sites(list(el.SITES))
+
+def get_atlas_axes():
+    """Return the declination and hour angle axes of the atlas in degrees"""
+    n_dec = int(round(180./ATLAS_STEP)) + 1
+    n_ha = int(round(360./ATLAS_STEP)) + 1
+    return np.linspace(-90., 90., n_dec), np.linspace(0., 360., n_ha)
+
+def get_atlas_path(directory=ATLAS_DIR):
+    """Return the name of the atlas file. It contains a digest of the grid,
+       the site latitudes, and the refraction parameters, so a file built for
+       another station table is never used."""
+    _, lat = el.get_site_arrays(get_atlas_sites())
+    params = np.array([ATLAS_STEP, el.PRESSURE, el.TEMPERATURE])
+    digest = hashlib.sha1(params.tobytes() + lat.tobytes()).hexdigest()[:10]
+    return os.path.join(directory, 'elevation_atlas_v{}_{}.npy'.format(
+        ATLAS_VERSION, digest))
+
+def get_sidereal_path(directory=ATLAS_DIR):
+    """Return the name of the sidereal time table file"""
+    return os.path.join(directory, 'sidereal_v{}_{}_{}.npy'.format(
+        ATLAS_VERSION, SIDEREAL_FIRST_DATE.strftime('%Y-%m-%d'), SIDEREAL_N_DAYS))
+
+def build_atlas():
+    """Compute the atlas: the apparent elevation in degrees with shape (dec,
+       hour angle, site) as float32"""
+    dec_axis, ha_axis = get_atlas_axes()
+    dec = np.radians(dec_axis)[:, np.newaxis]
+    hour_angle = np.radians(ha_axis)[np.newaxis, :]
+    _, lat = el.get_site_arrays(get_atlas_sites())
+    atlas = np.zeros((len(dec_axis), len(ha_axis), len(lat)), dtype=np.float32)
+    for idx, this_lat in enumerate(lat):
+        sin_alt = np.sin(this_lat)*np.sin(dec) + \
+                  np.cos(this_lat)*np.cos(dec)*np.cos(hour_angle)
+        alt = np.degrees(np.arcsin(np.clip(sin_alt, -1., 1.)))
+        atlas[:, :, idx] = alt + el.get_refraction(alt)
+    return atlas
+
+def build_sidereal_table():
+    """Compute the Greenwich apparent sidereal time in radians at 00:00 UTC
+       of every date covered by the sidereal time table"""
+    first_jd = el.get_julian_dates([SIDEREAL_FIRST_DATE])[0]
+    return el.get_apparent_sidereal_time(first_jd + np.arange(SIDEREAL_N_DAYS))
+
+def save_array(path, array):
+    """Write an array to path. The file is written under a temporary name and
+       then renamed, so readers never see a partially written file."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.npy')
+    with os.fdopen(handle, 'wb') as temp_file:
+        np.save(temp_file, array)
+    # The tables are shared, so make them readable like any other file
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+def load_or_build(path, build):
+    """Memory-map the array in path, building and saving it with build first
+       if it does not exist. If the file cannot be written, the array is only
+       kept in memory."""
+    try:
+        return np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        pass
+    array = build()
+    try:
+        save_array(path, array)
+        return np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        array.flags.writeable = False
+        return array
+
+@lru_cache(maxsize=None)
+def get_atlas(directory=ATLAS_DIR):
+    """Return the read-only atlas, see build_atlas"""
+    return load_or_build(get_atlas_path(directory), build_atlas)
+
+@lru_cache(maxsize=None)
+def get_sidereal_table(directory=ATLAS_DIR):
+    """Return the read-only sidereal time table, see build_sidereal_table"""
+    return load_or_build(get_sidereal_path(directory), build_sidereal_table)
+
+@lru_cache(maxsize=None)
+def get_site_columns():
+    """Return a dict from site position to its column in the atlas"""
+    return {el.SITES[site][:2]:idx for idx, site in enumerate(get_atlas_sites())}
+
+def get_sidereal_times(jd):
+    """Return the Greenwich apparent sidereal time in radians for an array of
+       Julian dates, looked up in the sidereal time table. The change of the
+       nutation within a day is negligible (~0.02"), so the time of day is
+       added at the sidereal rate."""
+    jd = np.asarray(jd, dtype=np.float64)
+    first_jd = el.get_julian_dates([SIDEREAL_FIRST_DATE])[0]
+    day = np.floor(jd - first_jd).astype(int)
+    inside = (day >= 0) & (day < SIDEREAL_N_DAYS)
+    if not np.all(inside):
+        return el.get_apparent_sidereal_time(jd)
+    day_fraction = jd - first_jd - day
+    return np.mod(get_sidereal_table()[day] + ev.SIDEREAL_RATE*day_fraction,
+                  2.*np.pi)
+
+def compute_atlas_elevation(ra, dec, times, sites=None):
+    """Compute the elevation at which a set of J2000 coordinates is visible
+       from all sites by bilinear interpolation in the atlas. Same input and
+       output as el.compute_common_elevation."""
+    sites = el.DUTCH_SITES if sites is None else el.get_unique_sites(sites)
+    atlas = get_atlas()
+    n_dec, n_ha, n_sites = atlas.shape
+    site_columns = get_site_columns()
+    columns = np.array([site_columns[el.SITES[site][:2]] for site in sites])
+    jd = el.get_julian_dates(times)
+    date_ra, date_dec = el.precess_to_date(np.atleast_1d(ra), np.atleast_1d(dec),
+                                           jd[len(jd)//2])
+    gast = get_sidereal_times(jd)
+    lon, _ = el.get_site_arrays(sites)
+    # Fractional grid indices with shape (targets,) for the declination and
+    # (targets, sites, times) for the hour angle
+    dec_idx = np.clip((np.degrees(date_dec) + 90.)/ATLAS_STEP, 0., n_dec - 1.)
+    hour_angle = np.mod(gast[np.newaxis, np.newaxis, :] + \
+                        lon[np.newaxis, :, np.newaxis] - \
+                        date_ra[:, np.newaxis, np.newaxis], 2.*np.pi)
+    ha_idx = np.degrees(hour_angle)/ATLAS_STEP
+    dec_low = np.minimum(dec_idx.astype(int), n_dec - 2)
+    ha_low = np.minimum(ha_idx.astype(int), n_ha - 2)
+    dec_frac = (dec_idx - dec_low)[:, np.newaxis, np.newaxis]
+    ha_frac = ha_idx - ha_low
+    # Look up the four surrounding grid points in the flattened atlas
+    flat = atlas.reshape(-1)
+    base = (dec_low[:, np.newaxis, np.newaxis]*n_ha + ha_low)*n_sites + \
+           columns[np.newaxis, :, np.newaxis]
+    next_dec = n_ha*n_sites
+    elevation = (flat[base]*(1. - ha_frac) + \
+                 flat[base + n_sites]*ha_frac)*(1. - dec_frac) + \
+                (flat[base + next_dec]*(1. - ha_frac) + \
+                 flat[base + next_dec + n_sites]*ha_frac)*dec_frac
+    elevation = np.min(elevation, axis=1)
+    return np.where(elevation < 0, np.nan, elevation)
+
+def compute_elevation(ra, dec, times, sites=None):
+    """Compute the elevation at which a set of J2000 coordinates is visible
+       from all sites (see el.compute_common_elevation), using the atlas if
+       the sites have at most ATLAS_MAX_POSITIONS distinct positions and the
+       direct computation otherwise, whichever is faster"""
+    unique = el.DUTCH_SITES if sites is None else el.get_unique_sites(sites)
+    if len(unique) <= ATLAS_MAX_POSITIONS:
+        return compute_atlas_elevation(ra, dec, times, unique)
+    return el.compute_common_elevation(ra, dec, times, unique)
+
+if __name__ == '__main__':
+    for name, path in [('Atlas', get_atlas_path()),
+                       ('Sidereal time table', get_sidereal_path())]:
+        print('{}: {}'.format(name, path))
+    print('Shape of the atlas: {}'.format(get_atlas().shape))
+    print('Dates in the sidereal time table: {}'.format(len(get_sidereal_table())))
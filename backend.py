@@ -1,48 +1,66 @@
 """Functions to validate user-input"""
 
 import numpy as np
-from astropy.coordinates import SkyCoord
+import skycoords as sc
+
+# Hardcoded value for subband width in kHz
+SB_WIDTH = 195.3125
+
+# Hardcoded values for station SEFD in Jy
+CORE_SEFD = {'lba' : 38160, 'hba' : 2820}
+REMOTE_SEFD = {'lba' : 38160, 'hba' : 1410}
+INT_SEFD = {'lba' : 18840, 'hba' : 710}
+
+# Fields of a structured array accepted by calculate_im_noise_setups
+NOISE_SETUP_DTYPE = [('n_core', 'i4'), ('n_remote', 'i4'), ('n_int', 'i4'),
+                     ('hba_mode', 'U16'), ('obs_t', 'f8'), ('n_sb', 'i4')]
+
+def get_antenna_mode_masks(hba_mode):
+    """For a given antenna set name or array of names, return boolean arrays
+       flagging the HBA antenna sets and the tapered HBA dual inner set."""
+    hba_mode = np.asarray(hba_mode, dtype=str)
+    is_hba = np.char.find(hba_mode, 'hba') >= 0
+    is_inner = hba_mode == 'hbadualinner'
+    return is_hba, is_inner
 
 def compute_baselines(n_core, n_remote, n_int, hba_mode):
     """For a given number of core, remote, and international stations
        and the HBA mode, compute the number of baselines formed by
-       the array. The number of baselines includes autocorrelations."""
-    if 'hba' in hba_mode:
-        n_stations = (2*n_core)+n_remote+n_int
-    else:
-        n_stations = n_core+n_remote+n_int
-    return (n_stations*(n_stations+1))/2
+       the array. The number of baselines includes autocorrelations.
+       All inputs can also be NumPy arrays, in which case an array of
+       baseline counts is returned."""
+    is_hba, _ = get_antenna_mode_masks(hba_mode)
+    # In HBA mode, each core station is split into two sub-stations
+    n_stations = np.where(is_hba, 2*np.asarray(n_core), n_core)+n_remote+n_int
+    n_baselines = (n_stations*(n_stations+1))/2
+    if np.ndim(n_baselines) == 0:
+        return float(n_baselines)
+    return n_baselines
 
-def calculate_im_noise(n_core, n_remote, n_int, hba_mode, obs_t, n_sb):
-    """Calculate the image sensitivity for a given number of stations, HBA/LBA mode,
-       observation time, and number of subbands."""
-    # Hardcoded value for subband width
-    sb_width = 195.3125 # kHz
-
-    # Hardcoded values for station SEFD
-    core_sefd = {'lba' : 38160, 'hba' : 2820}
-    remote_sefd = {'lba' : 38160, 'hba' : 1410}
-    int_sefd = {'lba' : 18840, 'hba' : 710}
-
-    # Figure out whether the user wants to observe with LBA or HBA.
-    if 'hba' in hba_mode:
-        mode = 'hba'
-        n_core *= 2
-    else:
-        mode = 'lba'
+def get_station_sefds(hba_mode):
+    """For a given antenna set name or array of names, return the SEFD of the
+       core, remote, and international stations as float64 arrays."""
+    is_hba, is_inner = get_antenna_mode_masks(hba_mode)
+    prodcc = np.where(is_hba, CORE_SEFD['hba'], CORE_SEFD['lba'])
+    prodrr = np.where(is_hba, REMOTE_SEFD['hba'], REMOTE_SEFD['lba'])
+    # SEFD of the tapered remote station is the same as a core station
+    prodrr = np.where(is_inner, prodcc, prodrr)
+    prodii = np.where(is_hba, INT_SEFD['hba'], INT_SEFD['lba'])
+    return [sefd.astype(np.float64) for sefd in (prodcc, prodrr, prodii)]
 
-    # Calculate the bandwidth in MHz
-    bandwidth = n_sb * sb_width * 1.E3
-    bandwidth /= 1.E6
+def get_effective_stations(n_core, n_remote, n_int, hba_mode):
+    """Return the number of core, remote, and international stations as
+       float64 arrays, with each HBA core station counted as two sub-stations."""
+    is_hba, _ = get_antenna_mode_masks(hba_mode)
+    n_core = np.asarray(n_core, dtype=np.float64)
+    n_core = np.where(is_hba, 2*n_core, n_core)
+    return n_core, np.asarray(n_remote, dtype=np.float64), \
+           np.asarray(n_int, dtype=np.float64)
 
-    # Calculate the sensitivity
-    prodcc = core_sefd[mode]
-    if hba_mode == 'hbadualinner':
-        # SEFD of the tapered remote station is the same as a core station
-        prodrr = core_sefd[mode]
-    else:
-        prodrr = remote_sefd[mode]
-    prodii = int_sefd[mode]
+def compute_sensitivity_sum(n_core, n_remote, n_int, prodcc, prodrr, prodii):
+    """Sum the inverse squared SEFD products over all cross-correlation
+       baselines. n_core is the effective number of core stations returned
+       by get_effective_stations."""
     prodcr = np.sqrt(prodcc) * np.sqrt(prodrr)
     prodci = np.sqrt(prodcc) * np.sqrt(prodii)
     prodri = np.sqrt(prodrr) * np.sqrt(prodii)
@@ -52,27 +70,161 @@ def calculate_im_noise(n_core, n_remote, n_int, hba_mode, obs_t, n_sb):
     ncrbl = n_core * n_remote
     ncibl = n_core * n_int
     nribl = n_remote * n_int
-    denom = 4 * bandwidth * obs_t * 1.E6 * \
-                ((nccbl/prodcc**2) + (nrrbl/prodrr**2) + \
-                 (niibl/prodii**2) + (ncrbl/prodcr**2) + \
-                 (ncibl/prodci**2) + (nribl/prodri**2))
-    im_noise = 1/np.sqrt(denom)
+    return (nccbl/prodcc**2) + (nrrbl/prodrr**2) + \
+           (niibl/prodii**2) + (ncrbl/prodcr**2) + \
+           (ncibl/prodci**2) + (nribl/prodri**2)
+
+def calculate_bandwidth(n_sb):
+    """Return the bandwidth in MHz covered by n_sb subbands"""
+    bandwidth = np.asarray(n_sb, dtype=np.float64) * SB_WIDTH * 1.E3
+    bandwidth /= 1.E6
+    return bandwidth
+
+def calculate_im_noise_batch(n_core, n_remote, n_int, hba_mode, obs_t, n_sb):
+    """Calculate the image sensitivity for many setups in one vectorized pass.
+       All inputs can be scalars or NumPy arrays that broadcast against each
+       other. hba_mode is an antenna set name or an array of names.
+       Returns the image sensitivity in uJy/beam as a float64 array."""
+    n_core, n_remote, n_int = get_effective_stations(n_core, n_remote, n_int,
+                                                     hba_mode)
+    prodcc, prodrr, prodii = get_station_sefds(hba_mode)
+    bandwidth = calculate_bandwidth(n_sb)
+
+    # Calculate the sensitivity
+    denom = 4 * bandwidth * np.asarray(obs_t, dtype=np.float64) * 1.E6 * \
+            compute_sensitivity_sum(n_core, n_remote, n_int, prodcc, prodrr, prodii)
+    with np.errstate(divide='ignore'):
+        im_noise = 1/np.sqrt(denom)
     im_noise *= 1.E6 # In uJy
-    return '{:0.2f}'.format(im_noise)
+    return im_noise
 
-def calculate_raw_size(obs_t, cal_t, n_cal, int_time, n_baselines, n_chan, n_sb, n_beams):
-    """Compute the datasize of a raw LOFAR measurement set given the
-       length of the observation, correlator integration time, number
-       of baselines, number of channels per subband, and number of subbands"""
+def calculate_im_noise_setups(setups):
+    """Calculate the image sensitivity for a structured array of setups with
+       the fields listed in NOISE_SETUP_DTYPE. Returns a float64 array in
+       uJy/beam with the same shape as setups."""
+    return calculate_im_noise_batch(setups['n_core'], setups['n_remote'],
+                                    setups['n_int'], setups['hba_mode'],
+                                    setups['obs_t'], setups['n_sb'])
+
+def calculate_im_noise(n_core, n_remote, n_int, hba_mode, obs_t, n_sb):
+    """Calculate the image sensitivity for a given number of stations, HBA/LBA mode,
+       observation time, and number of subbands."""
+    im_noise = calculate_im_noise_batch(n_core, n_remote, n_int, hba_mode,
+                                        obs_t, n_sb)
+    return '{:0.2f}'.format(float(im_noise))
+
+# Maximum number of stations of each type
+MAX_STATIONS = {'core':24, 'remote':14, 'int':14}
+
+# Minimum number of stations in a setup. A single station has no baselines.
+MIN_STATIONS = 2
+
+def compute_required_sensitivity_sum(target_noise, obs_t, n_sb):
+    """Invert the radiometer equation used in calculate_im_noise_batch and
+       return the value of compute_sensitivity_sum needed to reach
+       target_noise (in uJy/beam) for a given observing time and number
+       of subbands."""
+    target_noise = np.asarray(target_noise, dtype=np.float64) / 1.E6 # In Jy
+    return 1. / (target_noise**2 * 4 * calculate_bandwidth(n_sb) * \
+                 np.asarray(obs_t, dtype=np.float64) * 1.E6)
+
+def calculate_obs_time_for_noise(target_noise, n_core, n_remote, n_int, hba_mode,
+                                 n_sb):
+    """Return the observation time in seconds needed to reach target_noise
+       (in uJy/beam) for a given array and number of subbands. All inputs can
+       be scalars or NumPy arrays that broadcast against each other."""
+    eff_core, eff_remote, eff_int = get_effective_stations(n_core, n_remote, n_int,
+                                                           hba_mode)
+    sens_sum = compute_sensitivity_sum(eff_core, eff_remote, eff_int,
+                                       *get_station_sefds(hba_mode))
+    # Image noise scales as 1/sqrt(obs_t), so solve for obs_t directly
+    with np.errstate(divide='ignore'):
+        return compute_required_sensitivity_sum(target_noise, 1., n_sb) / sens_sum
+
+def calculate_n_sb_for_noise(target_noise, n_core, n_remote, n_int, hba_mode,
+                             obs_t):
+    """Return the smallest number of subbands needed to reach target_noise
+       (in uJy/beam) for a given array and observation time. All inputs can
+       be scalars or NumPy arrays that broadcast against each other. Note
+       that the returned values are not clipped to the MAX_BEAMLETS subbands
+       that can be recorded."""
+    eff_core, eff_remote, eff_int = get_effective_stations(n_core, n_remote, n_int,
+                                                           hba_mode)
+    sens_sum = compute_sensitivity_sum(eff_core, eff_remote, eff_int,
+                                       *get_station_sefds(hba_mode))
+    # Image noise scales as 1/sqrt(n_sb), so solve for a single subband first
+    with np.errstate(divide='ignore'):
+        n_sb = compute_required_sensitivity_sum(target_noise, obs_t, 1) / sens_sum
+    # Guard against round-off pushing an exact solution to the next integer
+    return np.ceil(n_sb - 1.E-9)
+
+def calculate_stations_for_noise(target_noise, n_core, n_remote, n_int, hba_mode,
+                                 obs_t, n_sb, station_type='core'):
+    """Return the smallest number of stations of type station_type (core,
+       remote, or int) needed to reach target_noise (in uJy/beam), keeping the
+       number of the other two station types fixed. The sensitivity sum is
+       quadratic in the number of stations of any one type and is solved in
+       closed form. The result is at least large enough for the setup to have
+       MIN_STATIONS stations in total. Returns NaN where the target cannot be
+       reached within MAX_STATIONS. All inputs can be scalars or NumPy arrays
+       that broadcast against each other."""
+    is_hba, _ = get_antenna_mode_masks(hba_mode)
+    n_effective = get_effective_stations(n_core, n_remote, n_int, hba_mode)
+    n_stations = dict(zip(['core', 'remote', 'int'], n_effective))
+    sefds = dict(zip(['core', 'remote', 'int'], get_station_sefds(hba_mode)))
+    others = [name for name in n_stations if name != station_type]
+
+    # Write the sensitivity sum as a*x^2 + b*x + c where x is the
+    # (effective) number of stations being solved for.
+    inv_auto = 1./sefds[station_type]**2
+    inv_cross = 0.
+    for name in others:
+        inv_cross = inv_cross + n_stations[name]/(sefds[station_type]*sefds[name])
+    quad_a = inv_auto/2.
+    quad_b = inv_cross - inv_auto/2.
+    zeros = np.zeros_like(n_stations[station_type])
+    fixed = [zeros if name == station_type else n_stations[name] \
+             for name in n_stations]
+    quad_c = compute_sensitivity_sum(*fixed, sefds['core'], sefds['remote'],
+                                     sefds['int']) - \
+             compute_required_sensitivity_sum(target_noise, obs_t, n_sb)
+    n_req = (-quad_b + np.sqrt(quad_b**2 - 4*quad_a*quad_c)) / (2*quad_a)
+    if station_type == 'core':
+        # Each HBA core station is split into two sub-stations
+        n_req = np.where(is_hba, n_req/2., n_req)
+    # Keep enough stations in total to form baselines
+    n_given = dict(zip(['core', 'remote', 'int'], [n_core, n_remote, n_int]))
+    n_min = MIN_STATIONS - sum(np.asarray(n_given[name]) for name in others)
+    n_req = np.maximum(np.ceil(n_req - 1.E-9), np.maximum(n_min, 0))
+    return np.where(n_req > MAX_STATIONS[station_type], np.nan, n_req)
+
+def calculate_raw_size_batch(obs_t, cal_t, n_cal, int_time, n_baselines, n_chan,
+                             n_sb, n_beams):
+    """Vectorized version of calculate_raw_size. All inputs can be scalars or
+       NumPy arrays that broadcast against each other. Returns the raw data
+       size in GB as a float64 array."""
     # TODO: The below equation needs to be fixed (scale n_baselines).
-    n_rows = int(n_baselines * ( (obs_t*n_beams + cal_t*n_cal ) / int_time)) - n_baselines
+    n_rows = np.trunc(n_baselines * ((np.multiply(obs_t, n_beams) + \
+                                      np.multiply(cal_t, n_cal)) / \
+                                     np.asarray(int_time, dtype=np.float64))) - \
+             n_baselines
     # A single row in LofarStMan format contains
     #    - 32-bit sequence number (4 bytes)
     #    - n_chan*16-bit samples for weight and sigma calculation (2*n_chan bytes)
     #    - 4*n_chan*2*float data array (4*n_chan*2*4 bytes)
+    n_chan = np.asarray(n_chan)
     sb_size = n_rows * ((4) + (2*n_chan) + (4*n_chan*2*4))/(1024*1024*1024) # in GB
     tot_size = sb_size * n_sb
-    return '{:0.2f}'.format(tot_size)
+    return tot_size
+
+def calculate_raw_size(obs_t, cal_t, n_cal, int_time, n_baselines, n_chan, n_sb,
+                       n_beams):
+    """Compute the datasize of a raw LOFAR measurement set given the
+       length of the observation, correlator integration time, number
+       of baselines, number of channels per subband, and number of subbands"""
+    tot_size = calculate_raw_size_batch(obs_t, cal_t, n_cal, int_time, n_baselines,
+                                        n_chan, n_sb, n_beams)
+    return '{:0.2f}'.format(float(tot_size))
 
 def calculate_bf_size(n_sub, n_chan, n_pol, n_value, t_samp, obs_time):
     """Calculate the datasize of a raw LOFAR beamformed dataset.
@@ -84,6 +236,33 @@ def calculate_bf_size(n_sub, n_chan, n_pol, n_value, t_samp, obs_time):
     size_GB = size_Gbs * obs_time / 8.
     return size_GB
 
+def calculate_proc_size_batch(obs_t, cal_t, n_cal, int_time, n_baselines, n_chan,
+                              n_sb, n_beams, t_avg, f_avg, dy_compress):
+    """Vectorized version of calculate_proc_size for the preprocessing
+       pipeline. All inputs can be scalars or NumPy arrays that broadcast
+       against each other. Returns the averaged data size in GB as a float64
+       array."""
+    # Change n_chan to account for f_avg
+    n_chan = np.asarray(n_chan) // np.asarray(f_avg)
+    # Change integ_t to account for t_avg
+    int_time = np.multiply(int_time, t_avg, dtype=np.float64)
+    n_rows = np.trunc(n_baselines * ((np.multiply(obs_t, n_beams) + \
+                                      np.multiply(cal_t, n_cal)) / int_time)) - \
+             n_baselines
+    # What does a single row in an averaged MS contain?
+    sb_size = n_rows * ((7*8) + \
+                     (4+(4*n_chan)) + \
+                     (4*11) + \
+                     (8*1) + \
+                     (4) + \
+                     (4 * (8 + 8*n_chan + 4*n_chan)))
+    # Convert byte length to GB
+    sb_size = sb_size / (1024*1024*1024)
+    tot_size = sb_size * n_sb
+    # Reduce the data size if dysco is enabled.
+    tot_size = np.where(np.asarray(dy_compress) == 'enable', tot_size/3., tot_size)
+    return tot_size
+
 def calculate_proc_size(obs_t, cal_t, n_cal, int_time, n_baselines, n_chan, n_sb, n_beams, pipe_type,
                         t_avg, f_avg, dy_compress):
     """Compute the datasize of averaged LOFAR measurement set given the
@@ -93,25 +272,29 @@ def calculate_proc_size(obs_t, cal_t, n_cal, int_time, n_baselines, n_chan, n_sb
     if pipe_type == 'none':
         return ''
     elif pipe_type == 'preprocessing':
-        # Change n_chan to account for f_avg
-        n_chan //= f_avg
-        # Change integ_t to account for t_avg
-        int_time *= t_avg
-        n_rows = int(n_baselines * ( (obs_t*n_beams + cal_t*n_cal ) / int_time)) - n_baselines
-        # What does a single row in an averaged MS contain?
-        sb_size = n_rows * ((7*8) + \
-                         (4+(4*n_chan)) + \
-                         (4*11) + \
-                         (8*1) + \
-                         (4) + \
-                         (4 * (8 + 8*n_chan + 4*n_chan)))
-        # Convert byte length to GB
-        sb_size /= (1024*1024*1024)
-        tot_size = sb_size * n_sb
-        # Reduce the data size if dysco is enabled.
-        if dy_compress == 'enable':
-            tot_size = tot_size/3.
-        return '{:0.2f}'.format(tot_size)
+        tot_size = calculate_proc_size_batch(obs_t, cal_t, n_cal, int_time,
+                                             n_baselines, n_chan, n_sb, n_beams,
+                                             t_avg, f_avg, dy_compress)
+        return '{:0.2f}'.format(float(tot_size))
+
+# Hard-coded P/O factors for 1 SB indexed by the number of demixed
+# A-team sources. Empirically determined.
+HBA_PIPE_FACTOR = np.array([0.002, 0.0025, 0.005])
+LBA_PIPE_FACTOR = np.array([0.004, 0.004, 0.014])
+
+def calculate_pipe_time_batch(obs_t, cal_t, n_cal, n_sb, n_beams, array_mode,
+                              n_ateams):
+    """Vectorized version of calculate_pipe_time for the preprocessing
+       pipeline. All inputs can be scalars or NumPy arrays that broadcast
+       against each other. n_ateams is the number of A-team sources to demix.
+       Returns pipeline processing time in hours as a float64 array."""
+    is_hba, _ = get_antenna_mode_masks(array_mode)
+    factor = np.where(is_hba, HBA_PIPE_FACTOR[n_ateams], LBA_PIPE_FACTOR[n_ateams])
+    proc_time = factor * n_sb * (np.multiply(obs_t, n_beams) + \
+                                 np.multiply(cal_t, n_cal))
+    # Convert to hours
+    proc_time = proc_time / 3600.
+    return proc_time
 
 def calculate_pipe_time(obs_t, cal_t, n_cal, n_sb, n_beams, array_mode, ateam_names, pipe_type):
     """Compute the pipeline processing time.
@@ -121,30 +304,88 @@ def calculate_pipe_time(obs_t, cal_t, n_cal, n_sb, n_beams, array_mode, ateam_na
            ateam_names - List of A-team sources to demix
            pipe_type - Name of the pipeline
        Returns pipeline processing time in hours"""
-    proc_time = 0
+    proc_time = 0.
     # Figure out the number of ateam sources specified
     if ateam_names is None:
         n_ateams = 0
     else:
         n_ateams = len(ateam_names)
 
-    # Hard-coded P/O factors for 1 SB. Empirically determined.
-    hba_factor = {0:0.002, 1:0.0025, 2:0.005}
-    lba_factor = {0:0.004, 1:0.004, 2:0.014}
-
     if pipe_type == 'preprocessing':
-        if 'hba' in array_mode:
-            proc_time = hba_factor[n_ateams] * n_sb * ( obs_t * n_beams + cal_t * n_cal )
-        else:
-            proc_time = lba_factor[n_ateams] * n_sb * ( obs_t * n_beams + cal_t * n_cal )
-    # Convert to hours
-    proc_time /= 3600.
+        proc_time = float(calculate_pipe_time_batch(obs_t, cal_t, n_cal, n_sb,
+                                                    n_beams, array_mode, n_ateams))
     return proc_time
 
-def validate_inputs(obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_sb, integ_t, t_avg,
-                    f_avg, src_name, coord, hba_mode, pipe_type, ateam_names):
-    """Valid text input supplied by the user: observation time, number of
-       subbands, and integration time. Following checks will be performed:
+# Number of Stokes parameters and values per sample for beamformed data
+BF_STOKES = {'I':(1, 1), 'IQUV':(4, 1), 'XXYY':(2, 2)}
+
+# Maximum number of beamlets that can be recorded
+MAX_BEAMLETS = 488
+
+# FWHM of HBA tile beam in deg
+TILE_BEAM_SIZE = 20
+
+class ObservationSetup(object):
+    """A parsed and validated observation setup. Use parse_setup to create one.
+       Instances are immutable and hashable, so they can be used as keys when
+       caching results. Numerical fields hold numbers, and src_names, coords,
+       calib_names, and ateam_names hold tuples of strings."""
+    __slots__ = ('obs_mode', 'tab_mode', 'stokes', 'obs_t', 'cal_t', 'n_cal',
+                 'n_core', 'n_remote', 'n_int', 'n_chan', 'n_sb', 'integ_t',
+                 'hba_mode', 'pipe_type', 't_avg', 'f_avg', 'dy_compress',
+                 'src_names', 'coords', 'obs_date', 'calib_names', 'ateam_names')
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            object.__setattr__(self, name, kwargs[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ObservationSetup is immutable')
+
+    def __getstate__(self):
+        return self.key()
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+    def key(self):
+        """Return the values of all fields as a tuple"""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, ObservationSetup) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return 'ObservationSetup({})'.format(', '.join('{}={!r}'.format(name, val) \
+                                             for name, val in zip(self.__slots__,
+                                                                  self.key())))
+
+    @property
+    def n_sap(self):
+        """Number of simultaneous target pointings. At least 1."""
+        return max(len(self.coords), 1)
+
+    def to_dict(self):
+        """Return the fields as a dict with lists instead of tuples"""
+        return {name:(list(val) if isinstance(val, tuple) else val) \
+                for name, val in zip(self.__slots__, self.key())}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a setup from a dict made by to_dict"""
+        return cls(**{name:(tuple(data[name]) if isinstance(data[name], list) \
+                            else data[name]) for name in cls.__slots__})
+
+def parse_setup(obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_sb, integ_t,
+                t_avg, f_avg, src_name, coord, hba_mode, pipe_type, ateam_names,
+                n_chan='64', dy_compress='enable', obs_date=None, calib_names=None,
+                obs_mode='Interferometric', tab_mode='Incoherent', stokes='I'):
+    """Validate the input supplied by the user and convert it into an
+       ObservationSetup in a single pass. Following checks will be performed:
          - obs_time is a valid positive number
          - n_core is not None
          - n_remote is not None
@@ -156,104 +397,185 @@ def validate_inputs(obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_sb, integ_t,
          - f_avg is an integer
          - src_name is a string
          - coord is a valid AstroPy coordinate
-         - While observing with HBA, check if the targets are inside the tile beam.
+         - While observing with HBA, check if the targets are inside the tile
+           beam centred on their spherical centroid.
          - ateam_names <= 2 if pipe_type is not "None"
-       Return state=True/False accompanied by an error msg
-       Note: all input parameters are still strings."""
+         - Number of targets times n_sb is at most MAX_BEAMLETS
+       The input parameters can be strings or numbers.
+       Return the setup (None if the input is invalid) accompanied by an
+       error msg."""
     msg = ''
     # Validate the length of the observing times
     try:
-        float(obs_t)
-        if float(obs_t) < 0:
+        obs_t = float(obs_t)
+        if obs_t < 0:
             msg += 'Observation time cannot be negative.\n'
-    except ValueError:
+    except (TypeError, ValueError):
+        obs_t = None
         msg += 'Invalid observation time specified.\n'
     try:
-        float(cal_t)
-        if float(cal_t) < 0:
+        cal_t = float(cal_t)
+        if cal_t < 0:
             msg += 'Calibrator duration cannot be negative.\n'
-    except ValueError:
+    except (TypeError, ValueError):
+        cal_t = None
         msg += 'Invalid calibrator duration specified.\n'
-    try:
-        float(cal_t)+float(obs_t)
-        if float(cal_t)+float(obs_t) <= 0:
-            msg += 'One of Observation time and Calibration duration must be at least one.\n'
-    except ValueError:
+    if obs_t is None or cal_t is None:
         msg += 'Invalid calibrator duration or observation time specified.\n'
+    elif cal_t+obs_t <= 0:
+        msg += 'One of Observation time and Calibration duration must be ' + \
+               'at least one.\n'
 
-    # Validate the number of calibrators
+    # Validate the number of calibrators and stations
+    try:
+        n_cal, n_core = int(n_cal), int(n_core)
+        n_remote, n_int = int(n_remote), int(n_int)
+    except (TypeError, ValueError):
+        return None, msg + 'Invalid number of calibrators or stations specified.\n'
     if n_cal < 0:
         msg += 'Number of calibrators cannot be negative.\n'
-    # Validate the number of stations
-    if n_core < 0 or n_core > 24:
+    if n_core < 0 or n_core > MAX_STATIONS['core']:
         msg += 'Number of core stations must be between 0 and 24.\n'
-    if n_remote < 0 or n_remote > 14:
+    if n_remote < 0 or n_remote > MAX_STATIONS['remote']:
         msg += 'Number of remote stations must be between 0 and 14.\n'
-    if n_int < 0 or n_int > 14:
+    if n_int < 0 or n_int > MAX_STATIONS['int']:
         msg += 'Number of international stations must be between 0 and 14.\n'
-    if n_core + n_remote + n_int < 2:
-        msg += 'At least 2 station must be included.\n'
+    if n_core + n_remote + n_int < MIN_STATIONS:
+        msg += 'At least {} station must be included.\n'.format(MIN_STATIONS)
     # Validate the number of subbands
     try:
-        int(n_sb)
-        if int(n_sb) < 1:
+        n_sb = int(n_sb)
+        if n_sb < 1:
             msg += 'Number of subbands cannot be less than 1.\n'
-        if int(n_sb) > 488:
-            msg += 'Number of subbands cannot be larger than 488.\n'
-    except ValueError:
+        if n_sb > MAX_BEAMLETS:
+            msg += 'Number of subbands cannot be larger than ' + \
+                   '{}.\n'.format(MAX_BEAMLETS)
+    except (TypeError, ValueError):
+        n_sb = None
         msg += 'Invalid number of subbands specified.\n'
+    # Validate the number of channels
+    try:
+        n_chan = int(n_chan)
+    except (TypeError, ValueError):
+        msg += 'Invalid number of channels specified.\n'
     # Validate integration time
     try:
-        float(integ_t)
-        if float(integ_t) < 0.16:
+        integ_t = float(integ_t)
+        if integ_t < 0.16:
             msg += 'Invalid integration time specified. Must be >= 0.16\n'
-    except:
+    except (TypeError, ValueError):
         msg += 'Invalid integration time specified.\n'
     # Validate time averaging factor
     try:
-        int(str(t_avg))
+        t_avg = int(str(t_avg))
     except ValueError:
         msg += 'Invalid time averaging factor specified.'
     # Validate frequency averaging factor
     try:
-        int(str(f_avg))
+        f_avg = int(str(f_avg))
     except ValueError:
         msg += 'Invalid frequency averaging factor specified.'
     # Validate the number of A-team sources if a pipeline is specified
     # Figure out the number of ateam sources specified
-    if ateam_names is None:
-        n_ateams = 0
-    else:
-        n_ateams = len(ateam_names)
-    if pipe_type != 'none' and n_ateams > 2:
+    ateam_names = tuple(ateam_names) if ateam_names else ()
+    calib_names = tuple(calib_names) if calib_names else ()
+    if pipe_type != 'none' and len(ateam_names) > 2:
         msg += 'Cannot demix more than two A-team sources.'
     # Validate the coordinates specified under target setup
-    if coord is not '':
+    src_name = '' if src_name is None else src_name
+    coord = '' if coord is None else coord
+    coord_list = ()
+    radec = None
+    if coord != '':
+        coord_list = tuple(coord.split(','))
         # Warn if the number of targets do not match the number of coordinates
-        if len(src_name.split(',')) != len(coord.split(',')):
+        if len(src_name.split(',')) != len(coord_list):
             msg += 'Number of target names do not match the number of coordinates. '
         # Check if the coordinates are valid
         try:
-            for i in range(len(coord.split(','))):
-                SkyCoord(coord.split(',')[i])
-        except:
+            radec = sc.get_radec(coord_list)
+        except Exception:
             msg += 'Invalid coodinate value under Target setup. Please make ' +\
                    'sure it is compatible with the AstroPy formats.'
-    # While observing with HBA, check if the specified targets all lie within 10 deg
-    coord_list = coord.split(',')
-    if 'hba' in hba_mode and len(coord_list) > 1:
-        ref_point = SkyCoord(coord_list[0])
-        ang_distance = []
-        for i in range(1, len(coord_list)):
-            this_point = SkyCoord(coord_list[i])
-            ang_distance.append(this_point.separation(ref_point).deg)
-        max_distance = np.max(np.asarray(ang_distance))
-        if max_distance > 10.:
+    # While observing with HBA, check if the specified targets all lie within
+    # the tile beam
+    if 'hba' in hba_mode and radec is not None and len(coord_list) > 1:
+        _, offsets, inside = sc.check_beam_containment(radec[0], radec[1],
+                                                       TILE_BEAM_SIZE/2.)
+        if not np.all(inside):
+            max_distance = np.max(sc.get_separation_matrix(*radec))
             msg += 'Maximum angular separation between specified target ' + \
-                   'pointings is {:.2f} degrees. This is '.format(max_distance) + \
-                   'not allowed while observing with the High Band Antenna'
+                   'pointings is {:.2f} degrees and '.format(max_distance) + \
+                   '{} of them lie up to {:.2f} degrees '.format(np.sum(~inside),
+                                                               np.max(offsets)) + \
+                   'from the tile beam centre. This is not allowed while ' + \
+                   'observing with the High Band Antenna'
+    # Check if the number of beamlets is less than MAX_BEAMLETS
+    if n_sb is not None and len(coord_list) * n_sb > MAX_BEAMLETS:
+        msg += 'Number of targets times number of subbands cannot ' + \
+               'be greater than {}.'.format(MAX_BEAMLETS)
     # If any error has been triggered above, return the error message
-    if msg is not '':
-        return False, msg
+    if msg != '':
+        return None, msg
+    src_names = tuple(src_name.split(',')) if coord_list else ()
+    setup = ObservationSetup(obs_mode=obs_mode, tab_mode=tab_mode, stokes=stokes,
+                             obs_t=obs_t, cal_t=cal_t, n_cal=n_cal, n_core=n_core,
+                             n_remote=n_remote, n_int=n_int, n_chan=n_chan,
+                             n_sb=n_sb, integ_t=integ_t, hba_mode=hba_mode,
+                             pipe_type=pipe_type, t_avg=t_avg, f_avg=f_avg,
+                             dy_compress=dy_compress,
+                             src_names=src_names,
+                             coords=coord_list, obs_date=obs_date,
+                             calib_names=calib_names, ateam_names=ateam_names)
+    return setup, msg
+
+def validate_inputs(obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_sb, integ_t,
+                    t_avg, f_avg, src_name, coord, hba_mode, pipe_type,
+                    ateam_names):
+    """Valid text input supplied by the user. See parse_setup for the checks
+       that are performed.
+       Return state=True/False accompanied by an error msg"""
+    setup, msg = parse_setup(obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_sb,
+                             integ_t, t_avg, f_avg, src_name, coord, hba_mode,
+                             pipe_type, ateam_names)
+    return setup is not None, msg
+
+def calculate_results(setup):
+    """Compute the image sensitivity (uJy/beam), raw and processed data sizes
+       (GB), and pipeline processing time (hours) for an ObservationSetup.
+       Returns a dict of floats. proc_size and pipe_time are None if no
+       pipeline is used."""
+    n_baselines = compute_baselines(setup.n_core, setup.n_remote, setup.n_int,
+                                    setup.hba_mode)
+    im_noise = calculate_im_noise_batch(setup.n_core, setup.n_remote, setup.n_int,
+                                        setup.hba_mode, setup.obs_t, setup.n_sb)
+    results = {'im_noise':float(im_noise),
+               'raw_size':None, 'proc_size':None, 'pipe_time':None}
+    if setup.obs_mode == 'Beamformed':
+        # Calculate beamformed datasize
+        n_pol, n_value = BF_STOKES[setup.stokes]
+        results['raw_size'] = calculate_bf_size(setup.n_sb, setup.n_chan, n_pol,
+                                                n_value, setup.integ_t, setup.obs_t)
     else:
-        return True, msg
+        # Calculate interferometric raw size
+        results['raw_size'] = float(calculate_raw_size_batch(
+            setup.obs_t, setup.cal_t, setup.n_cal, setup.integ_t, n_baselines,
+            setup.n_chan, setup.n_sb, setup.n_sap))
+    if setup.pipe_type != 'none':
+        results['pipe_time'] = calculate_pipe_time(
+            setup.obs_t, setup.cal_t, setup.n_cal, setup.n_sb, setup.n_sap,
+            setup.hba_mode, setup.ateam_names, setup.pipe_type)
+    if setup.pipe_type == 'preprocessing':
+        results['proc_size'] = float(calculate_proc_size_batch(
+            setup.obs_t, setup.cal_t, setup.n_cal, setup.integ_t, n_baselines,
+            setup.n_chan, setup.n_sb, setup.n_sap, setup.t_avg, setup.f_avg,
+            setup.dy_compress))
+    return results
+
+def format_results(results):
+    """Convert the output of calculate_results into the strings displayed in
+       the results panel"""
+    formatted = {}
+    for name, value in results.items():
+        formatted[name] = '' if value is None else '{:0.2f}'.format(value)
+    return formatted
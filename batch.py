@@ -0,0 +1,316 @@
+"""Command-line tool to evaluate many observation setups without the web interface.
+
+Setups are read from a JSONL or CSV file (or stdin), one setup per line/row,
+and the results are written in the same order as JSONL or CSV. Each setup
+uses the same fields as the web interface:
+
+    obs_mode, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan, n_sb,
+    integ_t, hba_mode, pipe_type, t_avg, f_avg, dy_compress, tab_mode, stokes,
+    src_name, coord, obs_date, calib_names, ateam_names
+
+Missing fields take the default values of the web interface. In CSV files,
+calib_names and ateam_names are separated by semicolons. Rows that cannot be
+read are reported on stderr and written as invalid results, and the tool
+then exits with status 1.
+
+Example:
+    python batch.py setups.jsonl -o results.csv --processes 8 --visibility
+"""
+
+import argparse
+import csv
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+import numpy as np
+import backend as bk
+import stations as st
+
+# Default values for every field of a setup. Same as the web interface.
+SETUP_DEFAULTS = {'obs_mode':'Interferometric',
+                  'obs_t':'28800',
+                  'cal_t':'600',
+                  'n_cal':'2',
+                  'n_core':'24',
+                  'n_remote':'14',
+                  'n_int':'14',
+                  'n_chan':'64',
+                  'n_sb':'488',
+                  'integ_t':'1',
+                  'hba_mode':'hbadualinner',
+                  'pipe_type':'none',
+                  't_avg':'1',
+                  'f_avg':'4',
+                  'dy_compress':'enable',
+                  'tab_mode':'Incoherent',
+                  'stokes':'I',
+                  'src_name':'',
+                  'coord':'',
+                  'obs_date':None,
+                  'calib_names':None,
+                  'ateam_names':None
+                 }
+
+# Validation messages for a row that could not be read and for a setup that
+# is not a JSON object
+UNREADABLE_ROW_MSG = 'Unable to read this row'
+SETUP_TYPE_MSG = 'Setup must be a JSON object'
+
+# Columns written to a CSV output file. Nested results are JSON-encoded.
+OUTPUT_FIELDS = ['row', 'id', 'valid', 'msg', 'im_noise', 'raw_size', 'proc_size',
+                 'pipe_time', 'elevation', 'distances']
+
+def parse_name_list(value):
+    """Convert a list of source names specified as a list, a semicolon
+       separated string, or None into a list or None."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(';') if item.strip() != '']
+    return list(value) if value else None
+
+def normalize_setup(setup):
+    """Fill in default values for missing fields of a setup and convert the
+       source name lists. Return a new dict."""
+    norm = dict(SETUP_DEFAULTS)
+    for key, value in setup.items():
+        if key in norm and value is not None and value != '':
+            norm[key] = value
+    if norm['obs_date'] is None:
+        norm['obs_date'] = date.today().isoformat()
+    norm['calib_names'] = parse_name_list(norm['calib_names'])
+    norm['ateam_names'] = parse_name_list(norm['ateam_names'])
+    return norm
+
+def parse_normalized_setup(s):
+    """Parse a setup dict returned by normalize_setup with bk.parse_setup.
+       Return the backend.ObservationSetup, or None if the setup is invalid,
+       and the validation message."""
+    return bk.parse_setup(s['obs_t'], s['cal_t'], s['n_cal'], s['n_core'],
+                          s['n_remote'], s['n_int'], s['n_sb'], s['integ_t'],
+                          s['t_avg'], s['f_avg'], s['src_name'], s['coord'],
+                          s['hba_mode'], s['pipe_type'], s['ateam_names'],
+                          n_chan=s['n_chan'], dy_compress=s['dy_compress'],
+                          obs_date=s['obs_date'], calib_names=s['calib_names'],
+                          obs_mode=s['obs_mode'], tab_mode=s['tab_mode'],
+                          stokes=s['stokes'])
+
+def parse_setup_fields(setup):
+    """Normalize a setup dict (see normalize_setup) and parse it (see
+       parse_normalized_setup)."""
+    return parse_normalized_setup(normalize_setup(setup))
+
+def summarize_elevation(traces, n_targets):
+    """Summarize the elevation curves of the first n_targets Scatter traces
+       returned by targetvis.find_target_elevation as the maximum elevation
+       in degrees and the number of hours above the horizon."""
+    summary = []
+    for trace in traces[:n_targets]:
+        yaxis = np.asarray(trace['y'], dtype=np.float64)
+        above = np.isfinite(yaxis)
+        max_elevation = float(np.max(yaxis[above])) if np.any(above) else None
+        # Elevation is sampled every 5 minutes
+        summary.append({'name':trace['name'],
+                        'max_elevation':max_elevation,
+                        'hours_up':float(np.sum(above))*5./60.})
+    return summary
+
+def evaluate_setup(setup, visibility=False):
+    """Validate and evaluate a single observation setup.
+       Input parameters:
+       * setup      - dict with the fields described in the module docstring
+       * visibility - If True, also compute target elevations and distances
+                      to bright sources with the targetvis functions.
+       Returns a dict with the keys in OUTPUT_FIELDS; row is filled in by
+       run_batch. Sizes are in GB, noise in uJy/beam, and pipeline time in
+       hours. Invalid setups have valid=False and the reason in msg."""
+    result = {'row':None, 'id':None, 'valid':False, 'msg':'',
+              'im_noise':None, 'raw_size':None, 'proc_size':None, 'pipe_time':None,
+              'elevation':None, 'distances':None}
+    if not isinstance(setup, dict):
+        # None is a row that could not be read, see read_setups
+        result['msg'] = UNREADABLE_ROW_MSG if setup is None else SETUP_TYPE_MSG
+        return result
+    result['id'] = setup.get('id')
+    s = normalize_setup(setup)
+    parsed, msg = parse_normalized_setup(s)
+    if parsed is None:
+        result['msg'] = msg
+        return result
+    result.update(bk.calculate_results(parsed))
+
+    if visibility and parsed.coords:
+        # Import here so that the size/noise calculations do not need
+        # the astroquery and plotly dependencies.
+        import targetvis as tv
+        src_name = ','.join(parsed.src_names) if s['src_name'] != '' else s['coord']
+        stations = st.select_stations(parsed.n_core, parsed.n_remote, parsed.n_int)
+        traces = tv.find_target_elevation(src_name, list(parsed.coords),
+                                          parsed.obs_date, parsed.n_int, stations)
+        result['elevation'] = summarize_elevation(traces, len(parsed.coords))
+        distances = tv.compute_target_distances(list(parsed.coords),
+                                                parsed.obs_date)
+        result['distances'] = [{key:(list(val) if isinstance(val, tuple) else val) \
+                                for key, val in item.items()} for item in distances]
+    result['valid'] = True
+    return result
+
+def evaluate_chunk(setups, visibility=False):
+    """Evaluate a list of setups. Used to send several rows to a worker
+       process in one go."""
+    return [evaluate_setup(setup, visibility) for setup in setups]
+
+def read_setups(infile, fmt, on_error=None):
+    """Lazily yield setups from an open file in jsonl or csv format. A row
+       that cannot be read is reported as on_error(row, msg), with row
+       counting from 0 like the row field of the results, and yielded as
+       None so that evaluate_setup reports it as invalid. If on_error is
+       None, a ValueError is raised instead."""
+    def report(row, msg):
+        if on_error is None:
+            raise ValueError('Row {}: {}'.format(row, msg))
+        on_error(row, msg)
+    row = 0
+    if fmt == 'csv':
+        reader = csv.DictReader(infile)
+        while True:
+            try:
+                setup = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as err:
+                report(row, str(err))
+                setup = None
+            yield setup
+            row += 1
+    else:
+        for line in infile:
+            line = line.strip()
+            if line == '':
+                continue
+            try:
+                setup = json.loads(line)
+            except ValueError as err:
+                report(row, str(err))
+                setup = None
+            else:
+                if not isinstance(setup, dict):
+                    report(row, SETUP_TYPE_MSG)
+                    setup = None
+            yield setup
+            row += 1
+
+def iter_chunks(iterable, chunk_size):
+    """Yield lists of up to chunk_size consecutive items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def run_batch(setups, processes=1, visibility=False, chunk_size=16,
+              max_pending=None):
+    """Evaluate an iterable of setups and yield the results in input order.
+       Rows are sent to a pool of worker processes in chunks of chunk_size.
+       At most max_pending chunks (default: 4 per process) are in flight at
+       any time, so memory use does not grow with the size of the input."""
+    if processes <= 1:
+        for row, setup in enumerate(setups):
+            result = evaluate_setup(setup, visibility)
+            result['row'] = row
+            yield result
+        return
+    if max_pending is None:
+        max_pending = 4*processes
+    row = 0
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+        chunks = iter_chunks(setups, chunk_size)
+        while True:
+            # Keep the pool busy without reading the whole input
+            while len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(pool.submit(evaluate_chunk, chunk, visibility))
+            if not pending:
+                break
+            for result in pending.popleft().result():
+                result['row'] = row
+                row += 1
+                yield result
+
+def write_results(results, outfile, fmt):
+    """Write results to an open file in jsonl or csv format as they arrive"""
+    if fmt == 'csv':
+        writer = csv.DictWriter(outfile, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+    for result in results:
+        if fmt == 'csv':
+            row = dict(result)
+            for key in ['elevation', 'distances']:
+                if row[key] is not None:
+                    row[key] = json.dumps(row[key])
+            writer.writerow(row)
+        else:
+            outfile.write(json.dumps(result) + '\n')
+        outfile.flush()
+
+def guess_format(filename, default='jsonl'):
+    """Guess the file format from the extension of filename"""
+    if filename is not None and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+def main(argv=None):
+    """Entry point of the command-line tool"""
+    parser = argparse.ArgumentParser(description='Evaluate LOFAR observation '+\
+                                                 'setups without the web '+\
+                                                 'interface.')
+    parser.add_argument('infile', nargs='?', default=None,
+                        help='Input JSONL or CSV file. Defaults to stdin.')
+    parser.add_argument('-o', '--outfile', default=None,
+                        help='Output JSONL or CSV file. Defaults to stdout.')
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'], default=None,
+                        help='Input format. Guessed from the file extension.')
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'], default=None,
+                        help='Output format. Guessed from the file extension.')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                        help='Number of worker processes (default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=16,
+                        help='Number of setups sent to a worker at once '+\
+                             '(default: 16)')
+    parser.add_argument('--visibility', action='store_true',
+                        help='Also compute target elevations and distances to '+\
+                             'bright sources')
+    args = parser.parse_args(argv)
+
+    in_fmt = args.input_format or guess_format(args.infile)
+    out_fmt = args.output_format or guess_format(args.outfile)
+    infile = sys.stdin if args.infile is None else open(args.infile, newline='')
+    outfile = sys.stdout if args.outfile is None else \
+              open(args.outfile, 'w', newline='')
+    bad_rows = []
+    def report(row, msg):
+        # Unreadable rows are written as invalid results; carry on with the rest
+        print('Unable to read row {}: {}'.format(row, msg), file=sys.stderr)
+        bad_rows.append(row)
+    try:
+        results = run_batch(read_setups(infile, in_fmt, report), args.processes,
+                            args.visibility, args.chunk_size)
+        write_results(results, outfile, out_fmt)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    if bad_rows:
+        print('{} row(s) could not be read'.format(len(bad_rows)), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
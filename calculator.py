@@ -3,21 +3,30 @@
 __author__ = "Sarrvesh S. Sridhar"
 __email__ = "sarrvesh@astron.nl"
 
-from random import randint
 import os
+import numpy as np
 import dash
 import dash_bootstrap_components as dbc
+import dash_html_components as html
 from dash.dependencies import Input, Output, State
 import flask
 from gui import layout
 import backend as bk
 import targetvis as tv
-import generatepdf as g
+import pdfjobs as pj
+import pdfstore as ps
+import sweep as sw
+import seasons as ss
+import skycoords as sc
+import stations as st
+import lotss
+from api import api
 
 # Initialize the dash app
 server = flask.Flask(__name__)
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.LUMEN], \
                 server=server, url_base_pathname='/luci/')
+server.register_blueprint(api)
 app.css.config.serve_locally = True
 app.scripts.config.serve_locally = True
 
@@ -27,6 +36,10 @@ app.scripts.config.serve_locally = True
 app.layout = layout
 app.title = 'LUCI - LOFAR Unified Calculator for Imaging'
 
+# Maximum number of calculated setups remembered per browser session for the
+# report. The oldest setups are forgotten first.
+HISTORY_LENGTH = 20
+
 ##############################################
 # TODO: Move all callbacks to a separate file
 # See https://community.plot.ly/t/dash-callback-in-a-separate-file/14122/16
@@ -278,6 +291,7 @@ def validate_f_avg(value, n_clicks, is_open):
 #######################################
 @app.callback(
     [Output('coordRow', 'value'),
+     Output('msgBoxResolveBody', 'children'),
      Output('msgboxResolve', 'is_open')
     ],
     [Input('resolve', 'n_clicks'),
@@ -292,28 +306,86 @@ def on_resolve_click(n, close_msg_box, target_name, is_open):
     if is_open is True and close_msg_box is not None:
         # The message box is open and the user has clicked the close
         # button. Close the alert message
-        return '', False
+        return '', '', False
     if n is None:
         # The page has just loaded.
-        return '', False
+        return '', '', False
     else:
         # Resole button has been clicked
-        coord_str = tv.resolve_source(target_name)
+        coord_str, failed = tv.resolve_source(target_name)
         if coord_str is None:
-            # Display error message.
-            return '', True
+            # Display error message. Say why each name failed, so that an
+            # unknown name can be told apart from an unreachable resolver.
+            msg = [html.Div('{}: {}.'.format(item['name'], item['error'])) \
+                   for item in failed] or \
+                  [html.Div('Unable to resolve the source name.')]
+            msg.append(html.Div('Please specify the coordinates manually.'))
+            return '', msg, True
         else:
-            return coord_str, False
+            return coord_str, '', False
+
+#######################################
+# What should the LoTSS button do?
+#######################################
+@app.callback(
+    [Output('msgBoxLotssBody', 'children'),
+     Output('msgboxLotss', 'is_open')
+    ],
+    [Input('findLotss', 'n_clicks'),
+     Input('msgBoxLotssClose', 'n_clicks')
+    ],
+    [State('coordRow', 'value'),
+     State('msgboxLotss', 'is_open')
+    ]
+)
+def on_lotss_click(n, close_msg_box, coord, is_open):
+    """Function defines what to do when the LoTSS button is clicked. Show the
+       LoTSS pointings closest to the first target."""
+    if (is_open is True and close_msg_box is not None) or n is None:
+        # Either the page has just loaded or the user has closed the box
+        return '', False
+    try:
+        pointings = lotss.find_nearest_pointings(coord.split(',')[0])
+    except (AttributeError, ValueError):
+        return 'Please specify valid target coordinates first.', True
+    header = html.Tr([html.Th('Pointing'), html.Th('Coordinates'),
+                      html.Th('Distance (deg)')])
+    rows = [html.Tr([html.Td(item['name']), html.Td(item['coord']),
+                     html.Td('{:0.2f}'.format(item['distance']))]) \
+            for item in pointings]
+    return dbc.Table([html.Thead(header), html.Tbody(rows)], size='sm'), True
+
+def get_station_counts(n_core, n_remote, n_int):
+    """Return the values of the core, remote, and international station
+       fields, with empty fields replaced by '0'"""
+    # If the user sets n_core, n_remote, or n_int to 0, dash return None.
+    # Why is this?
+    # Correct this manually, for now.
+    return ['0' if value is None else value for value in [n_core, n_remote, n_int]]
+
+def parse_form_inputs(obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan, n_sb,
+                      integ_t, hba_mode, pipe_type, t_avg, f_avg, dy_compress,
+                      src_name, coord, obs_date, calib_names, ateam_names,
+                      obs_mode, tab_mode, stokes):
+    """Convert the values of the input fields into an ObservationSetup.
+       Returns the setup (None if invalid) and an error message."""
+    n_core, n_remote, n_int = get_station_counts(n_core, n_remote, n_int)
+    return bk.parse_setup(obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_sb,
+                          integ_t, t_avg, f_avg, src_name, coord, hba_mode,
+                          pipe_type, ateam_names, n_chan=n_chan,
+                          dy_compress=dy_compress,
+                          obs_date=obs_date, calib_names=calib_names,
+                          obs_mode=obs_mode, tab_mode=tab_mode, stokes=stokes)
 
 #######################################
 # What should the export button do?
 #######################################
 @app.callback(
-    [Output('download-link', 'style'),
-     Output('download-link', 'href'),
+    [Output('pdfJobStore', 'data'),
      Output('msgboxGenPdf', 'is_open')
     ],
     [Input('genpdf', 'n_clicks'),
+     Input('genreport', 'n_clicks'),
      Input('mbGenPdfClose', 'n_clicks')
     ],
     [State('obsTimeRow', 'value'),
@@ -334,9 +406,6 @@ def on_resolve_click(n, close_msg_box, target_name, is_open):
      State('dyCompressRow', 'value'),
 
      State('imNoiseRow', 'value'),
-     State('rawSizeRow', 'value'),
-     State('pipeSizeRow', 'value'),
-     State('pipeProcTimeRow', 'value'),
 
      State('msgboxGenPdf', 'is_open'),
 
@@ -347,41 +416,97 @@ def on_resolve_click(n, close_msg_box, target_name, is_open):
      
      State('obsModeRow', 'value'),
      State('tabModeRow', 'value'),
-     State('stokesRow', 'value')
+     State('stokesRow', 'value'),
+
+     State('targetNameRow', 'value'),
+     State('calListRow', 'value'),
+     State('demixListRow', 'value'),
+
+     State('pdfJobStore', 'data'),
+     State('historyStore', 'data')
     ]
 )
-def on_genpdf_click(n_clicks, close_msg_box, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan,
-                    n_sb, integ_t, ant_set, coord, pipe_type, t_avg, f_avg, is_dysco,
-                    im_noise_val, raw_size, proc_size, pipe_time, is_msg_box_open,
-                    elevation_fig, distance_table, obs_date, obs_mode, tab_mode, stokes):
-    """Function defines what to do when the generate pdf button is clicked"""
+def on_genpdf_click(n_clicks, n_report_clicks, close_msg_box, obs_t, cal_t, n_cal,
+                    n_core, n_remote, n_int, n_chan, n_sb, integ_t, ant_set, coord,
+                    pipe_type, t_avg, f_avg, is_dysco, im_noise_val,
+                    is_msg_box_open, elevation_fig, distance_table, obs_date,
+                    obs_mode, tab_mode, stokes, src_name, calib_names, ateam_names,
+                    job_id, history):
+    """Function defines what to do when the generate pdf or the generate
+       report button is clicked. The PDF file is generated in the background
+       (see pdfjobs.py), so this only returns the id of the job."""
     if is_msg_box_open is True and close_msg_box is not None:
         # The message box is open and the user has clicked the close
         # button. Close the alert message.
-        return {'display':'none'}, '', False
-    if n_clicks is None:
-        # Generate button has not been clicked. Hide the download link
-        return {'display':'none'}, '', False
+        return dash.no_update, False
+    if n_clicks is None and n_report_clicks is None:
+        # Generate button has not been clicked
+        return dash.no_update, False
+    job = pj.PDF_JOBS.get(job_id) if job_id else None
+    if job is not None and job['status'] == pj.JOB_PENDING:
+        # The previous export of this page is still running
+        return dash.no_update, False
+    triggered = dash.callback_context.triggered
+    if triggered and triggered[0]['prop_id'] == 'genreport.n_clicks':
+        # Export every setup calculated in this session
+        if not history:
+            return dash.no_update, True
+        setups = [bk.ObservationSetup.from_dict(item) for item in history]
+        return pj.PDF_JOBS.submit_report(setups), False
     else:
-        if im_noise_val is '':
+        setup = None
+        if im_noise_val != '':
+            setup, _ = parse_form_inputs(obs_t, cal_t, n_cal, n_core, n_remote,
+                                         n_int, n_chan, n_sb, integ_t, ant_set,
+                                         pipe_type, t_avg, f_avg, is_dysco,
+                                         src_name, coord, obs_date, calib_names,
+                                         ateam_names, obs_mode, tab_mode, stokes)
+        if setup is None:
             # User has clicked generate PDF button before calculate
-            return {'display':'none'}, '', True
+            return dash.no_update, True
         else:
-            # Generate a random number so that this user's pdf can be stored here
-            randnum = '{:05d}'.format(randint(0, 10000))
-            rel_path = 'static/'
-            # Generate a relative and absolute filenames to the pdf file
-            rel_path = os.path.join(rel_path, 'summary_{}.pdf'.format(randnum))
-            abs_path = os.path.join(os.getcwd(), rel_path)
-            g.generate_pdf(rel_path, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan,
-                           n_sb, integ_t, ant_set, coord, pipe_type, t_avg, f_avg,
-                           is_dysco, im_noise_val, raw_size, proc_size, pipe_time,
-                           elevation_fig, distance_table, obs_date, 
-                           obs_mode, tab_mode, stokes)
-            return {'display':'block'}, '/luci/{}'.format(rel_path), False
+            return pj.PDF_JOBS.submit(setup, elevation_fig, distance_table), False
+
+#######################################
+# Show the PDF file once it is ready
+#######################################
+@app.callback(
+    [Output('download-link', 'style'),
+     Output('download-link', 'href'),
+     Output('pdfJobStatus', 'children'),
+     Output('pdfJobInterval', 'disabled')
+    ],
+    [Input('pdfJobStore', 'data'),
+     Input('pdfJobInterval', 'n_intervals')
+    ]
+)
+def on_pdf_job_poll(job_id, n_intervals):
+    """Function polls the status of the PDF export of this page. The
+       download link is shown once the file is ready."""
+    job = pj.PDF_JOBS.get(job_id) if job_id else None
+    if job is None:
+        # Nothing has been exported, or the job has been forgotten
+        return {'display':'none'}, '', '', True
+    if job['status'] == pj.JOB_PENDING:
+        return {'display':'none'}, '', 'Generating PDF file...', False
+    if job['status'] == pj.JOB_FAILED:
+        return {'display':'none'}, '', 'Unable to generate the PDF file.', True
+    return {'display':'block'}, '/luci/{}'.format(job['path']), '', True
 
 @app.server.route('/luci/static/<resource>')
 def serve_static(resource):
+    # Summary PDF files are streamed from the PDF store, from disk or from
+    # memory. Their key is a hash of everything that determines their
+    # contents, so it serves as a strong ETag.
+    key = ps.parse_pdf_name(resource)
+    if key is not None:
+        pdf_file = ps.PDF_STORE.get(key)
+        if pdf_file is None:
+            flask.abort(404)
+        if isinstance(pdf_file, str):
+            pdf_file = os.path.abspath(pdf_file)
+        return flask.send_file(pdf_file, mimetype='application/pdf',
+                               download_name=resource, etag=key)
     path = os.path.join(os.getcwd(), 'static')
     return flask.send_from_directory(path, resource)
 
@@ -400,7 +525,8 @@ def serve_static(resource):
      Output('beam-plot', 'style'),
      Output('beam-plot', 'figure'),
      Output('distance-table', 'style'),
-     Output('distance-table', 'figure')
+     Output('distance-table', 'figure'),
+     Output('historyStore', 'data')
     ],
     [Input('calculate', 'n_clicks'),
      Input('msgBoxClose', 'n_clicks'),
@@ -427,125 +553,43 @@ def serve_static(resource):
      State('demixListRow', 'value'),
      State('obsModeRow', 'value'),
      State('tabModeRow', 'value'),
-     State('stokesRow', 'value')
+     State('stokesRow', 'value'),
+     State('historyStore', 'data')
     ]
 )
 def on_calculate_click(n, n_clicks, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan, n_sb,
                        integ_t, hba_mode, pipe_type, t_avg, f_avg, dy_compress,
                        is_open, src_name, coord, obs_date, calib_names,
-                       ateam_names, obs_mode, tab_mode, stokes):
-    """Function defines what to do when the calculate button is clicked"""
+                       ateam_names, obs_mode, tab_mode, stokes, history):
+    """Function defines what to do when the calculate button is clicked.
+       Valid setups are added to the history of the session, which is
+       exported by the generate report button."""
     if is_open is True:
         # User has closed the error message box
         return '', '', '', '', '', False, \
                {'display':'none'}, {}, {'display':'none'}, \
-               {}, {'display':'none'}, {}
+               {}, {'display':'none'}, {}, dash.no_update
     if n is None:
         # Calculate button has not been clicked yet
         # So, do nothing and set default values to results field
         return '', '', '', '', '', False, \
                {'display':'none'}, {}, {'display':'none'}, {}, \
-               {'display':'none'}, {}
+               {'display':'none'}, {}, dash.no_update
     else:
         # Calculate button has been clicked.
         # First, validate all command line inputs
-
-        # If the user sets n_core, n_remote, or n_int to 0, dash return None.
-        # Why is this?
-        # Correct this manually, for now.
-        if n_core is None:
-            n_core = '0'
-        if n_remote is None:
-            n_remote = '0'
-        if n_int is None:
-            n_int = '0'
-        status, msg = bk.validate_inputs(obs_t, cal_t, int(n_cal), int(n_core), int(n_remote), \
-                                         int(n_int), n_sb, integ_t, t_avg, f_avg, \
-                                         src_name, coord, hba_mode, pipe_type, \
-                                         ateam_names)
-        if status is False:
+        setup, msg = parse_form_inputs(obs_t, cal_t, n_cal, n_core, n_remote, n_int,
+                                       n_chan, n_sb, integ_t, hba_mode, pipe_type,
+                                       t_avg, f_avg, dy_compress, src_name, coord,
+                                       obs_date, calib_names, ateam_names,
+                                       obs_mode, tab_mode, stokes)
+        if setup is None:
             return '', '', '', '', msg, True, \
                    {'display':'none'}, {}, {'display':'none'}, {}, \
-                   {'display':'none'}, {}
+                   {'display':'none'}, {}, dash.no_update
         else:
-            # Estimate the raw data size
-            if coord is not '':
-                coord_list = coord.split(',')
-                coord_input_list = coord.split(',')
-                n_sap=len(coord_list)
-            else:
-                n_sap=1
-
-            n_baselines = bk.compute_baselines(int(n_core), int(n_remote),
-                                               int(n_int), hba_mode)
-            im_noise = bk.calculate_im_noise(int(n_core), int(n_remote),
-                                             int(n_int), hba_mode, float(obs_t),
-                                             int(n_sb))
-
-            if obs_mode == 'Interferometric':
-                # Calculate interferometric raw size
-                raw_size = bk.calculate_raw_size(float(obs_t), float(cal_t), int(n_cal), float(integ_t),
-                                                 n_baselines, int(n_chan), int(n_sb), n_sap)
-                avg_size = bk.calculate_proc_size(float(obs_t), float(cal_t), int(n_cal), float(integ_t),
-                                              n_baselines, int(n_chan), int(n_sb), n_sap,
-                                              pipe_type, int(t_avg), int(f_avg),
-                                              dy_compress)
-            if obs_mode == 'Beamformed':
-                # Calculate beamformed datasize
-                if stokes == 'I':
-                    n_pol = 1
-                    n_value = 1
-                if stokes == 'IQUV':
-                    n_pol = 4
-                    n_value = 1
-                if stokes == 'XXYY':
-                    n_pol = 2
-                    n_value =2
-                raw_size = bk.calculate_bf_size(int(n_sb), int(n_chan), \
-                                                n_pol, n_value, float(integ_t), \
-                                                float(obs_t))
-                
-            if pipe_type == 'none':
-                # No pipeline
-                pipe_time = None
-                avg_size = 0
-            else:
-                pipe_time = bk.calculate_pipe_time(float(obs_t), float(cal_t), int(n_cal), int(n_sb), n_sap,
-                                                   hba_mode, ateam_names,
-                                                   pipe_type)
-                avg_size = bk.calculate_proc_size(float(obs_t), float(cal_t), int(n_cal), float(integ_t),
-                                              n_baselines, int(n_chan), int(n_sb), n_sap,
-                                              pipe_type, int(t_avg), int(f_avg),
-                                              dy_compress)
-
-            # It is useful to have coord as a list from now on
-
-            # Add calibrator names to the target list so that they can be
-            # plotted together. Before doing that, make a copy of the input
-            # target list and its coordinates
-            src_name_input = src_name
-            coord_input = coord
-            if calib_names is not None:
-                for i in range(len(calib_names)):
-                    if i == 0 and src_name is None:
-                        src_name = '{}'.format(calib_names[i])
-                        coord_list = [tv.CALIB_COORDINATES[calib_names[i]]]
-                    else:
-                        src_name += ', {}'.format(calib_names[i])
-                        coord_list.append(tv.CALIB_COORDINATES[calib_names[i]])
-
-            # Add A-team names to the target list so that they can be
-            # plotted together
-            if ateam_names is not None:
-                for i in range(len(ateam_names)):
-                    if i == 0 and src_name is None:
-                        src_name = '{}'.format(ateam_names[i])
-                        coord_list = [tv.ATEAM_COORDINATES[ateam_names[i]]]
-                    else:
-                        src_name += ', {}'.format(ateam_names[i])
-                        coord_list.append(tv.ATEAM_COORDINATES[ateam_names[i]])
-
-            if coord is '':
+            results = bk.format_results(bk.calculate_results(setup))
+            if not setup.coords:
                 # No source is specified under Target setup
                 display_fig = {'display':'none'}
                 elevation_fig = {}
@@ -554,48 +598,261 @@ def on_calculate_click(n, n_clicks, obs_t, cal_t, n_cal, n_core, n_remote, n_int
                 distance_tab = {}
             else:
                 # User has specified a coordinate and it has passed validation
-                # in the validate_inputs function.
-                # Check if the number of beamlets is less than 488
-                n_point = len(coord_input_list)
-                n_beamlet = n_point * int(n_sb)
-                max_beamlet = 488
-                if n_beamlet > max_beamlet:
-                    msg = 'Number of targets times number of subbands cannot ' + \
-                          'be greater than {}.'.format(max_beamlet)
-                    return '', '', '', '', msg, True, \
-                           {'display':'none'}, {}, {'display':'none'}, {}, \
-                           {'display':'none'}, {}
-                # Find target elevation across a 24-hour period
-                data = tv.find_target_elevation(src_name, coord_list,
-                                                obs_date, int(n_int))
+                # in the parse_setup function.
                 display_fig = {'display':'block', 'height':600}
-                elevation_fig = {'data':data,
-                                 'layout':{
-                                     'xaxis':{'title':'Time (UTC)'},
-                                     'yaxis':{'title':'Elevation'},
-                                     'title':'Target visibility plot',
-                                     'shapes':[]
-                                 }
-                                }
-                elevation_fig = tv.add_sun_rise_and_set_times(obs_date,
-                                                              int(n_int),
-                                                              elevation_fig)
-                # Find the position of the station and tile beam
-                beam_fig = tv.find_beam_layout(src_name_input, coord_input, \
-                                   int(n_core), int(n_remote), int(n_int), hba_mode)
-                # Calculate distance between all the targets and offending sources
                 display_tab = {'display':'block'}
-                table_data = [tv.make_distance_table(src_name_input,
-                                                     coord_input, obs_date)]
-                table_title = 'Angular distances in degrees between specified ' +\
-                             'targets and other bright sources'
-                distance_tab = {'data':table_data,
-                                'layout':{'title':table_title, 'autosize':True}
-                               }
-
-            return im_noise, raw_size, avg_size, pipe_time, '', \
+                elevation_fig, beam_fig, distance_tab = tv.make_setup_figures(setup)
+
+            # Remember the setup unless it was just calculated
+            history = list(history or [])
+            if not history or history[-1] != setup.to_dict():
+                history = (history + [setup.to_dict()])[-HISTORY_LENGTH:]
+
+            return results['im_noise'], results['raw_size'], results['proc_size'], \
+                   results['pipe_time'], '', \
                    False, display_fig, elevation_fig, display_fig, beam_fig, \
-                   display_tab, distance_tab
+                   display_tab, distance_tab, history
+
+#######################################
+# What should the trade-off button do?
+#######################################
+@app.callback(
+    [Output('sweepStore', 'data')] + \
+    [Output('sweepIdx_{}'.format(name), 'options') for name in sw.SWEEP_AXES] + \
+    [Output('sweepIdx_{}'.format(name), 'value') for name in sw.SWEEP_AXES] + \
+    [Output('msgBoxSweepBody', 'children'),
+     Output('msgboxSweep', 'is_open')
+    ],
+    [Input('sweep', 'n_clicks'),
+     Input('msgBoxSweepClose', 'n_clicks')
+    ],
+    [State('sweepObsTimeRow', 'value'),
+     State('sweepNsbRow', 'value'),
+     State('sweepIntTimeRow', 'value'),
+     State('sweepTAvgRow', 'value'),
+     State('sweepFAvgRow', 'value'),
+     State('calTimeRow', 'value'),
+     State('nCalRow', 'value'),
+     State('nCoreRow', 'value'),
+     State('nRemoteRow', 'value'),
+     State('nIntRow', 'value'),
+     State('nChanRow', 'value'),
+     State('hbaDualRow', 'value'),
+     State('dyCompressRow', 'value'),
+     State('pipeTypeRow', 'value'),
+     State('coordRow', 'value'),
+     State('demixListRow', 'value'),
+     State('msgboxSweep', 'is_open')
+    ]
+)
+def on_sweep_click(n, close_msg_box, obs_t_range, n_sb_range, integ_t_range,
+                   t_avg_range, f_avg_range, cal_t, n_cal, n_core, n_remote, n_int,
+                   n_chan, hba_mode, dy_compress, pipe_type, coord, ateam_names,
+                   is_open):
+    """Function defines what to do when the compute trade-off button is clicked"""
+    n_axes = len(sw.SWEEP_AXES)
+    if (is_open is True and close_msg_box is not None) or n is None:
+        # Either the page has just loaded or the user has closed the
+        # error message box. Leave the current cube untouched.
+        return [dash.no_update]*(2*n_axes+1) + ['', False]
+    n_core, n_remote, n_int = get_station_counts(n_core, n_remote, n_int)
+    axes = []
+    try:
+        for text in [obs_t_range, n_sb_range, integ_t_range, t_avg_range,
+                     f_avg_range]:
+            axes.append(sw.parse_axis_range(text))
+        n_beams = len(coord.split(',')) if coord else 1
+        cube = sw.make_sweep_cube(*axes, n_core=int(n_core), n_remote=int(n_remote),
+                                  n_int=int(n_int), hba_mode=hba_mode,
+                                  cal_t=float(cal_t), n_cal=int(n_cal),
+                                  n_chan=int(n_chan), n_beams=n_beams,
+                                  dy_compress=dy_compress, ateam_names=ateam_names,
+                                  pipe_type=pipe_type)
+    except (ValueError, IndexError):
+        msg = 'Invalid trade-off setup. Please check the axis ranges and ' + \
+              'the observational setup. Each axis can have at most ' + \
+              '{} values and the trade-off at most '.format(sw.MAX_AXIS_POINTS) + \
+              '{} points.'.format(sw.MAX_CUBE_POINTS)
+        return [dash.no_update]*(2*n_axes+1) + [msg, True]
+    options = [[{'label':'{:g}'.format(val), 'value':idx} \
+                for idx, val in enumerate(cube['coords'][name])] \
+               for name in sw.SWEEP_AXES]
+    return [sw.sweep_cube_to_dict(cube)] + options + [0]*n_axes + ['', False]
+
+#######################################
+# Display a slice of the trade-off cube
+#######################################
+@app.callback(
+    [Output('sweep-plot', 'style'),
+     Output('sweep-plot', 'figure')
+    ],
+    [Input('sweepStore', 'data'),
+     Input('sweepQuantityRow', 'value'),
+     Input('sweepXRow', 'value'),
+     Input('sweepYRow', 'value')] + \
+    [Input('sweepIdx_{}'.format(name), 'value') for name in sw.SWEEP_AXES]
+)
+def on_sweep_slice_change(cube_data, quantity, x_dim, y_dim, *indices):
+    """Function displays a 2-D slice of the stored trade-off cube. The cube is
+       not recomputed when the user picks a different slice."""
+    if cube_data is None:
+        return {'display':'none'}, {}
+    if x_dim == y_dim:
+        return {'display':'block', 'height':600}, \
+               {'layout':{'title':'Please select two different axes'}}
+    cube = sw.sweep_cube_from_dict(cube_data)
+    if quantity not in cube:
+        return {'display':'block', 'height':600}, \
+               {'layout':{'title':'Please select a pipeline to display ' + \
+                                  'this quantity'}}
+    indices = {name:(idx or 0) for name, idx in zip(sw.SWEEP_AXES, indices)}
+    return {'display':'block', 'height':600}, \
+           sw.make_sweep_figure(cube, quantity, x_dim, y_dim, indices)
+
+#######################################
+# What should the best dates button do?
+#######################################
+@app.callback(
+    [Output('seasonStore', 'data'),
+     Output('msgBoxSeasonBody', 'children'),
+     Output('msgboxSeason', 'is_open')
+    ],
+    [Input('season', 'n_clicks'),
+     Input('msgBoxSeasonClose', 'n_clicks')
+    ],
+    [State('seasonDateRow', 'date'),
+     State('seasonDaysRow', 'value'),
+     State('seasonElevationRow', 'value'),
+     State('targetNameRow', 'value'),
+     State('coordRow', 'value'),
+     State('nCoreRow', 'value'),
+     State('nRemoteRow', 'value'),
+     State('nIntRow', 'value'),
+     State('msgboxSeason', 'is_open')
+    ]
+)
+def on_season_click(n, close_msg_box, start_date, n_days, elevation_limit,
+                    src_name, coord, n_core, n_remote, n_int, is_open):
+    """Function defines what to do when the find best dates button is clicked"""
+    if (is_open is True and close_msg_box is not None) or n is None:
+        # Either the page has just loaded or the user has closed the
+        # error message box. Leave the current statistics untouched.
+        return dash.no_update, '', False
+    try:
+        coords = coord.split(',')
+        ra, dec = sc.get_radec(coords)
+        names = [name.strip() for name in src_name.split(',')] if src_name else []
+        if len(names) != len(coords):
+            names = ['Target {}'.format(idx+1) for idx in range(len(coords))]
+        sites = st.select_stations(*get_station_counts(n_core, n_remote, n_int))
+        season = ss.compute_season(ra, dec, str(start_date)[:10], int(n_days),
+                                   sites, float(elevation_limit))
+    except (AttributeError, TypeError, ValueError):
+        msg = 'Invalid setup. Please check the target coordinates, the ' + \
+              'first date, the number of days, and the elevation limit.'
+        return dash.no_update, msg, True
+    return ss.season_to_dict(names, season), '', False
+
+#######################################
+# Display the best dates heatmap
+#######################################
+@app.callback(
+    [Output('season-plot', 'style'),
+     Output('season-plot', 'figure')
+    ],
+    [Input('seasonStore', 'data'),
+     Input('seasonQuantityRow', 'value')
+    ]
+)
+def on_season_quantity_change(season_data, quantity):
+    """Function displays the stored visibility statistics. They are not
+       recomputed when the user picks a different quantity."""
+    if season_data is None:
+        return {'display':'none'}, {}
+    names, season = ss.season_from_dict(season_data)
+    return {'display':'block', 'height':600}, \
+           ss.make_season_figure(names, season, quantity)
+
+#######################################
+# What should the solve button do?
+#######################################
+@app.callback(
+    [Output('obsTimeRow', 'value'),
+     Output('nSbRow', 'value'),
+     Output('nCoreRow', 'value'),
+     Output('nRemoteRow', 'value'),
+     Output('nIntRow', 'value'),
+     Output('msgBoxSolveBody', 'children'),
+     Output('msgboxSolve', 'is_open')
+    ],
+    [Input('solve', 'n_clicks'),
+     Input('msgBoxSolveClose', 'n_clicks')
+    ],
+    [State('targetNoiseRow', 'value'),
+     State('solveForRow', 'value'),
+     State('obsTimeRow', 'value'),
+     State('nCoreRow', 'value'),
+     State('nRemoteRow', 'value'),
+     State('nIntRow', 'value'),
+     State('nSbRow', 'value'),
+     State('hbaDualRow', 'value'),
+     State('msgboxSolve', 'is_open')
+    ]
+)
+def on_solve_click(n, close_msg_box, target_noise, solve_for, obs_t, n_core,
+                   n_remote, n_int, n_sb, hba_mode, is_open):
+    """Function defines what to do when the solve button is clicked. Only the
+       radiometer equation is evaluated, so none of the plots are regenerated."""
+    no_change = [dash.no_update]*5
+    if (is_open is True and close_msg_box is not None) or n is None:
+        # Either the page has just loaded or the user has closed the
+        # error message box.
+        return no_change + ['', False]
+    n_core, n_remote, n_int = get_station_counts(n_core, n_remote, n_int)
+    try:
+        target_noise = float(target_noise)
+        if target_noise <= 0:
+            raise ValueError
+        n_core, n_remote, n_int = int(n_core), int(n_remote), int(n_int)
+        obs_t, n_sb = float(obs_t), int(n_sb)
+    except (TypeError, ValueError):
+        msg = 'Please specify a valid target sensitivity and observational setup.'
+        return no_change + [msg, True]
+    if solve_for in ['obs_t', 'n_sb'] and \
+       n_core + n_remote + n_int < bk.MIN_STATIONS:
+        msg = 'At least {} stations are needed to '.format(bk.MIN_STATIONS) + \
+              'reach a target sensitivity.'
+        return no_change + [msg, True]
+    if solve_for == 'obs_t':
+        value = bk.calculate_obs_time_for_noise(target_noise, n_core, n_remote,
+                                                n_int, hba_mode, n_sb)
+        if not np.isfinite(value):
+            msg = 'Target sensitivity cannot be reached with this array.'
+            return no_change + [msg, True]
+        return ['{:0.0f}'.format(np.ceil(value))] + no_change[1:] + ['', False]
+    if solve_for == 'n_sb':
+        value = bk.calculate_n_sb_for_noise(target_noise, n_core, n_remote,
+                                            n_int, hba_mode, obs_t)
+        if not np.isfinite(value):
+            msg = 'Target sensitivity cannot be reached with this array ' + \
+                  'and observation time.'
+            return no_change + [msg, True]
+        if value > bk.MAX_BEAMLETS:
+            msg = 'Target sensitivity requires {:0.0f} subbands. '.format(value) + \
+                  'At most {} subbands can be recorded.'.format(bk.MAX_BEAMLETS)
+            return no_change + [msg, True]
+        return [dash.no_update, '{:0.0f}'.format(value)] + no_change[2:] + \
+               ['', False]
+    value = bk.calculate_stations_for_noise(target_noise, n_core, n_remote, n_int,
+                                            hba_mode, obs_t, n_sb, solve_for)
+    if np.isnan(value):
+        msg = 'Target sensitivity cannot be reached by changing the number ' + \
+              'of {} stations alone.'.format(solve_for)
+        return no_change + [msg, True]
+    idx = ['core', 'remote', 'int'].index(solve_for) + 2
+    output = list(no_change)
+    output[idx] = '{:0.0f}'.format(value)
+    return output + ['', False]
 
 if __name__ == '__main__':
     app.run_server(debug=True, host='0.0.0.0', port=8051)
@@ -0,0 +1,16 @@
+"""Test configuration shared by all test modules"""
+
+import html
+import os
+import tempfile
+import fpdf.html
+
+# Keep the caches written by the tests out of the data root of the server,
+# and never send the test names to Simbad. Set before the calculator modules
+# are imported, as they read both at import time.
+os.environ['LUCI_DATA_DIR'] = tempfile.mkdtemp(prefix='luci-test-')
+os.environ['LUCI_RESOLVER'] = 'local'
+
+# fpdf 1.7.2 calls HTMLParser.unescape, which was removed in Python 3.9
+if not hasattr(fpdf.html.HTML2FPDF, 'unescape'):
+    fpdf.html.HTML2FPDF.unescape = staticmethod(html.unescape)
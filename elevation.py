@@ -0,0 +1,388 @@
+"""Array-based functions to compute the elevation of targets and bright solar
+   system objects as seen from the LOFAR sites.
+
+The elevation of every target at every time step and site is computed in a
+single NumPy pass using the local apparent sidereal time and the hour angle,
+instead of calling ephem once per time step. The J2000 coordinates are
+precessed (IAU 1976), nutated (leading IAU 1980 terms), and corrected for
+annual aberration, and the same atmospheric refraction model as ephem is
+applied, so the results agree with ephem to a few thousandths of a degree."""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from ephem import Sun, Moon, Jupiter
+import numpy as np
+import stations as st
+
+# Longitude (deg), latitude (deg), and height (m) of the sites used to compute
+# elevations. NL is the centre of the Dutch array, LV and IE the easternmost
+# and westernmost international stations.
+SITES = {'NL':(6.869882, 52.915129, 15.),
+         'LV':(21.854916, 57.553493, 0.),
+         'IE':(-7.921790, 53.094967, 0.)
+        }
+
+# Every LOFAR station can be used as a site as well
+SITES.update(st.STATIONS)
+
+# Default site: the centre of the Dutch array
+DUTCH_SITES = ['NL']
+
+# Atmospheric pressure (mbar) and temperature (C) used for refraction. Same as
+# the ephem defaults.
+PRESSURE = 1010.
+TEMPERATURE = 15.
+
+# Julian date of the J2000 epoch and the Unix epoch
+JD_J2000 = 2451545.0
+JD_UNIX = 2440587.5
+
+# Bright solar system objects that are plotted together with the targets
+SOLAR_BODIES = {'Sun':Sun, 'Moon':Moon, 'Jupiter':Jupiter}
+
+# Equatorial radius of the Earth in AU, used for the lunar parallax
+EARTH_RADIUS_AU = 6378.137/149597870.7
+
+# Number of decimals (in degrees) to which coordinates are rounded when
+# looking up cached elevation curves. 1e-4 deg is 0.36 arcsec.
+CACHE_COORD_DECIMALS = 4
+
+# Maximum number of elevation curves kept in the cache. Each curve of 288
+# time steps takes 2.3 kB.
+CACHE_MAX_CURVES = 20000
+
+def get_time_axis(obs_date, step=timedelta(minutes=5)):
+    """Return a list of datetime objects covering the day obs_date (a
+       YYYY-MM-DD string) in steps of step"""
+    d = obs_date.split('-')
+    start_time = datetime(int(d[0]), int(d[1]), int(d[2]), 0, 0, 0)
+    n_steps = int(np.ceil(timedelta(days=1)/step))
+    return [start_time + idx*step for idx in range(n_steps)]
+
+def get_julian_dates(times):
+    """Convert a list of naive UTC datetime objects into an array of Julian dates"""
+    epoch = datetime(1970, 1, 1)
+    seconds = np.asarray([(time - epoch).total_seconds() for time in times])
+    return JD_UNIX + seconds/86400.
+
+def get_nutation(jd):
+    """Return the nutation in longitude and obliquity and the true obliquity
+       of the ecliptic in radians for an array of Julian dates. Only the
+       leading terms of the IAU 1980 series are used (accurate to ~1")."""
+    t = (jd - JD_J2000)/36525.
+    node = np.radians(125.04452 - 1934.136261*t)
+    sun_long = np.radians(280.4665 + 36000.7698*t)
+    moon_long = np.radians(218.3165 + 481267.8813*t)
+    arcsec = np.pi/180./3600.
+    d_psi = (-17.20*np.sin(node) - 1.32*np.sin(2*sun_long) - \
+             0.23*np.sin(2*moon_long) + 0.21*np.sin(2*node))*arcsec
+    d_eps = (9.20*np.cos(node) + 0.57*np.cos(2*sun_long) + \
+             0.10*np.cos(2*moon_long) - 0.09*np.cos(2*node))*arcsec
+    mean_eps = np.radians(23.439291111) - (46.8150*t + 0.00059*t**2 - \
+                                           0.001813*t**3)*arcsec
+    return d_psi, d_eps, mean_eps + d_eps
+
+def get_precession_matrix(jd):
+    """Return the 3x3 IAU 1976 precession matrix from J2000 to the mean
+       equator and equinox of the Julian date jd"""
+    t = (jd - JD_J2000)/36525.
+    arcsec = np.pi/180./3600.
+    zeta = (2306.2181*t + 0.30188*t**2 + 0.017998*t**3)*arcsec
+    z = (2306.2181*t + 1.09468*t**2 + 0.018203*t**3)*arcsec
+    theta = (2004.3109*t - 0.42665*t**2 - 0.041833*t**3)*arcsec
+    cz, sz = np.cos(zeta), np.sin(zeta)
+    cth, sth = np.cos(theta), np.sin(theta)
+    cz2, sz2 = np.cos(z), np.sin(z)
+    return np.array([
+        [cz*cth*cz2 - sz*sz2, -sz*cth*cz2 - cz*sz2, -sth*cz2],
+        [cz*cth*sz2 + sz*cz2, -sz*cth*sz2 + cz*cz2, -sth*sz2],
+        [cz*sth, -sz*sth, cth]])
+
+def get_apparent_sidereal_time(jd):
+    """Return the Greenwich apparent sidereal time in radians for an array of
+       Julian dates. UT1 is assumed to be equal to UTC."""
+    t = (jd - JD_J2000)/36525.
+    gmst = 280.46061837 + 360.98564736629*(jd - JD_J2000) + 0.000387933*t**2 - \
+           t**3/38710000.
+    d_psi, _, true_eps = get_nutation(jd)
+    return np.radians(gmst % 360.) + d_psi*np.cos(true_eps)
+
+def precess_to_date(ra, dec, jd):
+    """Convert arrays of J2000 RA and Dec in degrees into the apparent RA and
+       Dec in radians at the Julian date jd (a scalar). Precession, nutation,
+       and aberration change by much less than an arcsecond over a day, so a
+       single date per day is sufficient."""
+    ra, dec = np.radians(np.asarray(ra, dtype=np.float64)), \
+              np.radians(np.asarray(dec, dtype=np.float64))
+    vec = np.stack([np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)])
+    x, y, z = np.tensordot(get_precession_matrix(jd), vec, axes=1)
+    date_ra = np.arctan2(y, x)
+    date_dec = np.arcsin(np.clip(z, -1., 1.))
+    # Apply nutation in RA and Dec
+    d_psi, d_eps, true_eps = get_nutation(jd)
+    tan_dec = np.tan(date_dec)
+    date_ra = date_ra + (np.cos(true_eps) + \
+                         np.sin(true_eps)*np.sin(date_ra)*tan_dec)*d_psi - \
+              np.cos(date_ra)*tan_dec*d_eps
+    date_dec = date_dec + np.sin(true_eps)*np.cos(date_ra)*d_psi + \
+               np.sin(date_ra)*d_eps
+    # Apply annual aberration (Meeus, Astronomical Algorithms, eq. 23.3)
+    t = (jd - JD_J2000)/36525.
+    mean_anomaly = np.radians(357.52911 + 35999.05029*t)
+    sun_long = np.radians(280.46646 + 36000.76983*t + \
+                          1.914602*np.sin(mean_anomaly) + \
+                          0.019993*np.sin(2*mean_anomaly))
+    ecc = 0.016708634 - 0.000042037*t
+    perihelion = np.radians(102.93735 + 1.71946*t)
+    kappa = np.radians(20.49552/3600.)
+    cos_ra, sin_ra = np.cos(date_ra), np.sin(date_ra)
+    cos_dec, sin_dec = np.cos(date_dec), np.sin(date_dec)
+    cos_eps, tan_eps = np.cos(true_eps), np.tan(true_eps)
+    d_ra = (-kappa*(cos_ra*np.cos(sun_long)*cos_eps + sin_ra*np.sin(sun_long)) + \
+            ecc*kappa*(cos_ra*np.cos(perihelion)*cos_eps + \
+                       sin_ra*np.sin(perihelion)))/cos_dec
+    tan_term = tan_eps*cos_dec - sin_ra*sin_dec
+    d_dec = -kappa*(np.cos(sun_long)*cos_eps*tan_term + \
+                    cos_ra*sin_dec*np.sin(sun_long)) + \
+            ecc*kappa*(np.cos(perihelion)*cos_eps*tan_term + \
+                       cos_ra*sin_dec*np.sin(perihelion))
+    return date_ra + d_ra, date_dec + d_dec
+
+def get_refraction(alt):
+    """Return the atmospheric refraction in degrees for an array of true
+       (unrefracted) altitudes in degrees. Uses the model of ephem/libastro:
+       the apparent altitude is found by iterating the correction that turns
+       an apparent altitude into a true altitude."""
+    alt = np.asarray(alt, dtype=np.float64)
+    apparent = alt.copy()
+    for _ in range(4):
+        apparent = alt + get_unrefraction(apparent)
+    return apparent - alt
+
+def get_unrefraction(apparent):
+    """Return the refraction in degrees at an array of apparent altitudes in
+       degrees"""
+    high = 7.888888e-5*PRESSURE/((273. + TEMPERATURE)* \
+                                 np.tan(np.radians(np.maximum(apparent, 15.))))
+    low_alt = np.minimum(apparent, 15.)
+    low = ((2e-5*low_alt + 1.96e-2)*low_alt + .1594)*PRESSURE/ \
+          ((273. + TEMPERATURE)*((8.45e-2*low_alt + 5.05e-1)*low_alt + 1.))
+    refraction = np.where(apparent >= 15., np.degrees(high), low)
+    # Refraction vanishes well below the horizon
+    return np.where(apparent < -5., 0., refraction)
+
+def get_unique_sites(sites):
+    """Return the sites in a list of site names that have distinct positions,
+       e.g. one of the core stations, in the order in which they appear"""
+    unique, positions = [], set()
+    for site in sites:
+        if SITES[site][:2] not in positions:
+            positions.add(SITES[site][:2])
+            unique.append(site)
+    return unique
+
+def get_site_arrays(sites):
+    """Return arrays of longitude and latitude in radians for a list of site
+       names"""
+    lon = np.radians([SITES[site][0] for site in sites])
+    lat = np.radians([SITES[site][1] for site in sites])
+    return lon, lat
+
+def compute_altitude(ra, dec, gast, lon, lat):
+    """Compute the true altitude in degrees by broadcasting apparent RA and
+       Dec (radians), Greenwich apparent sidereal time (radians), and site
+       longitude and latitude (radians) against each other."""
+    hour_angle = gast + lon - ra
+    sin_alt = np.sin(lat)*np.sin(dec) + np.cos(lat)*np.cos(dec)*np.cos(hour_angle)
+    return np.degrees(np.arcsin(np.clip(sin_alt, -1., 1.)))
+
+def compute_true_altitude(ra, dec, times, sites=None):
+    """Compute the true (unrefracted) altitude in degrees of a set of J2000
+       coordinates (see compute_target_elevation) with shape (targets, sites,
+       times)"""
+    sites = DUTCH_SITES if sites is None else sites
+    jd = get_julian_dates(times)
+    date_ra, date_dec = precess_to_date(np.atleast_1d(ra), np.atleast_1d(dec),
+                                        jd[len(jd)//2])
+    gast = get_apparent_sidereal_time(jd)
+    lon, lat = get_site_arrays(sites)
+    return compute_altitude(date_ra[:, np.newaxis, np.newaxis],
+                            date_dec[:, np.newaxis, np.newaxis],
+                            gast[np.newaxis, np.newaxis, :],
+                            lon[np.newaxis, :, np.newaxis],
+                            lat[np.newaxis, :, np.newaxis])
+
+def compute_target_elevation(ra, dec, times, sites=None):
+    """Compute the apparent elevation of a set of J2000 coordinates.
+       Input parameters:
+       * ra, dec - Arrays of RA and Dec in degrees
+       * times   - List of datetime objects (UTC)
+       * sites   - List of site names in SITES. Default: NL only.
+       Returns:
+       Array of elevations in degrees with shape (targets, sites, times)"""
+    alt = compute_true_altitude(ra, dec, times, sites)
+    return alt + get_refraction(alt)
+
+def compute_common_elevation(ra, dec, times, sites=None):
+    """Compute the elevation at which a set of J2000 coordinates is visible
+       from all sites, i.e. combine_sites(compute_target_elevation(...)).
+       Refraction increases monotonically with altitude, so the minimum over
+       the sites is taken first and refraction is only applied once per
+       target and time. Stations at the same position are only computed once.
+       Returns an array with shape (targets, times), NaN below the horizon."""
+    sites = DUTCH_SITES if sites is None else get_unique_sites(sites)
+    jd = get_julian_dates(times)
+    date_ra, date_dec = precess_to_date(np.atleast_1d(ra), np.atleast_1d(dec),
+                                        jd[len(jd)//2])
+    gast = get_apparent_sidereal_time(jd)
+    lon, lat = get_site_arrays(sites)
+    # The sine of the altitude (see compute_altitude) with the factors that
+    # do not depend on time computed once per target and site. arcsin is
+    # monotonic as well, so it is applied after taking the minimum.
+    sin_term = np.sin(lat)[np.newaxis, :]*np.sin(date_dec)[:, np.newaxis]
+    cos_term = np.cos(lat)[np.newaxis, :]*np.cos(date_dec)[:, np.newaxis]
+    offset = lon[np.newaxis, :] - date_ra[:, np.newaxis]
+    sin_alt = sin_term[:, :, np.newaxis] + cos_term[:, :, np.newaxis]* \
+              np.cos(gast[np.newaxis, np.newaxis, :] + offset[:, :, np.newaxis])
+    alt = np.degrees(np.arcsin(np.clip(np.min(sin_alt, axis=1), -1., 1.)))
+    elevation = alt + get_refraction(alt)
+    return np.where(elevation < 0, np.nan, elevation)
+
+def get_body_positions(name, times, step=timedelta(hours=1)):
+    """Compute the apparent geocentric RA and Dec (radians) and the distance
+       to the Earth (AU) of a solar system object at a list of times. ephem
+       is only evaluated every step and the positions are interpolated in
+       between, which is accurate to well below an arcsecond for hourly steps."""
+    start, end = times[0], times[-1]
+    n_nodes = int(np.ceil((end - start)/step)) + 1
+    nodes = [start + idx*step for idx in range(n_nodes)]
+    body = SOLAR_BODIES[name]()
+    node_ra, node_dec, node_dist = [np.zeros(n_nodes) for _ in range(3)]
+    for idx, node in enumerate(nodes):
+        body.compute(node)
+        node_ra[idx], node_dec[idx] = float(body.g_ra), float(body.g_dec)
+        node_dist[idx] = body.earth_distance
+    node_jd, jd = get_julian_dates(nodes), get_julian_dates(times)
+    ra = np.interp(jd, node_jd, np.unwrap(node_ra))
+    dec = np.interp(jd, node_jd, node_dec)
+    dist = np.interp(jd, node_jd, node_dist)
+    return ra, dec, dist
+
+def compute_body_elevation(name, times, sites=None):
+    """Compute the apparent elevation of the solar system object name (Sun,
+       Moon, or Jupiter) at a list of times. Includes the diurnal parallax,
+       which is only significant for the Moon.
+       Returns an array of elevations in degrees with shape (sites, times)."""
+    ra, dec, dist = get_body_positions(name, times)
+    return compute_body_altitude(ra, dec, dist, times, sites)
+
+def compute_body_altitude(ra, dec, dist, times, sites=None):
+    """Compute the apparent elevation of a solar system object from its
+       apparent geocentric RA and Dec (radians) and distance (AU) at a list
+       of times. Returns an array with shape (sites, times) in degrees."""
+    sites = DUTCH_SITES if sites is None else sites
+    gast = get_apparent_sidereal_time(get_julian_dates(times))
+    lon, lat = get_site_arrays(sites)
+    alt = compute_altitude(ra[np.newaxis, :], dec[np.newaxis, :],
+                           gast[np.newaxis, :], lon[:, np.newaxis],
+                           lat[:, np.newaxis])
+    parallax = np.degrees(np.arcsin(EARTH_RADIUS_AU/dist))
+    alt = alt - parallax[np.newaxis, :]*np.cos(np.radians(alt))
+    return alt + get_refraction(alt)
+
+def combine_sites(elevation):
+    """Reduce elevations with a site axis (second to last) to the elevation
+       at which a source is visible from every site: the minimum over the
+       sites, or NaN if the source is below the horizon at any of them."""
+    min_elevation = np.min(elevation, axis=-2)
+    return np.where(min_elevation < 0, np.nan, min_elevation)
+
+class ElevationCache(object):
+    """Bounded, thread-safe least-recently-used store of elevation curves.
+       Keys are (RA, Dec, date, site positions) tuples as made by make_key.
+       Values are read-only NumPy arrays. When the cache holds more than
+       max_curves curves, the least recently used ones are evicted."""
+
+    def __init__(self, max_curves=CACHE_MAX_CURVES):
+        self.max_curves = max_curves
+        self.hits = 0
+        self.misses = 0
+        self._curves = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def make_key(ra, dec, obs_date, sites):
+        """Return the cache key of a target at (ra, dec) in degrees seen from
+           a list of site names. Lists of sites with the same positions share
+           their curves."""
+        positions = tuple(sorted(set(SITES[site][:2] for site in sites)))
+        return (round(float(ra), CACHE_COORD_DECIMALS),
+                round(float(dec), CACHE_COORD_DECIMALS),
+                obs_date, positions)
+
+    def get(self, key):
+        """Return the curve stored under key, or None"""
+        with self._lock:
+            curve = self._curves.get(key)
+            if curve is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._curves.move_to_end(key)
+            return curve
+
+    def put(self, key, curve):
+        """Store a curve under key and evict the oldest curves if needed"""
+        curve.flags.writeable = False
+        with self._lock:
+            self._curves[key] = curve
+            self._curves.move_to_end(key)
+            while len(self._curves) > self.max_curves:
+                self._curves.popitem(last=False)
+
+    def clear(self):
+        """Remove all curves and reset the counters"""
+        with self._lock:
+            self._curves.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Return the hit and miss counters and the number of stored curves"""
+        with self._lock:
+            return {'hits':self.hits, 'misses':self.misses,
+                    'curves':len(self._curves), 'max_curves':self.max_curves}
+
+# Elevation curves shared by all requests handled by this process
+ELEVATION_CACHE = ElevationCache()
+
+def get_elevation_curves(ra, dec, obs_date, sites, cache=ELEVATION_CACHE,
+                         compute=compute_common_elevation):
+    """Return the elevation curves of a set of targets on obs_date (a
+       YYYY-MM-DD string) on the default 5 minute time axis. Curves are
+       looked up in cache first, and the missing ones are computed together
+       in one (targets, sites, times) pass and added to the cache.
+       Input parameters:
+       * ra, dec - Arrays of J2000 RA and Dec in degrees
+       * sites   - List of site names, e.g. the stations of an observation
+                   as returned by stations.select_stations. The elevation
+                   at which a target is visible from all of them is used.
+       * compute - Function that computes the missing curves, with the
+                   signature of compute_common_elevation, e.g.
+                   atlas.compute_elevation
+       Returns:
+       Array of elevations in degrees with shape (targets, times). NaN where
+       a target is below the horizon."""
+    ra, dec = np.atleast_1d(ra), np.atleast_1d(dec)
+    keys = [cache.make_key(this_ra, this_dec, obs_date, sites) \
+            for this_ra, this_dec in zip(ra, dec)]
+    curves = [cache.get(key) for key in keys]
+    missing = [idx for idx, curve in enumerate(curves) if curve is None]
+    if missing:
+        elevation = compute(ra[missing], dec[missing], get_time_axis(obs_date),
+                            sites)
+        for idx, curve in zip(missing, elevation):
+            cache.put(keys[idx], curve)
+            curves[idx] = curve
+    return np.asarray(curves)
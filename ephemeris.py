@@ -0,0 +1,150 @@
+"""Store of solar system ephemerides per observing date and site.
+
+The positions and elevations of the bright solar system objects only depend on
+the date and the site, so they are computed once per (date, site) and shared
+by the elevation plot, the distance table, and the rise and set solver in
+events.py. Each entry is also written to a small
+compressed NumPy file, so that a restarted server does not have to compute
+them again."""
+
+import os
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+import numpy as np
+import elevation as el
+import paths
+
+# Solar system objects in the order in which they are stored
+BODIES = ['Sun', 'Moon', 'Jupiter']
+
+# Directory in which the ephemeris files are stored, in the data root (see
+# paths.py). Set to None to only keep them in memory.
+EPHEMERIS_DIR = paths.get_data_path('ephemeris_cache')
+
+# Version of the file format. Bump this when the contents change so that old
+# files are ignored.
+EPHEMERIS_VERSION = 2
+
+# Maximum number of (date, site) entries kept in memory
+EPHEMERIS_MAX_ENTRIES = 1024
+
+# Fields of an ephemeris entry. ra, dec, dist, and alt have shape
+# (bodies, times).
+EPHEMERIS_FIELDS = ['jd', 'ra', 'dec', 'dist', 'alt']
+
+def jd_to_datetime(jd):
+    """Convert a Julian date into a naive UTC datetime object"""
+    return datetime(1970, 1, 1) + timedelta(days=float(jd) - el.JD_UNIX)
+
+def compute_ephemeris(obs_date, site):
+    """Compute the ephemeris of the objects in BODIES on obs_date (a
+       YYYY-MM-DD string) at site. Returns a dict with the fields in
+       EPHEMERIS_FIELDS:
+       * jd       - Julian dates of the default 5 minute time axis
+       * ra, dec  - Apparent geocentric RA and Dec in radians. Every 12th
+                    sample (i.e. every hour) is exactly as computed by ephem.
+       * dist     - Distance to the Earth in AU
+       * alt      - Apparent elevation at site in degrees"""
+    times = el.get_time_axis(obs_date)
+    n_times = len(times)
+    ephemeris = {'jd':el.get_julian_dates(times)}
+    for name in ['ra', 'dec', 'dist', 'alt']:
+        ephemeris[name] = np.zeros((len(BODIES), n_times))
+    for idx, name in enumerate(BODIES):
+        ra, dec, dist = el.get_body_positions(name, times)
+        ephemeris['ra'][idx], ephemeris['dec'][idx] = ra, dec
+        ephemeris['dist'][idx] = dist
+        ephemeris['alt'][idx] = el.compute_body_altitude(ra, dec, dist, times,
+                                                         [site])[0]
+    return ephemeris
+
+class EphemerisStore(object):
+    """Thread-safe store of ephemerides keyed by (date, site). Entries are
+       looked up in memory first, then on disk in directory, and computed
+       with compute_ephemeris if they are not found. Arrays are read-only."""
+
+    def __init__(self, directory=EPHEMERIS_DIR, max_entries=EPHEMERIS_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.loads = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get_path(self, obs_date, site):
+        """Return the name of the file in which an entry is stored"""
+        return os.path.join(self.directory, 'ephemeris_v{}_{}_{}.npz'.format(
+            EPHEMERIS_VERSION, obs_date, site))
+
+    def load(self, obs_date, site):
+        """Read an entry from disk. Return None if it is not available."""
+        if self.directory is None:
+            return None
+        try:
+            with np.load(self.get_path(obs_date, site)) as data:
+                return {name:data[name] for name in EPHEMERIS_FIELDS}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, obs_date, site, ephemeris):
+        """Write an entry to disk. The file is written under a temporary name
+           and then renamed, so readers never see a partially written file."""
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.npz')
+            with os.fdopen(handle, 'wb') as temp_file:
+                np.savez_compressed(temp_file, **ephemeris)
+            os.replace(temp_path, self.get_path(obs_date, site))
+        except OSError:
+            # The store still works from memory if the disk is not writable
+            pass
+
+    def get(self, obs_date, site='NL'):
+        """Return the ephemeris of obs_date (a YYYY-MM-DD string) at site"""
+        key = (obs_date, site)
+        with self._lock:
+            ephemeris = self._entries.get(key)
+            if ephemeris is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return ephemeris
+        # Load or compute outside the lock so that other dates are not blocked
+        ephemeris = self.load(obs_date, site)
+        if ephemeris is None:
+            ephemeris = compute_ephemeris(obs_date, site)
+            self.save(obs_date, site, ephemeris)
+            counter = 'misses'
+        else:
+            counter = 'loads'
+        for value in ephemeris.values():
+            value.flags.writeable = False
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self._entries[key] = ephemeris
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ephemeris
+
+    def info(self):
+        """Return the number of entries served from memory (hits), read from
+           disk (loads), and computed (misses)"""
+        with self._lock:
+            return {'hits':self.hits, 'loads':self.loads, 'misses':self.misses,
+                    'entries':len(self._entries), 'max_entries':self.max_entries}
+
+# Ephemerides shared by all requests handled by this process
+EPHEMERIS_STORE = EphemerisStore()
+
+def get_ephemeris(obs_date, site='NL'):
+    """Return the shared ephemeris of obs_date at site. See compute_ephemeris."""
+    return EPHEMERIS_STORE.get(obs_date, site)
+
+def get_body_index(name):
+    """Return the index of a solar system object in the ephemeris arrays"""
+    return BODIES.index(name)
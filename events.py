@@ -0,0 +1,265 @@
+"""Rise, set, and transit times of targets and solar system objects.
+
+Instead of searching sampled elevation curves, the times at which a target
+crosses a given elevation are found analytically from the hour angle of the
+crossing, for many targets and sites at once. Solar system objects move
+during the day, so their crossings are bracketed on the time axis of the
+shared ephemeris store and refined with a few Newton iterations on the hour
+angle, without any extra calls to ephem."""
+
+from datetime import datetime, timedelta
+import numpy as np
+import elevation as el
+import ephemeris as eph
+
+# Events returned by the solvers, in the order in which they are listed
+EVENTS = ['rise', 'transit', 'set']
+
+# Rotation rate of the Earth with respect to the equinox in radians per day
+SIDEREAL_RATE = 2.*np.pi*1.00273781191135448
+
+# Radii of the solar system objects in km as used by ephem, and the
+# astronomical unit in km
+BODY_RADII = {'Sun':696000., 'Moon':1738., 'Jupiter':71492.}
+AU_KM = 149597870.7
+
+# Number of iterations used for solar system objects
+BODY_ITERATIONS = 4
+
+# Number of grid points in hour angle and golden-section iterations used to
+# find the peak of the lowest elevation over several sites
+COMMON_PEAK_GRID = 360
+COMMON_PEAK_ITERATIONS = 30
+
+def get_day_start(obs_date):
+    """Return the Julian date of the start (00:00 UTC) of obs_date"""
+    return el.get_julian_dates(el.get_time_axis(obs_date)[:1])[0]
+
+def get_crossing_altitude(elevation, semidiameter=0., parallax=0.):
+    """Return the true geocentric altitude in degrees of the centre of an
+       object when its upper limb appears at elevation (degrees) after
+       refraction. semidiameter and parallax are in degrees."""
+    apparent = elevation - semidiameter
+    return apparent - el.get_unrefraction(apparent) + parallax
+
+def wrap_angle(angle):
+    """Wrap angles in radians into the range [-pi, pi)"""
+    return np.mod(angle + np.pi, 2.*np.pi) - np.pi
+
+def solve_events(ra, dec, altitude, jd0, lon, lat):
+    """Return the Julian dates of the first rise, upper transit, and set
+       after jd0 of objects at apparent RA and Dec (radians) that cross the
+       true altitude altitude (radians), as seen from sites at longitude and
+       latitude lon and lat (radians). All inputs broadcast against each
+       other. Rise and set are NaN if the object is always above or always
+       below altitude."""
+    gast0 = el.get_apparent_sidereal_time(jd0)
+    semi_arc = get_semi_arc(dec, altitude, lat)
+    semi_arc = np.where((semi_arc >= 0.) & (semi_arc < np.pi), semi_arc, np.nan)
+    transit_angle = ra - lon - gast0
+    return {'rise':jd0 + np.mod(transit_angle - semi_arc, 2.*np.pi)/SIDEREAL_RATE,
+            'transit':jd0 + np.mod(transit_angle, 2.*np.pi)/SIDEREAL_RATE,
+            'set':jd0 + np.mod(transit_angle + semi_arc, 2.*np.pi)/SIDEREAL_RATE}
+
+def find_target_events(ra, dec, obs_date, sites=None, elevation=0.):
+    """Find the times at which a set of J2000 coordinates rise above and set
+       below elevation (degrees, after refraction) and transit on obs_date.
+       Input parameters:
+       * ra, dec   - Arrays of J2000 RA and Dec in degrees
+       * obs_date  - Date as a YYYY-MM-DD string
+       * sites     - List of site names in el.SITES. Default: NL only.
+       * elevation - Elevation of the crossings in degrees
+       Returns:
+       A dict with the Julian dates of the events in EVENTS and the maximum
+       elevation in degrees (key max_elevation), each with shape (targets,
+       sites). Events are the first ones after the start of obs_date."""
+    sites = el.DUTCH_SITES if sites is None else sites
+    jd0 = get_day_start(obs_date)
+    date_ra, date_dec = el.precess_to_date(np.atleast_1d(ra), np.atleast_1d(dec),
+                                           jd0 + 0.5)
+    lon, lat = el.get_site_arrays(sites)
+    events = solve_events(date_ra[:, np.newaxis], date_dec[:, np.newaxis],
+                          np.radians(get_crossing_altitude(elevation)), jd0,
+                          lon[np.newaxis, :], lat[np.newaxis, :])
+    max_alt = 90. - np.degrees(np.abs(lat[np.newaxis, :] - date_dec[:, np.newaxis]))
+    events['max_elevation'] = max_alt + el.get_refraction(max_alt)
+    return events
+
+def get_body_track(name, obs_date, n_days=1):
+    """Return the Julian dates, apparent RA and Dec (radians, RA unwrapped),
+       and distance (AU) of a solar system object on the default time axis
+       of n_days consecutive days starting at obs_date, taken from the
+       shared ephemeris store"""
+    idx = eph.get_body_index(name)
+    start = datetime.strptime(obs_date, '%Y-%m-%d')
+    days = [eph.get_ephemeris((start + timedelta(days=day)).strftime('%Y-%m-%d')) \
+            for day in range(n_days)]
+    jd = np.concatenate([day['jd'] for day in days])
+    ra, dec, dist = [np.concatenate([day[field][idx] for day in days]) \
+                     for field in ['ra', 'dec', 'dist']]
+    return jd, np.unwrap(ra), dec, dist
+
+def find_first_crossings(values, rising):
+    """Return the index of the first sample after which values (last axis)
+       crosses zero upwards (rising=True) or downwards, or -1 if it does not"""
+    if rising:
+        crossing = (values[..., :-1] < 0.) & (values[..., 1:] >= 0.)
+    else:
+        crossing = (values[..., :-1] >= 0.) & (values[..., 1:] < 0.)
+    return np.where(crossing.any(axis=-1), np.argmax(crossing, axis=-1), -1)
+
+def find_body_events(name, obs_date, sites=None, elevation=0.,
+                     n_iter=BODY_ITERATIONS):
+    """Find the times at which the upper limb of a solar system object (see
+       eph.BODIES) rises above and sets below elevation (degrees, after
+       refraction), and the time at which it transits, for the first events
+       after the start of obs_date. The crossings are bracketed on the time
+       axis of the shared ephemeris store and then refined with Newton
+       iterations on the hour angle. The next day is only read if an event
+       does not happen on obs_date.
+       Returns a dict with the Julian dates of the events in EVENTS, each
+       with shape (sites,). NaN if an event does not happen within two days."""
+    sites = el.DUTCH_SITES if sites is None else sites
+    lon, lat = el.get_site_arrays(sites)
+    lon, lat = lon[:, np.newaxis], lat[:, np.newaxis]
+    for n_days in [1, 2]:
+        jd, ra, dec, dist = get_body_track(name, obs_date, n_days)
+        semidiameter = np.degrees(np.arcsin(BODY_RADII[name]/(dist*AU_KM)))
+        parallax = np.degrees(np.arcsin(el.EARTH_RADIUS_AU/dist))
+        crossing_alt = get_crossing_altitude(elevation, semidiameter, parallax)
+        gast = el.get_apparent_sidereal_time(jd)
+        offset = el.compute_altitude(ra, dec, gast, lon, lat) - crossing_alt
+        # Only accept sign changes of the hour angle near the meridian, not
+        # where it wraps around at -pi/pi
+        hour_angle = wrap_angle(gast + lon - ra)
+        brackets = {'rise':find_first_crossings(offset, True),
+                    'transit':find_first_crossings(np.where(
+                        np.abs(hour_angle) < np.pi/2., hour_angle, np.nan), True),
+                    'set':find_first_crossings(offset, False)}
+        if all(np.all(bracket >= 0) for bracket in brackets.values()):
+            break
+    # Rate of change of RA along the track in radians per day
+    ra_rate = np.gradient(ra, jd)
+    events = {}
+    for event, bracket in brackets.items():
+        found = bracket >= 0
+        idx = np.where(found, bracket, 0)
+        site = np.arange(len(sites))
+        # Start from a linear interpolation within the bracket
+        low, high = offset[site, idx], offset[site, idx+1]
+        if event == 'transit':
+            low, high = hour_angle[site, idx], hour_angle[site, idx+1]
+        t = jd[idx] + (jd[idx+1] - jd[idx])*low/(low - high)
+        for _ in range(n_iter):
+            this_ra = np.interp(t, jd, ra)
+            this_dec = np.interp(t, jd, dec)
+            if event == 'transit':
+                target_angle = 0.
+            else:
+                altitude = np.radians(np.interp(t, jd, crossing_alt))
+                cos_semi_arc = (np.sin(altitude) - \
+                                np.sin(lat[:, 0])*np.sin(this_dec))/ \
+                               (np.cos(lat[:, 0])*np.cos(this_dec))
+                semi_arc = np.arccos(np.clip(cos_semi_arc, -1., 1.))
+                target_angle = -semi_arc if event == 'rise' else semi_arc
+            angle = el.get_apparent_sidereal_time(t) + lon[:, 0] - this_ra
+            rate = SIDEREAL_RATE - np.interp(t, jd, ra_rate)
+            t = t + wrap_angle(target_angle - angle)/rate
+        events[event] = np.where(found, t, np.nan)
+    return events
+
+def get_semi_arc(dec, altitude, lat):
+    """Return half the hour angle range (radians) during which objects at
+       apparent Dec dec are above the true altitude altitude as seen from
+       latitude lat (all in radians): pi if they are always above and -1 if
+       they are never above. Inputs broadcast against each other."""
+    cos_semi_arc = (np.sin(altitude) - np.sin(lat)*np.sin(dec))/ \
+                   (np.cos(lat)*np.cos(dec))
+    return np.where(cos_semi_arc > 1., -1.,
+                    np.arccos(np.clip(cos_semi_arc, -1., 1.)))
+
+def find_common_window_edges(times, ra, jd0, lon, semi_arc):
+    """Return the earliest of times (shape (targets, sites)), the per-site
+       crossings of targets at apparent RA ra (shape (targets,)), at which
+       the target is above the crossing altitude at every site, i.e. the
+       edges of the window in which it is up everywhere. NaN if there is
+       none. lon and semi_arc (see get_semi_arc) have shape (sites,) and
+       (targets, sites)."""
+    gast = el.get_apparent_sidereal_time(jd0) + SIDEREAL_RATE*(times - jd0)
+    # Hour angle at every site (last axis) at each crossing time
+    hour_angle = wrap_angle(gast[:, :, np.newaxis] + \
+                            lon[np.newaxis, np.newaxis, :] - \
+                            ra[:, np.newaxis, np.newaxis])
+    # The crossing site itself is exactly at the edge of its range
+    up_everywhere = np.all(np.abs(hour_angle) <= semi_arc[:, np.newaxis, :] + 1e-6,
+                           axis=-1)
+    candidates = np.where(up_everywhere & np.isfinite(times), times, np.inf)
+    edges = np.min(candidates, axis=-1)
+    return np.where(np.isfinite(edges), edges, np.nan)
+
+def find_common_peak(dec, lon, lat, n_grid=COMMON_PEAK_GRID,
+                     n_iter=COMMON_PEAK_ITERATIONS):
+    """Return the Greenwich hour angle (GAST - RA in radians) at which the
+       lowest true altitude over the sites of objects at apparent Dec dec
+       (shape (targets,)) peaks, and that altitude in degrees. lon and lat
+       have shape (sites,). The peak is found on a grid and refined with a
+       golden-section search."""
+    def get_lowest_altitude(angle):
+        return np.min(el.compute_altitude(0., dec[:, np.newaxis, np.newaxis],
+                                          angle[:, np.newaxis, :],
+                                          lon[np.newaxis, :, np.newaxis],
+                                          lat[np.newaxis, :, np.newaxis]), axis=1)
+    step = 2.*np.pi/n_grid
+    grid = np.broadcast_to(np.arange(n_grid)*step, (len(dec), n_grid))
+    best = grid[np.arange(len(dec)), np.argmax(get_lowest_altitude(grid), axis=-1)]
+    low, high = best - step, best + step
+    ratio = (np.sqrt(5.) - 1.)/2.
+    for _ in range(n_iter):
+        left, right = high - ratio*(high - low), low + ratio*(high - low)
+        values = get_lowest_altitude(np.stack([left, right], axis=-1))
+        go_right = values[:, 1] > values[:, 0]
+        low, high = np.where(go_right, left, low), np.where(go_right, high, right)
+    peak = (low + high)/2.
+    return peak, get_lowest_altitude(peak[:, np.newaxis])[:, 0]
+
+def find_common_events(ra, dec, obs_date, sites=None, elevation=0.):
+    """Find the events of a set of J2000 coordinates (see
+       find_target_events) for the window in which they are above elevation
+       at every site at the same time.
+       Returns a dict with the Julian dates of the events in EVENTS and the
+       maximum elevation in degrees, each with shape (targets,). Rise and set
+       are the first edges of the window after the start of obs_date, and NaN
+       if the target is always above or never above elevation at all sites
+       together. The transit is the time at which the lowest elevation over
+       the sites peaks, and max_elevation is that elevation."""
+    sites = el.DUTCH_SITES if sites is None else sites
+    jd0 = get_day_start(obs_date)
+    date_ra, date_dec = el.precess_to_date(np.atleast_1d(ra), np.atleast_1d(dec),
+                                           jd0 + 0.5)
+    lon, lat = el.get_site_arrays(sites)
+    altitude = np.radians(get_crossing_altitude(elevation))
+    site_events = solve_events(date_ra[:, np.newaxis], date_dec[:, np.newaxis],
+                               altitude, jd0, lon[np.newaxis, :],
+                               lat[np.newaxis, :])
+    semi_arc = get_semi_arc(date_dec[:, np.newaxis], altitude, lat[np.newaxis, :])
+    # The window can only open when the last site sees the target rise, and
+    # close when the first site sees it set
+    events = {event:find_common_window_edges(site_events[event], date_ra, jd0, lon,
+                                             semi_arc) for event in ['rise', 'set']}
+    peak, max_alt = find_common_peak(date_dec, lon, lat)
+    gast0 = el.get_apparent_sidereal_time(jd0)
+    events['transit'] = jd0 + np.mod(peak + date_ra - gast0, 2.*np.pi)/SIDEREAL_RATE
+    events['max_elevation'] = max_alt + el.get_refraction(max_alt)
+    return events
+
+def to_datetime(jd):
+    """Convert a Julian date into a naive UTC datetime object, or None if it
+       is NaN"""
+    return None if np.isnan(jd) else eph.jd_to_datetime(jd)
+
+def get_rise_and_set(obs_date, site, name):
+    """Return the first rise and set times of a solar system object after the
+       start of obs_date at site as datetime objects, or None if the object
+       does not rise or set."""
+    events = find_body_events(name, obs_date, [site])
+    return [to_datetime(events['rise'][0]), to_datetime(events['set'][0])]
@@ -1,11 +1,45 @@
-"""Functions to generate PDF file"""
+"""Functions to generate PDF file
 
+Run this module to generate a report comparing several setups, read from a
+JSONL or CSV file in the format of batch.py, e.g.
+    python generatepdf.py setups.jsonl -o report.pdf --processes 4
+"""
+
+import argparse
+import html
+import multiprocessing
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import os
+from io import BytesIO
+import zlib
 from fpdf import FPDF, HTMLMixin
+import numpy as np
 import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.patches import Rectangle
+from backend import calculate_results, format_results
+import batch
+import targetvis as tv
+import stations as st
+
+# Resolution of the target visibility plot in the pdf file
+PLOT_DPI = 100
+
+# Name under which the target visibility plot is placed in the pdf file
+PLOT_IMAGE_NAME = 'elevation_plot'
+
+# Default number of worker processes that render the pages of a report
+REPORT_PROCESSES = 4
+
+# Number of pages per worker process that are prepared ahead of the page
+# being written to a report
+REPORT_PAGES_AHEAD = 2
+
+# Maximum length of the target names in the summary table of a report
+REPORT_TARGETS_LENGTH = 22
 
 # Dummy class needed to generate the PDF file
 class MyFPDF(FPDF, HTMLMixin):
@@ -26,19 +60,23 @@ def convert_figure_to_axis_info(figure):
     label = figure['name']
     return xaxis, yaxis, label
 
-def make_pdf_plot(elevation_fig, outfilename):
-    """For a given elevation_fig object and output filename, generate a
-       matplotlib plot and write it to disk."""
-    fig, ax = plt.subplots(1, 1, figsize=(8, 5))
+def make_pdf_plot(elevation_fig):
+    """For a given elevation_fig object, generate a matplotlib figure with
+       its own Agg canvas. The pyplot state machine is not used, so the
+       figure is freed as soon as it is no longer referenced and plots can
+       be drawn in several threads at once."""
+    fig = Figure(figsize=(8, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
     for figure in elevation_fig['data']:
         xaxis, yaxis, label = convert_figure_to_axis_info(figure)
         ax.plot(xaxis, yaxis, label=label)
     hour_loc = (0, 3, 6, 9, 12, 15, 18, 21)
     ax.xaxis.set_major_locator(mdates.HourLocator(hour_loc))
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-    plt.xlabel('Time (UTC)', fontsize=14)
-    plt.ylabel('Elevation (deg)', fontsize=14)
-    plt.title('Target visibility plot', fontsize=14)
+    ax.set_xlabel('Time (UTC)', fontsize=14)
+    ax.set_ylabel('Elevation (deg)', fontsize=14)
+    ax.set_title('Target visibility plot', fontsize=14)
 
     # Highlight sunrise
     sun_rise_dict = elevation_fig['layout']['shapes'][0]
@@ -64,33 +102,113 @@ def make_pdf_plot(elevation_fig, outfilename):
                      edgecolor=None, facecolor='lightskyblue')
     ax.add_patch(rect)
 
-    plt.ylim([0, 90])
+    # Mark the transits of the targets
+    for annotation in elevation_fig['layout'].get('annotations', []):
+        x_transit = datetime.strptime(str(annotation['x']).split('.')[0],
+                                      '%Y-%m-%dT%H:%M:%S')
+        ax.plot(x_transit, annotation['y'], marker='v', color='black')
+
+    ax.set_ylim([0, 90])
 
     if len(elevation_fig['data']) > 1:
         ax.legend(fontsize=14)
-    plt.tight_layout()
-    plt.savefig(outfilename, dpi=100)
+    fig.tight_layout()
+    return fig
+
+def render_pdf_image(fig, dpi=PLOT_DPI):
+    """Render a matplotlib figure into an in-memory buffer and return it as
+       an image that can be placed in an FPDF document (see add_pdf_image).
+       The RGB pixels are compressed directly, so no PNG file has to be
+       written and parsed again."""
+    fig.set_dpi(dpi)
+    buf = BytesIO()
+    fig.savefig(buf, format='raw', dpi=dpi)
+    width, height = fig.canvas.get_width_height()
+    rgba = np.frombuffer(buf.getbuffer(), dtype=np.uint8).reshape(height, width, 4)
+    return {'w':width, 'h':height, 'cs':'DeviceRGB', 'bpc':8, 'f':'FlateDecode',
+            'pal':'', 'trns':'', 'data':zlib.compress(rgba[:, :, :3].tobytes())}
+
+def add_pdf_image(pdf, name, image):
+    """Register an image made by render_pdf_image under name, so that it can
+       be placed with pdf.image(name, ...) or <img src=name> in HTML. This
+       fills in the internal image table of fpdf 1.7.2, which is why fpdf is
+       pinned in requirements.txt. test_generatepdf.py compares the entry
+       with the one fpdf makes for a PNG file."""
+    image = dict(image, i=len(pdf.images) + 1)
+    pdf.images[name] = image
+
+def escape_html(text):
+    """Escape text for the HTML passed to pdf.write_html. fpdf 1.7.2 unescapes
+       the whole HTML string before parsing it, so the text is escaped twice:
+       it is still escaped once when it reaches the parser, which turns it
+       back into plain text."""
+    return html.escape(html.escape(str(text)))
+
+def format_value(value):
+    """Format a number from an ObservationSetup for display in the pdf file.
+       Whole numbers are printed without a decimal point."""
+    if isinstance(value, float) and value.is_integer():
+        return '{:d}'.format(int(value))
+    return '{}'.format(value)
 
-def generate_pdf(pdf_file, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan, n_sb, integ_t,
-                 antenna_set, coord, pipe_type, t_avg, f_avg, is_dysco, im_noise_val,
-                 raw_size, proc_size, pipe_time, elevation_fig, distance_table,
-                 obs_date, obs_mode, tab_mode, stokes):
+def generate_pdf(pdf_file, setup, results, elevation_fig, distance_table):
     """Function to generate a pdf file summarizing the content of the calculator.
+       Input parameters:
+       * pdf_file       - Name of the output pdf file
+       * setup          - backend.ObservationSetup describing the observation
+       * results        - Output of backend.calculate_results for setup
+       * elevation_fig  - Target visibility plot ({} if there are no targets)
+       * distance_table - Distance table figure ({} if there are no targets)
        Return nothing."""
+    with open(pdf_file, 'wb') as out_file:
+        out_file.write(build_pdf(setup, results, elevation_fig, distance_table))
+
+def build_pdf(setup, results, elevation_fig, distance_table):
+    """Build the summary pdf file (see generate_pdf) in memory and return its
+       contents as bytes"""
     # Create an A4 sheet
     pdf = MyFPDF('P', 'mm', 'A4')
+    add_setup_page(pdf, setup, results, elevation_fig, distance_table)
+
+    # Return the pdf. FPDF builds the document as a latin-1 string.
+    return pdf.output(dest='S').encode('latin-1')
+
+def get_setup_events(setup):
+    """Return the rise, transit, and set times of the targets of setup (see
+       targetvis.get_target_events) for the stations of setup"""
+    stations = st.select_stations(setup.n_core, setup.n_remote, setup.n_int)
+    return tv.get_target_events(','.join(setup.src_names), list(setup.coords),
+                                setup.obs_date, setup.n_int, stations=stations)
+
+def add_setup_page(pdf, setup, results, elevation_fig, distance_table, title=None,
+                   image=None, image_name=PLOT_IMAGE_NAME, events=None):
+    """Add the summary of a single setup (see generate_pdf) to pdf on a new
+       page. title is written above the summary if given. image is the
+       rendered target visibility plot (see render_pdf_image); it is rendered
+       from elevation_fig if not given. image_name must be unique within
+       the document. events are the rise, transit, and set times of the
+       targets (see get_setup_events); they are computed if not given."""
     pdf.add_page()
     pdf.set_font('Arial', '', 16)
 
-    if coord is not '':
-        coord_list = coord.split(',')
-        coord_input_list = coord.split(',')
-        n_sap=len(coord_list)
-    else:
-        n_sap=None
+    obs_mode, tab_mode, stokes = setup.obs_mode, setup.tab_mode, setup.stokes
+    obs_t, cal_t = format_value(setup.obs_t), format_value(setup.cal_t)
+    n_cal, n_core = setup.n_cal, setup.n_core
+    n_remote, n_int = setup.n_remote, setup.n_int
+    n_sb, n_chan, integ_t = setup.n_sb, setup.n_chan, format_value(setup.integ_t)
+    antenna_set, pipe_type = setup.hba_mode, setup.pipe_type
+    t_avg, f_avg, is_dysco = setup.t_avg, setup.f_avg, setup.dy_compress
+    obs_date = setup.obs_date
+    n_sap = len(setup.coords) if setup.coords else None
+    formatted = format_results(results)
+    im_noise_val, raw_size = formatted['im_noise'], formatted['raw_size']
+    proc_size, pipe_time = formatted['proc_size'], formatted['pipe_time']
 
     # Generate an html string to be written to the file
-    string = '<table border="0" align="left" width="80%">'
+    string = ''
+    if title is not None:
+        string += '<center><b>{}</b></center>'.format(escape_html(title))
+    string += '<table border="0" align="left" width="80%">'
     string += '<thead><tr><th width="70%" align="left">Parameter</th>'
     string += '<th width="30%" align="left">Value</th></tr></thead>'
     string += '<tbody>'
@@ -167,24 +285,47 @@ def generate_pdf(pdf_file, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan,
     # visibility plot
     if elevation_fig != {}:
         # User has specified at least one source in the target setup
-        png_file_name = pdf_file.replace('summary', 'plot').replace('pdf', 'png')
-        make_pdf_plot(elevation_fig, png_file_name)
+        if image is None:
+            image = render_pdf_image(make_pdf_plot(elevation_fig))
+        add_pdf_image(pdf, image_name, image)
         # Add the elevation plot to html
         string += '<center>'
-        string += '<img src={} width=400 height=250>'.format(png_file_name)
+        string += '<img src={} width=400 height=250>'.format(image_name)
         string += '</center>'
 
+    # Add the rise, transit, and set times of the targets to the PDF
+    if elevation_fig != {} and setup.coords:
+        string += '<center><b>Rise, transit, and set times (UTC)</b></center>'
+        string += '<table border="0" align="left" width="80%">'
+        string += '<thead><tr>'
+        for item in ['Target', 'Rise', 'Transit', 'Set', 'Max. elevation']:
+            string += '<th width="20%" align="left">' + item + '</th>'
+        string += '</tr></thead>'
+        string += '<tbody>'
+        if events is None:
+            events = get_setup_events(setup)
+        for item in events:
+            string += '<tr><td>{}</td>'.format(escape_html(item['name']))
+            for event in ['rise', 'transit', 'set']:
+                if item[event] is None:
+                    string += '<td>-</td>'
+                else:
+                    string += '<td>{:%H:%M}</td>'.format(item[event])
+            string += '<td>{:0.2f}</td></tr>'.format(item['max_elevation'])
+        string += '</tbody>'
+        string += '</table>'
+
     # Add the distance table to the PDF
     if distance_table != {}:
         title = distance_table['layout']['title']
-        string += '<center><b>{}</b></center>'.format(title)
+        string += '<center><b>{}</b></center>'.format(escape_html(title))
         string += '<table border="0" align="left" width="80%">'
         col_titles = distance_table['data'][0]['header']['values']
         col_width = 100//len(col_titles)
         string += '<thead><tr>'
         for item in col_titles:
             string += '<th width="{}%" align="left">'.format(col_width) + \
-                      item + '</th>'
+                      escape_html(item) + '</th>'
         string += '</tr></thead>'
         string += '<tbody>'
         tab_data = distance_table['data'][0]['cells']['values']
@@ -193,7 +334,7 @@ def generate_pdf(pdf_file, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan,
         for row in tab_data:
             string += '<tr>'
             for item in row:
-                string += '<td>{}</td>'.format(item)
+                string += '<td>{}</td>'.format(escape_html(item))
             string += '</tr>'
         string += '</tbody>'
         string += '</table>'
@@ -201,9 +342,185 @@ def generate_pdf(pdf_file, obs_t, cal_t, n_cal, n_core, n_remote, n_int, n_chan,
     # Write text to the pdf file
     pdf.write_html(string)
 
-    # Write the pdf to disk
-    pdf.output(pdf_file)
+def get_setup_names(setups):
+    """Return the default names of setups in a report: Setup 1, Setup 2, ..."""
+    return ['Setup {}'.format(idx + 1) for idx in range(len(setups))]
 
-    # Remove the temporary PNG file from disk
-    if elevation_fig != {}:
-        os.remove(png_file_name)
+def prepare_report_page(setup):
+    """Compute everything that is needed to add the page of setup to a
+       report: its results, figures, rendered target visibility plot, and
+       target events. Runs in a worker process, so the return value is a
+       plain dict."""
+    results = calculate_results(setup)
+    elevation_fig, distance_table, image, events = {}, {}, None, None
+    if setup.coords:
+        elevation_fig, _, distance_table = tv.make_setup_figures(setup)
+        elevation_fig = tv.figure_to_dict(elevation_fig)
+        distance_table = tv.figure_to_dict(distance_table)
+        image = render_pdf_image(make_pdf_plot(elevation_fig))
+        events = get_setup_events(setup)
+    return {'results':results, 'elevation_fig':elevation_fig,
+            'distance_table':distance_table, 'image':image, 'events':events}
+
+def make_report_pool(processes=REPORT_PROCESSES):
+    """Return a pool of processes worker processes that prepare the pages of
+       reports. It can be shared by several reports. The processes are
+       spawned rather than forked, as reports are also built on the threads
+       of the web server."""
+    return ProcessPoolExecutor(max_workers=processes,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+def iter_report_pages(setups, processes=REPORT_PROCESSES, pool=None,
+                      max_pending=None):
+    """Prepare the pages of an iterable of setups (see prepare_report_page)
+       and yield them in input order. The pages are prepared by pool, or by a
+       pool of processes worker processes that is made for this call if pool
+       is None. At most max_pending pages (default: REPORT_PAGES_AHEAD per
+       process) are in flight at any time."""
+    if pool is None and processes <= 1:
+        for setup in setups:
+            yield prepare_report_page(setup)
+        return
+    if max_pending is None:
+        max_pending = REPORT_PAGES_AHEAD*processes
+    if pool is None:
+        with make_report_pool(processes) as pool:
+            yield from iter_report_pages(setups, processes, pool, max_pending)
+        return
+    setups = iter(setups)
+    pending = deque()
+    while True:
+        while len(pending) < max_pending:
+            setup = next(setups, None)
+            if setup is None:
+                break
+            pending.append(pool.submit(prepare_report_page, setup))
+        if not pending:
+            break
+        yield pending.popleft().result()
+
+def add_summary_page(pdf, names, setups, results):
+    """Add a table comparing setups (named names) to pdf on a new page.
+       results holds the output of backend.calculate_results for each setup."""
+    pdf.add_page()
+    pdf.set_font('Arial', '', 16)
+    string = '<center><b>Summary of {} setups</b></center>'.format(len(setups))
+    columns = [('Setup', 12), ('Targets', 22), ('Date', 12), ('Time (h)', 8),
+               ('Stations', 12), ('Subbands', 8), ('Noise', 9), ('Raw (GB)', 8),
+               ('Proc. (GB)', 9)]
+    string += '<font size="9">'
+    string += '<table border="0" align="left" width="100%">'
+    string += '<thead><tr>'
+    for item, width in columns:
+        string += '<th width="{}%" align="left">{}</th>'.format(width, item)
+    string += '</tr></thead>'
+    string += '<tbody>'
+    for name, setup, result in zip(names, setups, results):
+        formatted = format_results(result)
+        targets = ', '.join(setup.src_names) if setup.src_names else '-'
+        if len(targets) > REPORT_TARGETS_LENGTH:
+            targets = targets[:REPORT_TARGETS_LENGTH - 3] + '...'
+        if setup.obs_mode == 'Beamformed' and setup.tab_mode == 'Coherent':
+            stations = (setup.n_core, 0, 0)
+        else:
+            stations = (setup.n_core, setup.n_remote, setup.n_int)
+        is_imaging = setup.obs_mode == 'Interferometric'
+        row = [name, targets, setup.obs_date if setup.coords else '-',
+               format_value(round(setup.obs_t/3600., 2)),
+               '({}, {}, {})'.format(*stations), setup.n_sb,
+               formatted['im_noise'] if is_imaging else '-',
+               formatted['raw_size'],
+               formatted['proc_size'] if setup.pipe_type != 'none' else '-']
+        string += '<tr>'
+        for item in row:
+            string += '<td>{}</td>'.format(escape_html(item))
+        string += '</tr>'
+    string += '</tbody>'
+    string += '</table>'
+    string += '</font>'
+    string += '<br>Noise is the theoretical image sensitivity in uJy/beam. '
+    string += 'Stations are given as (core, remote, international).'
+    pdf.write_html(string)
+
+def generate_report(pdf_file, setups, names=None, processes=REPORT_PROCESSES):
+    """Function to generate a pdf file comparing several setups.
+       Input parameters:
+       * pdf_file  - Name of the output pdf file
+       * setups    - List of backend.ObservationSetup
+       * names     - Name of each setup (default: Setup 1, Setup 2, ...)
+       * processes - Number of worker processes rendering the pages
+       Return nothing."""
+    with open(pdf_file, 'wb') as out_file:
+        out_file.write(build_report(setups, names, processes))
+
+def build_report(setups, names=None, processes=REPORT_PROCESSES, pool=None):
+    """Build a report (see generate_report) in memory and return its contents
+       as bytes. Every setup gets its own page as in generate_pdf, and the
+       last page holds a table summarizing all setups. The pages are
+       prepared by worker processes (see iter_report_pages), by pool if
+       given. Each page is written as soon as it is ready, so only a few raw
+       plots and figures are held at any time. The list of setups and the
+       finished document itself are held in memory, however: FPDF keeps every
+       compressed page and image until the document is output."""
+    setups = list(setups)
+    names = get_setup_names(setups) if names is None else list(names)
+    pdf = MyFPDF('P', 'mm', 'A4')
+    results = []
+    for idx, page in enumerate(iter_report_pages(setups, processes, pool)):
+        add_setup_page(pdf, setups[idx], page['results'], page['elevation_fig'],
+                       page['distance_table'], title=names[idx],
+                       image=page['image'],
+                       image_name='{}_{}'.format(PLOT_IMAGE_NAME, idx),
+                       events=page['events'])
+        results.append(page['results'])
+    # The summary reuses the results computed by the workers
+    add_summary_page(pdf, names, setups, results)
+
+    # FPDF builds the document as a latin-1 string
+    return pdf.output(dest='S').encode('latin-1')
+
+def read_report_setups(infile, fmt):
+    """Read and parse the setups of a report from an open file in the jsonl
+       or csv format of batch.py. Return the setups and their names: the id
+       field of a setup, or its row number. Invalid setups are reported on
+       stderr and skipped."""
+    def report(row, msg):
+        print('Skipping row {}: {}'.format(row, msg), file=sys.stderr)
+    setups, names = [], []
+    for row, setup in enumerate(batch.read_setups(infile, fmt, report)):
+        if setup is None:
+            # Already reported
+            continue
+        parsed, msg = batch.parse_setup_fields(setup)
+        if parsed is None:
+            print('Skipping row {}: {}'.format(row, msg), file=sys.stderr)
+            continue
+        setups.append(parsed)
+        names.append(str(setup.get('id') or 'Setup {}'.format(row + 1)))
+    return setups, names
+
+def main(argv=None):
+    """Entry point of the command-line tool to generate a report"""
+    parser = argparse.ArgumentParser(description='Generate a pdf report '+\
+                                                 'comparing several LOFAR '+\
+                                                 'observation setups.')
+    parser.add_argument('infile', help='Input JSONL or CSV file with one setup '+\
+                                       'per line/row, as for batch.py')
+    parser.add_argument('-o', '--outfile', default='report.pdf',
+                        help='Output pdf file (default: report.pdf)')
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'], default=None,
+                        help='Input format. Guessed from the file extension.')
+    parser.add_argument('-p', '--processes', type=int, default=REPORT_PROCESSES,
+                        help='Number of worker processes (default: {})'.format(
+                            REPORT_PROCESSES))
+    args = parser.parse_args(argv)
+
+    fmt = args.input_format or batch.guess_format(args.infile)
+    with open(args.infile, newline='') as infile:
+        setups, names = read_report_setups(infile, fmt)
+    if not setups:
+        parser.error('No valid setups in {}'.format(args.infile))
+    generate_report(args.outfile, setups, names, args.processes)
+
+if __name__ == '__main__':
+    main()
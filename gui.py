@@ -2,6 +2,8 @@ import dash_html_components as html
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 from datetime import date
+from sweep import SWEEP_AXES, SWEEP_LABELS, SWEEP_QUANTITIES
+from seasons import SEASON_LABELS, SEASON_QUANTITIES
 
 ###############################################################################
 # Define a modal to display error messages for observation time
@@ -23,8 +25,7 @@ msgBoxFAvg = dbc.Modal([
                        ], id='msgboxFAvg', centered=True)
 msgBoxResolve = dbc.Modal([
                          dbc.ModalHeader(modalHeader),
-                         dbc.ModalBody('Unable to resolve the source name. Please ' + \
-                                       'specify the coordinates manually.'),
+                         dbc.ModalBody('', id='msgBoxResolveBody'),
                          dbc.ModalFooter(
                                         dbc.Button('Close', id='mbResolveClose')
                                         )
@@ -44,6 +45,34 @@ msgBox = dbc.Modal([
                                      dbc.Button('Close', id='msgBoxClose')
                                      )
                    ], id='msgbox', centered=True)
+msgBoxSweep = dbc.Modal([
+                      dbc.ModalHeader(modalHeader),
+                      dbc.ModalBody('', id='msgBoxSweepBody'),
+                      dbc.ModalFooter(
+                                     dbc.Button('Close', id='msgBoxSweepClose')
+                                     )
+                   ], id='msgboxSweep', centered=True)
+msgBoxSeason = dbc.Modal([
+                      dbc.ModalHeader(modalHeader),
+                      dbc.ModalBody('', id='msgBoxSeasonBody'),
+                      dbc.ModalFooter(
+                                     dbc.Button('Close', id='msgBoxSeasonClose')
+                                     )
+                   ], id='msgboxSeason', centered=True)
+msgBoxLotss = dbc.Modal([
+                      dbc.ModalHeader(html.H2('Nearest LoTSS pointings')),
+                      dbc.ModalBody('', id='msgBoxLotssBody'),
+                      dbc.ModalFooter(
+                                     dbc.Button('Close', id='msgBoxLotssClose')
+                                     )
+                   ], id='msgboxLotss', centered=True)
+msgBoxSolve = dbc.Modal([
+                      dbc.ModalHeader(modalHeader),
+                      dbc.ModalBody('', id='msgBoxSolveBody'),
+                      dbc.ModalFooter(
+                                     dbc.Button('Close', id='msgBoxSolveClose')
+                                     )
+                   ], id='msgboxSolve', centered=True)
 
 ###############################################################################
 # Default values for various input fields
@@ -69,6 +98,21 @@ defaultParams = {'obsMode':'Interferometric',
 
                  'targetName':'',
                  'target_coord':'',
+
+                 'solveFor':'obs_t',
+
+                 'sweepObsTime':'3600:28800:8',
+                 'sweepNsb':'61,122,244,488',
+                 'sweepIntTime':'1',
+                 'sweepTAvg':'1',
+                 'sweepFAvg':'1,2,4,8,16',
+                 'sweepQuantity':'im_noise',
+                 'sweepX':'obs_t',
+                 'sweepY':'n_sb',
+
+                 'seasonDays':'365',
+                 'seasonElevation':'30',
+                 'seasonQuantity':'night_hours'
                 }
 
 ###############################################################################
@@ -159,10 +203,14 @@ Ncore = dbc.FormGroup([
                 ), width=inpWidth
             )
         ], row=True)
+stationToolTip = 'The target visibility is computed for the first stations of ' + \
+                 'each type in the station table, which approximates the ' + \
+                 'stations used in the observation.'
 Nremote = dbc.FormGroup([
             dbc.Label('No. of remote stations (0 - 14)', width=labelWidth,
                       id='nRemoteRowL'
             ),
+            dbc.Tooltip(stationToolTip, target='nRemoteRowL'),
             dbc.Col(
                 dbc.Input(type='number',
                           id='nRemoteRow',
@@ -174,6 +222,7 @@ Nint = dbc.FormGroup([
             dbc.Label('No. of international stations (0 - 14)', width=labelWidth,
                       id='nIntRowL'
             ),
+            dbc.Tooltip(stationToolTip, target='nIntRowL'),
             dbc.Col(
                 dbc.Input(type='number',
                           id='nIntRow',
@@ -229,14 +278,22 @@ buttons = html.Div([
             dbc.Row([
                 dbc.Col(),
                 dbc.Col(dbc.Button('Calculate', id='calculate', color='dark')),
-                dbc.Col(dbc.Button('Generate PDF', id='genpdf', color='dark'))
+                dbc.Col(dbc.Button('Generate PDF', id='genpdf', color='dark')),
+                dbc.Col(dbc.Button('Generate report', id='genreport', color='dark'))
             ])
           ])
 link = html.Div([
           html.A(id='download-link',
                  children='Download file',
                  style={'display':'none'}
-          )
+          ),
+          html.Span(id='pdfJobStatus'),
+          # Polls the status of the PDF export while it is generated
+          dcc.Interval(id='pdfJobInterval', interval=1000, disabled=True),
+          dcc.Store(id='pdfJobStore'),
+          # Setups calculated in this browser session, exported by the
+          # Generate report button
+          dcc.Store(id='historyStore', storage_type='session')
        ])
 obsGUISetup = dbc.Form([obsMode, tabMode, stokes, obsTime, calTime, Ncal, Ncore, Nremote, Nint, Nchan,
                         Nsb, intTime, hbaDual, buttons, link])
@@ -338,6 +395,9 @@ targetName = dbc.FormGroup([
                 dbc.Col(
                    dbc.Button('Resolve', id='resolve', color='dark')
                 ),
+                dbc.Col(
+                   dbc.Button('LoTSS', id='findLotss', color='dark')
+                ),
              ], row=True)
 targetCoord = dbc.FormGroup([
                  dbc.Label('Coordinates', width=labelWidth-inpWidth),
@@ -436,6 +496,34 @@ pipeProcTime = dbc.FormGroup([
                      ), width=inpWidth
                   )
                ], row=True)
+solveToolTip = 'Find the value of the selected parameter needed to reach ' + \
+               'the target sensitivity. All other parameters are taken ' + \
+               'from the observational setup.'
+targetNoise = dbc.FormGroup([
+                 dbc.Label('Target sensitivity (uJy/beam)', width=labelWidth,
+                           id='targetNoiseRowL'),
+                 dbc.Tooltip(solveToolTip, target='targetNoiseRowL'),
+                 dbc.Col(
+                    dbc.Input(type='text', id='targetNoiseRow', value=''),
+                    width=inpWidth
+                 )
+              ], row=True)
+solveFor = dbc.FormGroup([
+              dbc.Label('Solve for', width=labelWidth-inpWidth),
+              dbc.Col(
+                 dcc.Dropdown(
+                     options=[
+                         {'label':'Observation time', 'value':'obs_t'},
+                         {'label':'Number of subbands', 'value':'n_sb'},
+                         {'label':'No. of core stations', 'value':'core'},
+                         {'label':'No. of remote stations', 'value':'remote'},
+                         {'label':'No. of international stations', 'value':'int'}
+                     ], value=defaultParams['solveFor'], searchable=False,
+                        clearable=False, id='solveForRow'
+                 ), width=dropWidth
+              ),
+              dbc.Col(dbc.Button('Solve', id='solve', color='dark'))
+           ], row=True)
 warntext = \
 """
 **Notes:**
@@ -449,7 +537,8 @@ LUCI (version 20200114) was written and is maintained for the LOFAR Science Oper
 cautiontext = html.Div([
                   dcc.Markdown(children=warntext)
               ], style={'width':'90%'})
-resultGUISetup = dbc.Form([imNoise, rawSize, pipeSize, pipeProcTime, cautiontext])
+resultGUISetup = dbc.Form([imNoise, rawSize, pipeSize, pipeProcTime,
+                           targetNoise, solveFor, cautiontext])
 resultGUIFrame = html.Div(children=[
                     html.H3('Results'),
                     html.Hr(),
@@ -494,6 +583,110 @@ graph = html.Div([
         ])
         ])
 
+###############################################################################
+# Layout of the trade-off explorer
+###############################################################################
+sweepToolTip = 'Specify each axis either as a comma-separated list of ' + \
+               'values or as start:stop:number of evenly spaced values. ' + \
+               'Other parameters are taken from the observational and ' + \
+               'pipeline setup.'
+sweepRanges = []
+for axisId, axisName, axisDefault in [
+        ('sweepObsTimeRow', 'obs_t', 'sweepObsTime'),
+        ('sweepNsbRow', 'n_sb', 'sweepNsb'),
+        ('sweepIntTimeRow', 'integ_t', 'sweepIntTime'),
+        ('sweepTAvgRow', 't_avg', 'sweepTAvg'),
+        ('sweepFAvgRow', 'f_avg', 'sweepFAvg')]:
+    sweepRanges.append(dbc.FormGroup([
+        dbc.Label(SWEEP_LABELS[axisName], width=labelWidth-inpWidth),
+        dbc.Col(
+            dbc.Input(type='text', id=axisId, value=defaultParams[axisDefault]),
+            width=inpWidth
+        ),
+        dbc.Col(
+            dcc.Dropdown(options=[], clearable=False, searchable=False,
+                         placeholder='Slice', id='sweepIdx_{}'.format(axisName)),
+            width=dropWidth-1
+        )
+    ], row=True))
+sweepAxisOptions = [{'label':SWEEP_LABELS[i], 'value':i} for i in SWEEP_AXES]
+sweepView = dbc.FormGroup([
+    dbc.Col(dcc.Dropdown(
+        options=[{'label':SWEEP_LABELS[i], 'value':i} for i in SWEEP_QUANTITIES],
+        value=defaultParams['sweepQuantity'], searchable=False,
+        clearable=False, id='sweepQuantityRow'
+    )),
+    dbc.Col(dcc.Dropdown(options=sweepAxisOptions,
+                         value=defaultParams['sweepX'], searchable=False,
+                         clearable=False, id='sweepXRow')),
+    dbc.Col(dcc.Dropdown(options=sweepAxisOptions,
+                         value=defaultParams['sweepY'], searchable=False,
+                         clearable=False, id='sweepYRow')),
+    dbc.Col(dbc.Button('Compute trade-off', id='sweep', color='dark'))
+], row=True)
+sweepGUIFrame = html.Div(children=[
+                   html.H3('Trade-off explorer', id='sweepTitle'),
+                   dbc.Tooltip(sweepToolTip, target='sweepTitle'),
+                   html.Hr(),
+                   dbc.Row([
+                      dbc.Col(dbc.Form(sweepRanges + [sweepView]), width=5),
+                      dbc.Col(dcc.Graph(id='sweep-plot',
+                                        figure={'layout':{'title':
+                                                          'Trade-off surface'}},
+                                        style={'display':'none'}), width=7)
+                   ]),
+                   dcc.Store(id='sweepStore')
+                ], style={'width':'95%', 'padding':'20px'})
+
+###############################################################################
+# Layout of the best observing dates finder
+###############################################################################
+seasonToolTip = 'Visibility statistics of the targets for every day of a ' + \
+                'period. Night-time means that the Sun is below the ' + \
+                'horizon. The stations in the observational setup are ' + \
+                'approximated by the first stations of each type.'
+seasonSetup = dbc.Form([
+    dbc.FormGroup([
+        dbc.Label('First date', width=labelWidth-inpWidth),
+        dbc.Col(dcc.DatePickerSingle(date=date.today(),
+                                     display_format='DD/MM/YYYY',
+                                     id='seasonDateRow'))
+    ], row=True),
+    dbc.FormGroup([
+        dbc.Label('Number of days', width=labelWidth-inpWidth),
+        dbc.Col(dbc.Input(type='number', id='seasonDaysRow', min=1,
+                          value=defaultParams['seasonDays']), width=inpWidth)
+    ], row=True),
+    dbc.FormGroup([
+        dbc.Label('Elevation limit (in degrees)', width=labelWidth-inpWidth),
+        dbc.Col(dbc.Input(type='number', id='seasonElevationRow', min=0,
+                          max=90, value=defaultParams['seasonElevation']),
+                width=inpWidth)
+    ], row=True),
+    dbc.FormGroup([
+        dbc.Col(dcc.Dropdown(
+            options=[{'label':SEASON_LABELS[i], 'value':i} \
+                     for i in SEASON_QUANTITIES],
+            value=defaultParams['seasonQuantity'], searchable=False,
+            clearable=False, id='seasonQuantityRow'
+        )),
+        dbc.Col(dbc.Button('Find best dates', id='season', color='dark'))
+    ], row=True)
+])
+seasonGUIFrame = html.Div(children=[
+                    html.H3('Best observing dates', id='seasonTitle'),
+                    dbc.Tooltip(seasonToolTip, target='seasonTitle'),
+                    html.Hr(),
+                    dbc.Row([
+                       dbc.Col(seasonSetup, width=5),
+                       dbc.Col(dcc.Graph(id='season-plot',
+                                         figure={'layout':{'title':
+                                                           'Best observing dates'}},
+                                         style={'display':'none'}), width=7)
+                    ]),
+                    dcc.Store(id='seasonStore')
+                 ], style={'width':'95%', 'padding':'20px'})
+
 ###############################################################################
 # Define the layout of the calculator
 ###############################################################################
@@ -503,7 +696,10 @@ layout = html.Div([dbc.Row(dbc.Col(header)),
                             dbc.Col(resultGUIFrame)
                    ]),
                    graph,
+                   sweepGUIFrame,
+                   seasonGUIFrame,
 
                    msgBoxTAvg, msgBoxFAvg,
-                   msgBoxResolve, msgBoxGenPdf, msgBox
+                   msgBoxResolve, msgBoxGenPdf, msgBox, msgBoxSweep,
+                   msgBoxSolve, msgBoxLotss, msgBoxSeason
          ])
@@ -0,0 +1,124 @@
+"""In-memory index of the LoTSS pointing catalogue.
+
+The catalogue in lotss_pointings.txt is read once into columnar NumPy arrays
+with a dict from pointing name to row. Cone searches use a zone index: the
+pointings are sorted by declination, so only the declination band that can
+contain matches is compared against the search position."""
+
+import os
+from functools import lru_cache
+import numpy as np
+import skycoords as sc
+
+# File containing the LoTSS pointings, next to this module. Columns are name,
+# RA (deg), Dec (deg), RA (hh:mm:ss), and Dec (dd:mm:ss).
+LOTSS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'lotss_pointings.txt')
+
+# Default number of pointings returned by find_nearest_pointings
+DEFAULT_N_NEAREST = 5
+
+class LotssCatalogue(object):
+    """Columnar LoTSS pointing catalogue with a name index and a zone index
+       for cone searches. All arrays are read-only."""
+
+    def __init__(self, filename=LOTSS_FILE):
+        rows = []
+        with open(filename, newline='\n') as cat_file:
+            for line in cat_file:
+                fields = line.split()
+                if len(fields) >= 5:
+                    rows.append(fields[:5])
+        columns = list(zip(*rows)) if rows else [(), (), (), (), ()]
+        self.names = np.asarray(columns[0], dtype=str)
+        self.ra = np.asarray(columns[1], dtype=np.float64)
+        self.dec = np.asarray(columns[2], dtype=np.float64)
+        self.ra_str = np.asarray(columns[3], dtype=str)
+        self.dec_str = np.asarray(columns[4], dtype=str)
+        self.vectors = sc.get_unit_vectors(self.ra, self.dec).reshape(-1, 3)
+        # Name index. The first occurrence of a name wins, as in a linear scan.
+        self.index = {}
+        for row, name in enumerate(self.names):
+            self.index.setdefault(name, row)
+        # Zone index sorted by declination
+        self.dec_order = np.argsort(self.dec, kind='stable')
+        self.sorted_dec = self.dec[self.dec_order]
+        for array in [self.names, self.ra, self.dec, self.ra_str, self.dec_str,
+                      self.vectors, self.dec_order, self.sorted_dec]:
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, name):
+        """Return the row of the pointing called name, or None"""
+        return self.index.get(name)
+
+    def get_distances(self, ra, dec, rows=None):
+        """Return the distance in degrees between (ra, dec) in degrees and the
+           pointings in rows (default: all pointings)"""
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        return sc.get_separation(vectors, sc.get_unit_vectors(ra, dec))
+
+    def cone_search(self, ra, dec, radius):
+        """Return the rows of all pointings within radius degrees of (ra, dec)
+           and their distances, sorted by distance"""
+        # Only pointings in the declination band dec +/- radius can match
+        low = np.searchsorted(self.sorted_dec, dec - radius, side='left')
+        high = np.searchsorted(self.sorted_dec, dec + radius, side='right')
+        rows = self.dec_order[low:high]
+        distances = self.get_distances(ra, dec, rows)
+        inside = distances <= radius
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    def nearest(self, ra, dec, n_nearest=DEFAULT_N_NEAREST):
+        """Return the rows of the n_nearest pointings closest to (ra, dec) and
+           their distances, sorted by distance"""
+        distances = self.get_distances(ra, dec)
+        n_nearest = min(n_nearest, len(distances))
+        if n_nearest <= 0:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        rows = np.argpartition(distances, n_nearest - 1)[:n_nearest]
+        order = np.argsort(distances[rows], kind='stable')
+        return rows[order], distances[rows][order]
+
+    def get_coord_string(self, row):
+        """Return the coordinates of a pointing in the hmsdms format used in
+           the target setup, e.g. 14h19m42.73s +39d53m42.0s"""
+        ra_h, ra_m, ra_s = self.ra_str[row].split(':')
+        dec_d, dec_m, dec_s = self.dec_str[row].split(':')
+        return '{}h{}m{}s {}d{}m{}s'.format(ra_h, ra_m, ra_s, dec_d, dec_m, dec_s)
+
+    def to_dicts(self, rows, distances):
+        """Convert rows and distances returned by a search into a list of
+           dicts with the name, RA and Dec in degrees, hmsdms coordinate
+           string, and distance in degrees of each pointing"""
+        results = []
+        for row, distance in zip(rows, distances):
+            results.append({'name':str(self.names[row]),
+                            'ra':float(self.ra[row]),
+                            'dec':float(self.dec[row]),
+                            'coord':self.get_coord_string(row),
+                            'distance':float(distance)})
+        return results
+
+@lru_cache(maxsize=None)
+def get_catalogue(filename=LOTSS_FILE):
+    """Return the LoTSS catalogue, reading it from filename on first use"""
+    return LotssCatalogue(filename)
+
+def find_nearest_pointings(coord, n_nearest=DEFAULT_N_NEAREST):
+    """Return the n_nearest LoTSS pointings closest to the coordinate string
+       coord as a list of dicts (see LotssCatalogue.to_dicts)"""
+    ra, dec = sc.parse_coord(coord)
+    catalogue = get_catalogue()
+    return catalogue.to_dicts(*catalogue.nearest(ra, dec, n_nearest))
+
+def find_pointings_within(coord, radius):
+    """Return all LoTSS pointings within radius degrees of the coordinate
+       string coord as a list of dicts (see LotssCatalogue.to_dicts)"""
+    ra, dec = sc.parse_coord(coord)
+    catalogue = get_catalogue()
+    return catalogue.to_dicts(*catalogue.cone_search(ra, dec, radius))
@@ -0,0 +1,122 @@
+"""Functions to search the station and correlator setup space for configurations
+   that reach a sensitivity goal within a data volume budget"""
+
+import numpy as np
+import backend as bk
+
+# Default values searched for each correlator and pipeline parameter
+DEFAULT_ANTENNA_SETS = ['lbaouter', 'hbadual', 'hbadualinner']
+DEFAULT_N_CHAN = [64, 128, 256]
+DEFAULT_INTEG_T = [1., 2., 4., 8.]
+DEFAULT_T_AVG = [1, 2, 4, 8]
+DEFAULT_F_AVG = [1, 2, 4, 8, 16, 32, 64]
+
+# Fields of the structured array returned by find_pareto_configs
+CONFIG_DTYPE = [('n_core', 'i4'), ('n_remote', 'i4'), ('n_int', 'i4'),
+                ('hba_mode', 'U16'), ('n_chan', 'i4'), ('integ_t', 'f8'),
+                ('t_avg', 'i4'), ('f_avg', 'i4'), ('im_noise', 'f8'),
+                ('raw_size', 'f8'), ('proc_size', 'f8')]
+
+def get_pareto_mask(costs):
+    """For an (N, M) array of costs that are all to be minimized, return a
+       boolean mask selecting the points on the Pareto front. Of a group of
+       points with identical costs, only the first one is selected."""
+    n_points = costs.shape[0]
+    # Visit points in lexicographic order so that each visited point that
+    # survives is guaranteed to be on the front.
+    order = np.lexsort(costs.T[::-1])
+    costs = costs[order]
+    remaining = np.arange(n_points)
+    next_idx = 0
+    while next_idx < len(costs):
+        # Drop every point that is dominated by or equal to the current one
+        keep = np.any(costs < costs[next_idx], axis=1)
+        keep[next_idx] = True
+        remaining = remaining[keep]
+        costs = costs[keep]
+        next_idx = np.sum(keep[:next_idx]) + 1
+    mask = np.zeros(n_points, dtype=bool)
+    mask[order[remaining]] = True
+    return mask
+
+def make_station_grid(antenna_sets):
+    """Return flattened arrays of n_core, n_remote, n_int, and antenna set
+       index covering every allowed station combination for the given
+       antenna sets."""
+    n_core, n_remote, n_int, ant_idx = np.meshgrid(
+        np.arange(bk.MAX_STATIONS['core']+1),
+        np.arange(bk.MAX_STATIONS['remote']+1),
+        np.arange(bk.MAX_STATIONS['int']+1), np.arange(len(antenna_sets)),
+        indexing='ij')
+    n_core, n_remote, n_int, ant_idx = [item.ravel() for item in
+                                        [n_core, n_remote, n_int, ant_idx]]
+    # At least two stations are needed to form a baseline
+    valid = n_core + n_remote + n_int >= 2
+    return n_core[valid], n_remote[valid], n_int[valid], ant_idx[valid]
+
+def find_pareto_configs(noise_goal, raw_budget, proc_budget, obs_t, n_sb, cal_t=0.,
+                        n_cal=0, n_beams=1, dy_compress='enable',
+                        antenna_sets=None, n_chan=None, integ_t=None, t_avg=None,
+                        f_avg=None):
+    """Find the station and correlator setups that reach noise_goal (in
+       uJy/beam) while keeping the raw and processed data sizes (in GB) within
+       raw_budget and proc_budget. Every combination of station counts,
+       antenna set, n_chan, integ_t, t_avg, and f_avg is considered.
+       The image noise depends only on the stations and the data sizes depend
+       on the stations only through the number of baselines. A station setup
+       with at least as many baselines and no better noise than another is
+       therefore dominated for every correlator setup and is discarded before
+       the data sizes are evaluated.
+       Returns a structured array with fields CONFIG_DTYPE containing the
+       Pareto front in (im_noise, raw_size, proc_size), sorted by im_noise."""
+    antenna_sets = DEFAULT_ANTENNA_SETS if antenna_sets is None else antenna_sets
+    n_chan = DEFAULT_N_CHAN if n_chan is None else n_chan
+    integ_t = DEFAULT_INTEG_T if integ_t is None else integ_t
+    t_avg = DEFAULT_T_AVG if t_avg is None else t_avg
+    f_avg = DEFAULT_F_AVG if f_avg is None else f_avg
+
+    # Evaluate the sensitivity of every station setup
+    n_core, n_remote, n_int, ant_idx = make_station_grid(antenna_sets)
+    hba_mode = np.asarray(antenna_sets)[ant_idx]
+    im_noise = bk.calculate_im_noise_batch(n_core, n_remote, n_int, hba_mode,
+                                           obs_t, n_sb)
+    n_baselines = bk.compute_baselines(n_core, n_remote, n_int, hba_mode)
+    station_ok = im_noise <= noise_goal
+    # Keep the station setups on the (n_baselines, im_noise) front
+    station_idx = np.flatnonzero(station_ok)
+    front = get_pareto_mask(np.stack([n_baselines[station_idx],
+                                      im_noise[station_idx]], axis=1))
+    station_idx = station_idx[front]
+
+    # Evaluate the data sizes for every correlator setup
+    corr_chan, corr_integ, corr_tavg, corr_favg = [item.ravel() for item in \
+        np.meshgrid(n_chan, integ_t, t_avg, f_avg, indexing='ij')]
+    valid = corr_favg <= corr_chan
+    corr_chan, corr_integ, corr_tavg, corr_favg = \
+        corr_chan[valid], corr_integ[valid], corr_tavg[valid], corr_favg[valid]
+    baselines = n_baselines[station_idx][:, np.newaxis]
+    raw_size = bk.calculate_raw_size_batch(obs_t, cal_t, n_cal, corr_integ,
+                                           baselines, corr_chan, n_sb, n_beams)
+    proc_size = bk.calculate_proc_size_batch(obs_t, cal_t, n_cal, corr_integ,
+                                             baselines, corr_chan, n_sb, n_beams,
+                                             corr_tavg, corr_favg, dy_compress)
+    noise = np.broadcast_to(im_noise[station_idx][:, np.newaxis], raw_size.shape)
+    s_idx, c_idx = np.nonzero((raw_size <= raw_budget) & (proc_size <= proc_budget))
+    costs = np.stack([noise[s_idx, c_idx], raw_size[s_idx, c_idx],
+                      proc_size[s_idx, c_idx]], axis=1)
+    front = get_pareto_mask(costs)
+    s_idx, c_idx = s_idx[front], c_idx[front]
+
+    configs = np.zeros(len(s_idx), dtype=CONFIG_DTYPE)
+    configs['n_core'] = n_core[station_idx][s_idx]
+    configs['n_remote'] = n_remote[station_idx][s_idx]
+    configs['n_int'] = n_int[station_idx][s_idx]
+    configs['hba_mode'] = hba_mode[station_idx][s_idx]
+    configs['n_chan'] = corr_chan[c_idx]
+    configs['integ_t'] = corr_integ[c_idx]
+    configs['t_avg'] = corr_tavg[c_idx]
+    configs['f_avg'] = corr_favg[c_idx]
+    configs['im_noise'] = costs[front, 0]
+    configs['raw_size'] = costs[front, 1]
+    configs['proc_size'] = costs[front, 2]
+    return np.sort(configs, order=['im_noise', 'raw_size', 'proc_size'])
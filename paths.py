@@ -0,0 +1,21 @@
+"""Location of the data files written by the calculator.
+
+Caches and precomputed tables are kept under a single data root, so that
+they do not depend on the working directory of the server. By default this
+is the directory of the calculator itself. Set the environment variable
+LUCI_DATA_DIR to use another directory, e.g. if the code is installed
+read-only."""
+
+import os
+
+# Environment variable with the data root
+DATA_DIR_ENV = 'LUCI_DATA_DIR'
+
+def get_data_dir():
+    """Return the absolute path of the data root"""
+    directory = os.environ.get(DATA_DIR_ENV) or os.path.dirname(__file__)
+    return os.path.abspath(directory)
+
+def get_data_path(name):
+    """Return the absolute path of the file or directory name in the data root"""
+    return os.path.join(get_data_dir(), name)
@@ -0,0 +1,161 @@
+"""Background generation of the summary PDF files.
+
+Generating a PDF file renders a matplotlib figure, builds the HTML, lays out
+the pages, and writes the file to disk, which ties up a server worker for
+the whole export. Exports are therefore submitted as jobs to a small,
+bounded thread pool: the caller gets a job id back immediately and polls the
+status of the job until the file is ready. As the pool is bounded, many
+concurrent exports queue behind each other instead of behind Calculate
+requests. Reports comparing several setups are submitted the same way; their
+pages are prepared by one pool of worker processes shared by all reports."""
+
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+import backend as bk
+import generatepdf as g
+import pdfstore as ps
+import targetvis as tv
+
+# Maximum number of PDF files generated at the same time
+PDF_WORKERS = 2
+
+# Number of worker processes that prepare the pages of reports. They are
+# shared by all report jobs of this process.
+REPORT_WORKERS = 2
+
+# Maximum number of jobs whose status is remembered. The oldest finished jobs
+# are forgotten first.
+MAX_JOBS = 256
+
+# Status of a job
+JOB_PENDING = 'pending'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+def make_pdf(setup, elevation_fig, distance_table, store=None):
+    """Generate the summary PDF file of setup (see generatepdf.generate_pdf),
+       unless an identical one is already in store (default: the shared
+       store), and return its relative path, e.g. static/summary_<key>.pdf"""
+    store = ps.PDF_STORE if store is None else store
+    results = bk.calculate_results(setup)
+    key = ps.get_pdf_key(setup, results, elevation_fig, distance_table)
+    if store.get(key) is None:
+        store.put(key, g.build_pdf(setup, results, elevation_fig, distance_table))
+    return 'static/{}'.format(ps.get_pdf_name(key))
+
+def make_setup_pdf(setup, store=None):
+    """Compute the figures of setup and generate its summary PDF file like
+       make_pdf. Used when the figures are not already on the page."""
+    elevation_fig, distance_table = {}, {}
+    if setup.coords:
+        elevation_fig, _, distance_table = tv.make_setup_figures(setup)
+        elevation_fig = tv.figure_to_dict(elevation_fig)
+        distance_table = tv.figure_to_dict(distance_table)
+    return make_pdf(setup, elevation_fig, distance_table, store)
+
+def make_report(setups, names=None, store=None, processes=g.REPORT_PROCESSES,
+                pool=None):
+    """Generate a report comparing setups (see generatepdf.build_report),
+       unless an identical one is already in store (default: the shared
+       store), and return its relative path like make_pdf"""
+    store = ps.PDF_STORE if store is None else store
+    names = g.get_setup_names(setups) if names is None else names
+    key = ps.get_report_key(setups, names)
+    if store.get(key) is None:
+        store.put(key, g.build_report(setups, names, processes, pool))
+    return 'static/{}'.format(ps.get_pdf_name(key))
+
+class PdfJobQueue(object):
+    """Thread-safe queue of PDF jobs run on a bounded thread pool. The status
+       of a job is a dict with the keys status (JOB_PENDING, JOB_DONE, or
+       JOB_FAILED), path (relative path of the PDF file once it is done),
+       and error (message if the job failed)."""
+
+    def __init__(self, n_workers=PDF_WORKERS, max_jobs=MAX_JOBS, make=make_pdf,
+                 report_workers=REPORT_WORKERS):
+        self.n_workers = n_workers
+        self.max_jobs = max_jobs
+        self.make = make
+        self.report_workers = report_workers
+        self._pool = None
+        self._report_pool = None
+        self._jobs = OrderedDict()
+        self._lock = Lock()
+
+    def submit(self, *args, make=None):
+        """Queue the generation of a PDF file and return the job id. The file
+           is generated by make(*args), by default the make function of the
+           queue."""
+        make = self.make if make is None else make
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.n_workers,
+                                                thread_name_prefix='pdf')
+            self._jobs[job_id] = {'status':JOB_PENDING, 'path':None, 'error':''}
+            self._forget_old_jobs()
+            self._pool.submit(self._run, job_id, make, args)
+        return job_id
+
+    def submit_report(self, setups, names=None):
+        """Queue the generation of a report comparing setups (see
+           make_report) and return the job id. The pages of all reports are
+           prepared by a single pool of report_workers processes, which is
+           started with the first report."""
+        with self._lock:
+            if self._report_pool is None:
+                self._report_pool = g.make_report_pool(self.report_workers)
+            pool = self._report_pool
+        return self.submit(setups, names, pool, make=self._make_report)
+
+    def _make_report(self, setups, names, pool):
+        try:
+            return make_report(setups, names, processes=self.report_workers,
+                               pool=pool)
+        except BrokenProcessPool:
+            # A worker died. Start a new pool for the next report.
+            with self._lock:
+                if self._report_pool is pool:
+                    self._report_pool = None
+            pool.shutdown(wait=False)
+            raise
+
+    def _run(self, job_id, make, args):
+        try:
+            status = {'status':JOB_DONE, 'path':make(*args), 'error':''}
+        except Exception as error:
+            status = {'status':JOB_FAILED, 'path':None, 'error':str(error)}
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id] = status
+
+    def _forget_old_jobs(self):
+        # Pending jobs are only forgotten if all remembered jobs are pending
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() \
+                       if job['status'] != JOB_PENDING][:max(excess, 0)]:
+            del self._jobs[job_id]
+            excess -= 1
+        while excess > 0:
+            self._jobs.popitem(last=False)
+            excess -= 1
+
+    def get(self, job_id):
+        """Return a copy of the status of a job, or None if it is not known"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job)
+
+    def info(self):
+        """Return the number of remembered jobs per status"""
+        with self._lock:
+            counts = {JOB_PENDING:0, JOB_DONE:0, JOB_FAILED:0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            return counts
+
+# PDF jobs of all sessions handled by this process
+PDF_JOBS = PdfJobQueue()
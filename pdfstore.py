@@ -0,0 +1,191 @@
+"""Content-addressed store of the summary PDF files.
+
+A summary PDF file only depends on the setup, its results, and the figures
+shown on the page, so it is stored under a hash of these inputs. Identical
+summaries are generated once and then served from the store. The total size
+of the store is capped: when it grows beyond max_bytes, the least recently
+used files are removed. Files are written under a temporary name and renamed,
+so a download never sees a partially written file.
+
+The store can also keep the PDF files in memory only, so that read-only
+deployments need no writable directory. Set the environment variable
+LUCI_PDF_STORE to "memory" for this, or to the directory to use. By default
+the files are stored in the data root (see paths.py)."""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+import paths
+
+# Directory in which the PDF files are stored, in the data root (see paths.py)
+PDF_STORE_DIR = paths.get_data_path('pdf_store')
+
+# Environment variable with the directory of the PDF store, or "memory"
+PDF_STORE_ENV = 'LUCI_PDF_STORE'
+
+# Maximum total size of the stored PDF files in bytes, on disk and in memory
+PDF_STORE_MAX_BYTES = 256*1024**2
+PDF_MEMORY_MAX_BYTES = 64*1024**2
+
+# Version of the PDF layout. Bump this when generatepdf changes so that old
+# files are not served again.
+PDF_STORE_VERSION = 1
+
+# Keys are SHA-256 hashes in hexadecimal
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Name under which a PDF file is downloaded, e.g. summary_<key>.pdf
+PDF_NAME_FORMAT = 'summary_{}.pdf'
+PDF_NAME_PATTERN = re.compile(r'^summary_([0-9a-f]{64})\.pdf$')
+
+def get_pdf_key(setup, results, elevation_fig, distance_table):
+    """Return the key of a summary PDF file: the SHA-256 hash of its
+       normalized inputs (see generatepdf.generate_pdf)"""
+    inputs = {'version':PDF_STORE_VERSION, 'setup':setup.to_dict(),
+              'results':results, 'elevation_fig':elevation_fig,
+              'distance_table':distance_table}
+    text = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def get_report_key(setups, names):
+    """Return the key of a report comparing setups (see
+       generatepdf.generate_report). The figures in a report are computed
+       from the setups, so the setups and their names determine its
+       contents."""
+    inputs = {'version':PDF_STORE_VERSION,
+              'setups':[setup.to_dict() for setup in setups], 'names':list(names)}
+    text = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def get_pdf_name(key):
+    """Return the file name under which the PDF file with key is downloaded"""
+    return PDF_NAME_FORMAT.format(key)
+
+def parse_pdf_name(name):
+    """Return the key in a file name made by get_pdf_name, or None"""
+    match = PDF_NAME_PATTERN.match(name)
+    return match.group(1) if match else None
+
+class PdfStore(object):
+    """Thread-safe, size-capped store of PDF files in directory keyed by the
+       hash of their inputs. The last access time of each file is kept as
+       its modification time, so the eviction order survives a restart. If
+       directory is None, the files are only kept in memory."""
+
+    def __init__(self, directory=PDF_STORE_DIR, max_bytes=PDF_STORE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sizes = None
+        self._data = {}
+        self._lock = Lock()
+
+    def get_path(self, key):
+        """Return the name of the file in which the PDF file with key is stored"""
+        return os.path.join(self.directory, '{}.pdf'.format(key))
+
+    def _load_index(self):
+        # Read the sizes of the stored files, least recently used first. Must
+        # be called with the lock held.
+        if self._sizes is not None:
+            return
+        entries = []
+        if self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                key, ext = os.path.splitext(name)
+                if ext == '.pdf' and KEY_PATTERN.match(key):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, key, stat.st_size))
+        self._sizes = OrderedDict((key, size) for _, key, size in sorted(entries))
+
+    def get(self, key):
+        """Return the PDF file with key and mark it as recently used, or None
+           if it is not in the store. The file is returned as its path, or as
+           a BytesIO if the store is kept in memory; both can be passed to
+           flask.send_file."""
+        with self._lock:
+            self._load_index()
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._sizes.move_to_end(key)
+            if self.directory is None:
+                return BytesIO(self._data[key])
+            path = self.get_path(key)
+            try:
+                os.utime(path)
+            except OSError:
+                # Removed behind our back
+                del self._sizes[key]
+                return None
+            return path
+
+    def put(self, key, data):
+        """Store the contents (bytes) of a PDF file under key"""
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as temp_file:
+                    temp_file.write(data)
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, self.get_path(key))
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        with self._lock:
+            self._load_index()
+            if self.directory is None:
+                self._data[key] = data
+            self._sizes[key] = len(data)
+            self._sizes.move_to_end(key)
+            self._evict(keep=key)
+
+    def _evict(self, keep):
+        # Remove the least recently used files until the store fits, but never
+        # the file that has just been stored. Must be called with the lock held.
+        total = sum(self._sizes.values())
+        for key in list(self._sizes):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._sizes.pop(key)
+            self.evictions += 1
+            if self.directory is None:
+                del self._data[key]
+                continue
+            try:
+                os.remove(self.get_path(key))
+            except OSError:
+                pass
+
+    def info(self):
+        """Return the hit, miss, and eviction counters and the number and
+           total size of the stored files"""
+        with self._lock:
+            self._load_index()
+            return {'hits':self.hits, 'misses':self.misses,
+                    'evictions':self.evictions, 'files':len(self._sizes),
+                    'bytes':sum(self._sizes.values()), 'max_bytes':self.max_bytes}
+
+def get_pdf_store():
+    """Return a PDF store in the directory selected by the LUCI_PDF_STORE
+       variable. It is kept in memory if the variable is set to 'memory'.
+       Relative directories are taken relative to the data root."""
+    directory = os.environ.get(PDF_STORE_ENV, PDF_STORE_DIR)
+    if directory == 'memory':
+        return PdfStore(None, PDF_MEMORY_MAX_BYTES)
+    return PdfStore(os.path.join(paths.get_data_dir(), directory))
+
+# PDF files shared by all requests handled by this process
+PDF_STORE = get_pdf_store()
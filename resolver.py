@@ -0,0 +1,257 @@
+"""Resolve source names into coordinates with a persistent local cache in front
+of Simbad.
+
+Resolved names are stored in an SQLite database together with an expiry
+time. Names that could not be resolved are cached too (negative caching) for
+a shorter time, and the calibrators, A-team sources, and LoTSS pointings are
+preloaded without an expiry time. A cached lookup never touches the network.
+If Simbad cannot be reached, an expired entry is used instead.
+
+Lists of names are resolved concurrently on a bounded thread pool, and a name
+that is already being looked up (e.g. for another session) shares the pending
+lookup instead of sending a second query.
+
+Set the environment variable LUCI_RESOLVER to "local" to replace Simbad by a
+resolver that only knows the preloaded names, e.g. to run offline."""
+
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from astropy.coordinates import SkyCoord
+from astropy import units as u
+import paths
+
+# SQLite database in which resolved names are stored, in the data root (see
+# paths.py). ':memory:' keeps the cache in memory only.
+NAME_CACHE_FILE = paths.get_data_path('name_cache.sqlite')
+
+# Time in seconds after which resolved and unresolved names are looked up again
+POSITIVE_TTL = 30*86400.
+NEGATIVE_TTL = 86400.
+
+# Upstream resolver to use: 'simbad' or 'local'
+RESOLVER_ENV = 'LUCI_RESOLVER'
+
+# Maximum number of concurrent upstream lookups and the time in seconds to
+# wait for a list of names to be resolved
+RESOLVE_WORKERS = 8
+RESOLVE_TIMEOUT = 10.
+
+# Error messages reported per name by resolve_names
+UNKNOWN_NAME_MSG = 'Unable to resolve source name'
+UNREACHABLE_MSG = 'Name resolver is unreachable'
+TIMEOUT_MSG = 'Timed out while resolving source name'
+
+def get_preloaded_names():
+    """Return a dict mapping the calibrator, A-team, and LoTSS pointing names
+       to their coordinates as hmsdms strings"""
+    # Import here to avoid a circular import, as targetvis uses this module
+    import targetvis as tv
+    import lotss
+    catalogue = lotss.get_catalogue()
+    names = {str(name):catalogue.get_coord_string(row) \
+             for row, name in enumerate(catalogue.names)}
+    names.update(tv.CALIB_COORDINATES)
+    names.update(tv.ATEAM_COORDINATES)
+    return names
+
+class NameCache(object):
+    """Persistent, thread-safe cache of name -> coordinate string. A
+       coordinate of None means that the name could not be resolved."""
+
+    def __init__(self, path=NAME_CACHE_FILE, positive_ttl=POSITIVE_TTL,
+                 negative_ttl=NEGATIVE_TTL, preload=None):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS names ('
+                               'name TEXT PRIMARY KEY, coord TEXT, source TEXT, '
+                               'updated REAL, expires REAL)')
+            if preload:
+                # Preloaded names never expire (expires is NULL)
+                now = time.time()
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?, NULL)',
+                    [(name, coord, 'preload', now) \
+                     for name, coord in preload.items()])
+
+    def get(self, name, allow_expired=False):
+        """Look up name. Returns (found, coord). found is False if the name is
+           not in the cache or its entry has expired (unless allow_expired)."""
+        with self._lock:
+            row = self._conn.execute('SELECT coord, expires FROM names '+\
+                                     'WHERE name=?', (name,)).fetchone()
+            found = row is not None and (allow_expired or row[1] is None or \
+                                         row[1] > time.time())
+            if not allow_expired:
+                if found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return (True, row[0]) if found else (False, None)
+
+    def put(self, name, coord, source):
+        """Store the coordinate of name (None if it could not be resolved)"""
+        now = time.time()
+        ttl = self.negative_ttl if coord is None else self.positive_ttl
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO names '+\
+                               'VALUES (?, ?, ?, ?, ?)',
+                               (name, coord, source, now, now + ttl))
+
+    def info(self):
+        """Return the hit and miss counters and the number of stored names"""
+        with self._lock:
+            n_names = self._conn.execute('SELECT COUNT(*) FROM names').fetchone()[0]
+            return {'hits':self.hits, 'misses':self.misses, 'names':n_names}
+
+def simbad_resolver(name):
+    """Query Simbad for name. Returns the coordinate as an hmsdms string, or
+       None if Simbad does not know the name. Network errors are raised."""
+    # Import here so that the local resolver works without astroquery
+    from astroquery.simbad import Simbad
+    query = Simbad.query_object(name)
+    if query is None or len(query) == 0:
+        return None
+    if 'RA' in query.colnames:
+        # Older astroquery versions return sexagesimal strings
+        coord = SkyCoord('{} {}'.format(query['RA'][0], query['DEC'][0]),
+                         unit=(u.hourangle, u.deg))
+    else:
+        coord = SkyCoord(query['ra'][0], query['dec'][0], unit=u.deg)
+    return coord.to_string('hmsdms')
+
+class LocalResolver(object):
+    """Stand-in for simbad_resolver that looks names up in a dict. Used to
+       run and test the calculator without network access."""
+
+    def __init__(self, names=None):
+        self.names = get_preloaded_names() if names is None else dict(names)
+        self.n_queries = 0
+
+    def __call__(self, name):
+        self.n_queries += 1
+        return self.names.get(name)
+
+def get_upstream_resolver():
+    """Return the upstream resolver selected by the LUCI_RESOLVER variable"""
+    if os.environ.get(RESOLVER_ENV, 'simbad') == 'local':
+        return LocalResolver()
+    return simbad_resolver
+
+_name_cache = None
+_upstream = None
+_setup_lock = Lock()
+
+def get_name_cache():
+    """Return the name cache shared by this process, creating it on first use"""
+    global _name_cache
+    with _setup_lock:
+        if _name_cache is None:
+            _name_cache = NameCache(preload=get_preloaded_names())
+        return _name_cache
+
+def get_default_upstream():
+    """Return the upstream resolver shared by this process"""
+    global _upstream
+    with _setup_lock:
+        if _upstream is None:
+            _upstream = get_upstream_resolver()
+        return _upstream
+
+def lookup_name(name, cache, upstream):
+    """Resolve a single source name that is not in the cache with upstream.
+       Returns the hmsdms coordinate string (None if it cannot be resolved)
+       and an error message ('' if the name was resolved)."""
+    try:
+        coord = upstream(name)
+    except Exception:
+        # Upstream is unreachable. Fall back to an expired entry, and do not
+        # remember the failure as an unresolvable name.
+        _, coord = cache.get(name, allow_expired=True)
+        return coord, '' if coord is not None else UNREACHABLE_MSG
+    cache.put(name, coord, getattr(upstream, '__name__', 'upstream'))
+    return coord, '' if coord is not None else UNKNOWN_NAME_MSG
+
+def resolve_name(name, cache=None, upstream=None):
+    """Resolve a single source name into an hmsdms coordinate string, or None
+       if it cannot be resolved. The cache is consulted first; only names that
+       are not cached are sent to upstream."""
+    cache = get_name_cache() if cache is None else cache
+    upstream = get_default_upstream() if upstream is None else upstream
+    name = name.strip()
+    found, coord = cache.get(name)
+    if found:
+        return coord
+    coord, _ = lookup_name(name, cache, upstream)
+    return coord
+
+_pool = None
+_in_flight = {}
+_in_flight_lock = Lock()
+
+def get_pool():
+    """Return the thread pool used for upstream lookups, creating it on first use"""
+    global _pool
+    with _setup_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=RESOLVE_WORKERS,
+                                       thread_name_prefix='resolver')
+        return _pool
+
+def submit_lookup(name, cache, upstream):
+    """Start an upstream lookup of name and return its Future. If the same
+       name is already being looked up, e.g. for another session, the Future
+       of that lookup is returned instead of sending a second query."""
+    key = (name, id(cache), id(upstream))
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is not None:
+            return future
+        future = get_pool().submit(lookup_name, name, cache, upstream)
+        _in_flight[key] = future
+    # Outside the lock, as the callback runs at once if the lookup is done
+    future.add_done_callback(lambda _: _forget_lookup(key))
+    return future
+
+def _forget_lookup(key):
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
+
+def resolve_names(names, timeout=RESOLVE_TIMEOUT, cache=None, upstream=None):
+    """Resolve a list of source names concurrently. Cached names are answered
+       immediately, and the others are looked up in parallel on a bounded
+       thread pool, so a list of names costs about one upstream round trip.
+       Each lookup gets up to timeout seconds.
+       Returns a list with one dict per name with the keys name, coord (an
+       hmsdms string or None), and error ('' if the name was resolved)."""
+    cache = get_name_cache() if cache is None else cache
+    upstream = get_default_upstream() if upstream is None else upstream
+    results = []
+    futures = {}
+    for name in names:
+        name = name.strip()
+        found, coord = cache.get(name)
+        results.append({'name':name, 'coord':coord, 'error':''})
+        if found:
+            if coord is None:
+                results[-1]['error'] = UNKNOWN_NAME_MSG
+        elif name not in futures:
+            futures[name] = submit_lookup(name, cache, upstream)
+    if futures:
+        wait(list(futures.values()), timeout=timeout)
+    for result in results:
+        future = futures.get(result['name'])
+        if future is None:
+            continue
+        if future.done():
+            result['coord'], result['error'] = future.result()
+        else:
+            result['error'] = TIMEOUT_MSG
+    return results
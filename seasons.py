@@ -0,0 +1,167 @@
+"""Functions to find the best dates of the year to observe a set of targets.
+
+The visibility of every target is computed for every day of a long period in
+a single NumPy pass: the sidereal time is evaluated on a (days, times) grid
+and the targets are precessed to each day, instead of calling the one-day
+elevation functions once per date. The Sun and the Moon are evaluated with
+ephem once per hour and interpolated onto the grid."""
+
+from datetime import datetime, timedelta
+import numpy as np
+from plotly.graph_objs import Heatmap
+import elevation as el
+import skycoords as sc
+
+# Time resolution of the visibility statistics
+SEASON_STEP = timedelta(minutes=10)
+
+# Default and maximum length of the period in days
+DEFAULT_N_DAYS = 365
+MAX_N_DAYS = 366
+
+# Default minimum elevation in degrees at which a target counts as observable
+DEFAULT_ELEVATION_LIMIT = 30.
+
+# Elevation of the Sun in degrees below which it is night
+NIGHT_SUN_ELEVATION = 0.
+
+# Number of best dates quoted in the figure title
+N_BEST_DATES = 3
+
+# Human readable labels for the statistics computed per target and day
+SEASON_LABELS = {
+    'night_hours':'Night-time hours above the elevation limit',
+    'hours_up':'Hours above the elevation limit',
+    'sun_separation':'Distance to the Sun at noon (in degrees)',
+    'moon_separation':'Minimum distance to the Moon (in degrees)'
+}
+
+# Statistics computed per target and day
+SEASON_QUANTITIES = ['night_hours', 'hours_up', 'sun_separation', 'moon_separation']
+
+def get_body_grid(name, start, jd, step=timedelta(hours=1)):
+    """Return the apparent geocentric RA and Dec (radians) of a solar system
+       object on an array of Julian dates jd starting at the datetime start.
+       ephem is evaluated every step and interpolated in between."""
+    n_nodes = int(np.ceil((jd.max() - jd.min())/(step/timedelta(days=1)))) + 1
+    nodes = [start + idx*step for idx in range(n_nodes)]
+    ra, dec, _ = el.get_body_positions(name, nodes, step)
+    node_jd = el.get_julian_dates(nodes)
+    return np.interp(jd, node_jd, np.unwrap(ra)), np.interp(jd, node_jd, dec)
+
+def compute_season(ra, dec, start_date, n_days=DEFAULT_N_DAYS, sites=None,
+                   elevation_limit=DEFAULT_ELEVATION_LIMIT, step=SEASON_STEP):
+    """Compute nightly visibility statistics of a set of targets for every day
+       of a period.
+       Input parameters:
+       * ra, dec         - Arrays of J2000 RA and Dec in degrees
+       * start_date      - First day of the period as a YYYY-MM-DD string
+       * n_days          - Number of days in the period
+       * sites           - List of site names in el.SITES. A target counts as
+                           observable if it is above the limit at every site.
+                           Default: NL only.
+       * elevation_limit - Minimum elevation in degrees
+       Returns:
+       A dict with the list of dates, an array with shape (targets, days) for
+       each of SEASON_QUANTITIES, and under 'joint_night_hours' the number
+       of night-time hours per day during which all targets are above the
+       limit at the same time"""
+    if not 0 < n_days <= MAX_N_DAYS:
+        raise ValueError('Number of days must be between 1 and {}'.format(
+            MAX_N_DAYS))
+    sites = el.DUTCH_SITES if sites is None else sites
+    ra, dec = np.atleast_1d(ra), np.atleast_1d(dec)
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    dates = [(start + timedelta(days=day)).strftime('%Y-%m-%d') \
+             for day in range(n_days)]
+    # Julian dates on a (days, times) grid
+    step_days = step/timedelta(days=1)
+    n_steps = int(np.ceil(1./step_days))
+    jd = el.get_julian_dates([start])[0] + np.arange(n_days)[:, np.newaxis] + \
+         np.arange(n_steps)[np.newaxis, :]*step_days
+    gast = el.get_apparent_sidereal_time(jd)
+    # Stations at the same position have the same elevation
+    lon, lat = el.get_site_arrays(el.get_unique_sites(sites))
+    # Apparent target coordinates at noon of each day with shape (days, targets)
+    date_ra, date_dec = np.zeros((n_days, len(ra))), np.zeros((n_days, len(ra)))
+    for day in range(n_days):
+        date_ra[day], date_dec[day] = el.precess_to_date(ra, dec,
+                                                         jd[day, n_steps//2])
+    # Minimum elevation over the sites with shape (days, targets, times)
+    alt = el.compute_altitude(date_ra[:, :, np.newaxis, np.newaxis],
+                              date_dec[:, :, np.newaxis, np.newaxis],
+                              gast[:, np.newaxis, np.newaxis, :],
+                              lon[np.newaxis, np.newaxis, :, np.newaxis],
+                              lat[np.newaxis, np.newaxis, :, np.newaxis])
+    alt = alt.min(axis=2)
+    above = alt + el.get_refraction(alt) >= elevation_limit
+    # It is night if the Sun is down at every site
+    sun_ra, sun_dec = get_body_grid('Sun', start, jd)
+    sun_alt = el.compute_altitude(sun_ra, sun_dec, gast,
+                                  lon[:, np.newaxis, np.newaxis],
+                                  lat[:, np.newaxis, np.newaxis]).max(axis=0)
+    night = sun_alt + el.get_refraction(sun_alt) < NIGHT_SUN_ELEVATION
+    step_hours = step_days*24.
+    night_up = above & night[:, np.newaxis, :]
+    joint_up = above.all(axis=1) & night
+    season = {'dates':dates,
+              'hours_up':above.sum(axis=-1).T*step_hours,
+              'night_hours':night_up.sum(axis=-1).T*step_hours,
+              'joint_night_hours':joint_up.sum(axis=-1)*step_hours}
+    # Distances to the Sun at noon and the closest approach of the Moon
+    target_vec = sc.get_unit_vectors(np.degrees(date_ra), np.degrees(date_dec))
+    sun_vec = sc.get_unit_vectors(np.degrees(sun_ra[:, n_steps//2]),
+                                  np.degrees(sun_dec[:, n_steps//2]))
+    season['sun_separation'] = sc.get_separation(target_vec,
+                                                 sun_vec[:, np.newaxis, :]).T
+    moon_vec = sc.get_unit_vectors(*np.degrees(get_body_grid('Moon', start, jd)))
+    moon_separation = sc.get_separation(target_vec[:, :, np.newaxis, :],
+                                        moon_vec[:, np.newaxis, :, :])
+    season['moon_separation'] = moon_separation.min(axis=-1).T
+    return season
+
+def season_to_dict(names, season):
+    """Convert target names and a season into a JSON-serializable dict"""
+    out = {'names':list(names), 'dates':season['dates'],
+           'joint_night_hours':np.asarray(season['joint_night_hours']).tolist()}
+    for name in SEASON_QUANTITIES:
+        out[name] = np.asarray(season[name]).tolist()
+    return out
+
+def season_from_dict(data):
+    """Convert a dict produced by season_to_dict back into the target names
+       and a season"""
+    season = {'dates':data['dates'],
+              'joint_night_hours':np.asarray(data['joint_night_hours'],
+                                             dtype=np.float64)}
+    for name in SEASON_QUANTITIES:
+        season[name] = np.asarray(data[name], dtype=np.float64)
+    return data['names'], season
+
+def find_best_dates(season, n_dates=N_BEST_DATES):
+    """Return the n_dates dates with the most night-time hours during which
+       all targets are above the elevation limit, and these numbers of
+       hours, best first. Earlier dates win ties."""
+    score = season['joint_night_hours']
+    order = np.argsort(-score, kind='stable')[:n_dates]
+    return [(season['dates'][idx], float(score[idx])) for idx in order]
+
+def make_season_figure(names, season, quantity='night_hours'):
+    """Generate a plotly figure showing one of SEASON_QUANTITIES for every
+       target and day as a heatmap. For the night-time hours, the hours
+       during which all targets are observable together are shown as an
+       extra row on top."""
+    names = list(names)
+    values = season[quantity]
+    if quantity == 'night_hours':
+        names = names + ['All targets']
+        values = np.vstack([values, season['joint_night_hours']])
+    best = ', '.join('{} ({:.1f} h)'.format(date, score) \
+                     for date, score in find_best_dates(season))
+    data = [Heatmap(x=season['dates'], y=names, z=np.round(values, 2).tolist(),
+                    colorbar={'title':SEASON_LABELS[quantity]})]
+    layout = {'xaxis':{'title':'Date'},
+              'yaxis':{'title':'Target'},
+              'title':'{}. Best dates: {}'.format(SEASON_LABELS[quantity], best)
+             }
+    return {'data':data, 'layout':layout}
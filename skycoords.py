@@ -0,0 +1,158 @@
+"""Functions to convert coordinate strings into Astropy SkyCoord objects quickly
+   and to compute angular distances between many pointings at once"""
+
+import re
+from functools import lru_cache
+import numpy as np
+from astropy.coordinates import SkyCoord
+from astropy import units as u
+
+# Maximum number of coordinate strings and coordinate lists kept in the caches
+COORD_CACHE_SIZE = 4096
+SKYCOORD_CACHE_SIZE = 256
+
+# Coordinate formats produced by the calculator itself. Sexagesimal strings as
+# returned by SkyCoord.to_string('hmsdms') and decimal degrees like
+# "123.4d +45.6d". Other formats are left to SkyCoord.
+HMSDMS_PATTERN = re.compile(r'^\s*(\d+)h(\d+)m(\d+(?:\.\d*)?)s\s+'
+                            r'([+-]?)(\d+)d(\d+)m(\d+(?:\.\d*)?)s\s*$')
+DEG_PATTERN = re.compile(r'^\s*(\d+(?:\.\d*)?)d\s+([+-]?)(\d+(?:\.\d*)?)d\s*$')
+
+# Astropy converts hour angles to degrees with this factor, which is not
+# exactly 15 in floating point
+HOURANGLE_TO_DEG = u.hourangle.to(u.deg)
+
+def parse_coord_strings(strings):
+    """Parse a list of coordinate strings in the hmsdms or decimal degree
+       formats. The regular expressions are matched per string, but the
+       conversion to degrees and the range checks are done on whole arrays.
+       Returns arrays of RA and Dec in degrees. Strings that are in a
+       different format or out of range are NaN."""
+    n_coord = len(strings)
+    ra = np.full(n_coord, np.nan)
+    dec = np.full(n_coord, np.nan)
+    hms_idx, hms_fields, deg_idx, deg_fields = [], [], [], []
+    for idx, text in enumerate(strings):
+        match = HMSDMS_PATTERN.match(text)
+        if match is not None:
+            hms_idx.append(idx)
+            hms_fields.append(match.groups())
+            continue
+        match = DEG_PATTERN.match(text)
+        if match is not None:
+            deg_idx.append(idx)
+            deg_fields.append(match.groups())
+    if hms_idx:
+        fields = np.asarray(hms_fields)
+        hour, minute, second, deg, arcmin, arcsec = \
+            fields[:, [0, 1, 2, 4, 5, 6]].astype(np.float64).T
+        sign = np.where(fields[:, 3] == '-', -1., 1.)
+        # Same arithmetic as astropy so that the results are identical
+        ra_hms = (hour + minute/60. + second/3600.)*HOURANGLE_TO_DEG
+        dec_dms = sign*(deg + arcmin/60. + arcsec/3600.)
+        valid = (hour < 24) & (minute < 60) & (second < 60) & (arcmin < 60) & \
+                (arcsec < 60) & (np.abs(dec_dms) <= 90)
+        idx = np.asarray(hms_idx)[valid]
+        ra[idx], dec[idx] = ra_hms[valid], dec_dms[valid]
+    if deg_idx:
+        fields = np.asarray(deg_fields)
+        ra_deg = fields[:, 0].astype(np.float64)
+        dec_sign = np.where(fields[:, 1] == '-', -1., 1.)
+        dec_deg = dec_sign*fields[:, 2].astype(np.float64)
+        valid = (ra_deg < 360) & (np.abs(dec_deg) <= 90)
+        idx = np.asarray(deg_idx)[valid]
+        ra[idx], dec[idx] = ra_deg[valid], dec_deg[valid]
+    return ra, dec
+
+@lru_cache(maxsize=COORD_CACHE_SIZE)
+def parse_coord(text):
+    """Return the RA and Dec in degrees of a single coordinate string in any
+       format accepted by SkyCoord. Results are cached. Raises ValueError if
+       the string is not a valid coordinate."""
+    ra, dec = parse_coord_strings([text])
+    if np.isnan(ra[0]):
+        coord = SkyCoord(text)
+        return float(coord.ra.deg), float(coord.dec.deg)
+    return float(ra[0]), float(dec[0])
+
+def get_radec(strings):
+    """Return arrays of RA and Dec in degrees for a list of coordinate strings.
+       Raises ValueError if any of them is not a valid coordinate."""
+    strings = list(strings)
+    ra, dec = parse_coord_strings(strings)
+    # Fall back to the cached SkyCoord parser for the other formats
+    for idx in np.flatnonzero(np.isnan(ra)):
+        ra[idx], dec[idx] = parse_coord(strings[idx])
+    return ra, dec
+
+@lru_cache(maxsize=SKYCOORD_CACHE_SIZE)
+def _get_sky_coords(strings):
+    ra, dec = get_radec(strings)
+    return SkyCoord(ra, dec, unit=u.deg)
+
+def get_sky_coords(strings):
+    """Return a SkyCoord array for a list of coordinate strings. The arrays
+       are cached and shared between callers, so they must not be modified.
+       Raises ValueError if any of the strings is not a valid coordinate."""
+    return _get_sky_coords(tuple(strings))
+
+def get_sky_coord(text):
+    """Return a scalar SkyCoord for a single coordinate string"""
+    return get_sky_coords([text])[0]
+
+def get_unit_vectors(ra, dec):
+    """Convert arrays of RA and Dec in degrees into an (N, 3) array of
+       Cartesian unit vectors"""
+    ra, dec = np.radians(ra), np.radians(dec)
+    return np.stack([np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)],
+                    axis=-1)
+
+def get_separation(vec_a, vec_b):
+    """Return the angular separation in degrees between two broadcastable
+       arrays of unit vectors with a last axis of length 3. The chord length
+       between the unit vectors is used, which is accurate for both small and
+       large separations."""
+    # Accumulate one component at a time to avoid a temporary with an extra
+    # axis of length 3 in the broadcast shape
+    chord_sq = 0.
+    for axis in range(3):
+        diff = vec_a[..., axis] - vec_b[..., axis]
+        chord_sq = chord_sq + diff*diff
+    return np.degrees(2.*np.arcsin(np.minimum(np.sqrt(chord_sq)/2., 1.)))
+
+def get_separation_matrix(ra, dec):
+    """Return the (N, N) matrix of angular separations in degrees between
+       every pair of N pointings given by RA and Dec in degrees"""
+    vec = get_unit_vectors(ra, dec)
+    return get_separation(vec[:, np.newaxis, :], vec[np.newaxis, :, :])
+
+def get_centroid(ra, dec):
+    """Return the RA and Dec in degrees of the spherical centroid of a set of
+       pointings, i.e. the direction of the mean of their unit vectors. Unlike
+       the mean RA, this is well-defined for pointings on both sides of RA=0.
+       For pointings that are spread over the whole sky the centroid is
+       ill-defined and the first pointing is returned."""
+    mean_vec = np.mean(get_unit_vectors(ra, dec), axis=0)
+    norm = np.linalg.norm(mean_vec)
+    if norm < 1e-12:
+        return float(np.asarray(ra).ravel()[0]), float(np.asarray(dec).ravel()[0])
+    mean_vec /= norm
+    centroid_ra = np.degrees(np.arctan2(mean_vec[1], mean_vec[0])) % 360.
+    centroid_dec = np.degrees(np.arcsin(np.clip(mean_vec[2], -1., 1.)))
+    return float(centroid_ra), float(centroid_dec)
+
+def check_beam_containment(ra, dec, radius):
+    """Check if a set of pointings fits inside a beam of the given radius in
+       degrees centred on their spherical centroid.
+       Returns:
+       * centroid - (RA, Dec) of the beam centre in degrees
+       * offsets  - Angular distance of each pointing from the centre in degrees
+       * inside   - Boolean array, True for pointings inside the beam"""
+    centroid = get_centroid(ra, dec)
+    offsets = get_separation(get_unit_vectors(ra, dec), get_unit_vectors(*centroid))
+    return centroid, offsets, offsets <= radius
+
+def get_cache_info():
+    """Return the hit and miss statistics of the coordinate caches"""
+    return {'coord':parse_coord.cache_info(),
+            'skycoord':_get_sky_coords.cache_info()}
@@ -0,0 +1,84 @@
+"""Positions of the LOFAR stations.
+
+The elevation of a target as seen by an observation is the lowest elevation
+over the stations that take part in it. The positions below are geodetic
+longitude and latitude in degrees and height in metres. They are approximate
+(the remote and international stations to about 0.1 degree), which changes
+the elevation of a target by well under a degree. Replace them by the
+official station positions if more accuracy is needed.
+
+The calculator only knows how many stations of each type take part in an
+observation, not which ones, so select_stations approximates the station
+subset by the first stations of each type in the tables below."""
+
+from collections import OrderedDict
+
+# Centre of the Dutch array. The core stations all lie within about 2 km of
+# it, which changes the elevation of a target by less than 0.02 degree, so
+# they share its position.
+CORE_POSITION = (6.869882, 52.915129, 15.)
+
+CORE_STATIONS = ['CS001', 'CS002', 'CS003', 'CS004', 'CS005', 'CS006', 'CS007',
+                 'CS011', 'CS013', 'CS017', 'CS021', 'CS024', 'CS026', 'CS028',
+                 'CS030', 'CS031', 'CS032', 'CS101', 'CS103', 'CS201', 'CS301',
+                 'CS302', 'CS401', 'CS501']
+
+REMOTE_POSITIONS = OrderedDict([
+    ('RS106', (6.98, 52.88, 15.)),
+    ('RS205', (6.96, 53.02, 15.)),
+    ('RS208', (6.92, 53.19, 15.)),
+    ('RS210', (6.88, 53.45, 15.)),
+    ('RS305', (6.81, 52.95, 15.)),
+    ('RS306', (6.70, 52.92, 15.)),
+    ('RS307', (6.57, 52.95, 15.)),
+    ('RS310', (6.33, 53.02, 15.)),
+    ('RS406', (6.84, 52.84, 15.)),
+    ('RS407', (6.78, 52.83, 15.)),
+    ('RS409', (6.55, 52.74, 15.)),
+    ('RS503', (6.87, 52.94, 15.)),
+    ('RS508', (6.95, 53.13, 15.)),
+    ('RS509', (7.06, 53.27, 15.))
+])
+
+INTERNATIONAL_POSITIONS = OrderedDict([
+    ('DE601', (6.883, 50.524, 0.)),
+    ('DE602', (11.287, 48.501, 0.)),
+    ('DE603', (11.711, 50.980, 0.)),
+    ('DE604', (13.016, 52.438, 0.)),
+    ('DE605', (6.425, 50.897, 0.)),
+    ('FR606', (2.193, 47.376, 0.)),
+    ('SE607', (11.930, 57.399, 0.)),
+    ('UK608', (-1.434, 51.144, 0.)),
+    ('DE609', (9.970, 53.699, 0.)),
+    ('PL610', (17.074, 52.276, 0.)),
+    ('PL611', (20.489, 49.965, 0.)),
+    ('PL612', (20.588, 53.594, 0.)),
+    ('IE613', (-7.921790, 53.094967, 0.)),
+    ('LV614', (21.854916, 57.553493, 0.))
+])
+
+REMOTE_STATIONS = list(REMOTE_POSITIONS)
+INTERNATIONAL_STATIONS = list(INTERNATIONAL_POSITIONS)
+
+# Position of every station by name
+STATIONS = OrderedDict([(name, CORE_POSITION) for name in CORE_STATIONS])
+STATIONS.update(REMOTE_POSITIONS)
+STATIONS.update(INTERNATIONAL_POSITIONS)
+
+def select_stations(n_core=len(CORE_STATIONS), n_remote=len(REMOTE_STATIONS),
+                    n_int=0):
+    """Return the names of the stations that stand in for the stations used
+       by an observation with n_core core, n_remote remote, and n_int
+       international stations. This is an approximation: the first stations
+       of each type in the tables above are taken, which need not be the
+       ones actually used. If no station is selected, the first core
+       station is returned so that the centre of the array is used. Raises
+       ValueError if more stations are requested than exist."""
+    n_core, n_remote, n_int = int(n_core), int(n_remote), int(n_int)
+    if not (0 <= n_core <= len(CORE_STATIONS) and \
+            0 <= n_remote <= len(REMOTE_STATIONS) and \
+            0 <= n_int <= len(INTERNATIONAL_STATIONS)):
+        raise ValueError('Invalid number of stations')
+    names = CORE_STATIONS[:n_core] + REMOTE_STATIONS[:n_remote] + \
+            INTERNATIONAL_STATIONS[:n_int]
+    return tuple(names) if names else (CORE_STATIONS[0],)
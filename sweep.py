@@ -0,0 +1,168 @@
+"""Functions to compute trade-off surfaces over ranges of observing parameters"""
+
+import numpy as np
+from plotly.graph_objs import Heatmap
+import backend as bk
+
+# Axes of a sweep cube in the order in which they appear in the cube
+SWEEP_AXES = ['obs_t', 'n_sb', 'integ_t', 't_avg', 'f_avg']
+
+# Human readable labels for the sweep axes and the quantities in a cube
+SWEEP_LABELS = {
+    'obs_t':'Observation time (in seconds)',
+    'n_sb':'Number of subbands',
+    'integ_t':'Integration time (in seconds)',
+    't_avg':'Time averaging factor',
+    'f_avg':'Frequency averaging factor',
+    'im_noise':'Theoretical image sensitivity (uJy/beam)',
+    'raw_size':'Raw data size (in GB)',
+    'proc_size':'Processed data size (in GB)',
+    'pipe_time':'Pipeline processing time (in hours)'
+}
+
+# Quantities computed for every point in a sweep cube
+SWEEP_QUANTITIES = ['im_noise', 'raw_size', 'proc_size', 'pipe_time']
+
+# Quantities that are only computed if a pipeline is selected
+PIPELINE_QUANTITIES = ['proc_size', 'pipe_time']
+
+# Maximum number of values along a sweep axis and in a sweep cube. The cube
+# is sent to the browser, so its size must stay bounded.
+MAX_AXIS_POINTS = 100
+MAX_CUBE_POINTS = 20000
+
+def parse_axis_range(text):
+    """Convert a user-specified axis range into a list of floats. The range
+       can either be a comma separated list of values (e.g. "1,2,4") or a
+       start:stop:num triplet of evenly spaced values (e.g. "3600:28800:8").
+       Raise ValueError if the text cannot be parsed or if it has more than
+       MAX_AXIS_POINTS values."""
+    text = str(text).strip()
+    if ':' in text:
+        start, stop, num = text.split(':')
+        num = int(num)
+        if num > MAX_AXIS_POINTS:
+            raise ValueError('Too many values in axis range')
+        values = np.linspace(float(start), float(stop), num)
+    else:
+        items = text.split(',')
+        if len(items) > MAX_AXIS_POINTS:
+            raise ValueError('Too many values in axis range')
+        values = np.asarray([float(item) for item in items])
+    if values.size == 0:
+        raise ValueError('Empty axis range')
+    return values.tolist()
+
+def make_sweep_cube(obs_t, n_sb, integ_t, t_avg, f_avg, n_core=24, n_remote=14,
+                    n_int=14, hba_mode='hbadualinner', cal_t=0., n_cal=0, n_chan=64,
+                    n_beams=1, dy_compress='enable', ateam_names=None,
+                    pipe_type='preprocessing'):
+    """Compute image noise, raw data size, processed data size and pipeline
+       processing time over a grid of observing parameters.
+       Input parameters:
+       * obs_t, n_sb, integ_t, t_avg, f_avg - A scalar or a list of values for
+                                             each axis in SWEEP_AXES
+       * The remaining parameters fix the rest of the setup and have the same
+         meaning as in the backend functions.
+       Returns:
+       A dict with the keys 'dims' (axis names in cube order), 'coords' (axis
+       name -> list of values), and one N-dimensional NumPy array per entry in
+       SWEEP_QUANTITIES. Every array has one dimension per sweep axis. The
+       entries in PIPELINE_QUANTITIES are left out if pipe_type is 'none'.
+       Raise ValueError if the cube has more than MAX_CUBE_POINTS points."""
+    coords = {}
+    grids = {}
+    n_dims = len(SWEEP_AXES)
+    for idx, (name, values) in enumerate(zip(SWEEP_AXES,
+                                             [obs_t, n_sb, integ_t, t_avg, f_avg])):
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        coords[name] = values.tolist()
+        # Reshape each axis so that they broadcast into an N-d grid
+        shape = [1]*n_dims
+        shape[idx] = values.size
+        grids[name] = values.reshape(shape)
+    cube_shape = tuple(len(coords[name]) for name in SWEEP_AXES)
+    if np.prod(cube_shape) > MAX_CUBE_POINTS:
+        raise ValueError('Too many points in sweep cube')
+
+    if ateam_names is None:
+        n_ateams = 0
+    else:
+        n_ateams = len(ateam_names)
+    n_baselines = bk.compute_baselines(n_core, n_remote, n_int, hba_mode)
+    n_sb_grid = grids['n_sb'].astype(int)
+    f_avg_grid = grids['f_avg'].astype(int)
+
+    im_noise = bk.calculate_im_noise_batch(n_core, n_remote, n_int, hba_mode,
+                                           grids['obs_t'], n_sb_grid)
+    raw_size = bk.calculate_raw_size_batch(grids['obs_t'], cal_t, n_cal,
+                                           grids['integ_t'], n_baselines, n_chan,
+                                           n_sb_grid, n_beams)
+    quantities = {'im_noise':im_noise, 'raw_size':raw_size}
+    if pipe_type != 'none':
+        quantities['proc_size'] = bk.calculate_proc_size_batch(
+            grids['obs_t'], cal_t, n_cal, grids['integ_t'], n_baselines, n_chan,
+            n_sb_grid, n_beams, grids['t_avg'], f_avg_grid, dy_compress)
+        quantities['pipe_time'] = bk.calculate_pipe_time_batch(
+            grids['obs_t'], cal_t, n_cal, n_sb_grid, n_beams, hba_mode, n_ateams)
+    cube = {'dims':list(SWEEP_AXES), 'coords':coords}
+    for name, values in quantities.items():
+        cube[name] = np.broadcast_to(values, cube_shape)
+    return cube
+
+def sweep_cube_to_dict(cube):
+    """Convert a sweep cube into a JSON-serializable dict"""
+    out = {'dims':cube['dims'], 'coords':cube['coords']}
+    for name in SWEEP_QUANTITIES:
+        if name in cube:
+            out[name] = np.asarray(cube[name]).tolist()
+    return out
+
+def sweep_cube_from_dict(data):
+    """Convert a dict produced by sweep_cube_to_dict back into a sweep cube"""
+    cube = {'dims':data['dims'], 'coords':data['coords']}
+    for name in SWEEP_QUANTITIES:
+        if name in data:
+            cube[name] = np.asarray(data[name], dtype=np.float64)
+    return cube
+
+def slice_sweep_cube(cube, quantity, x_dim, y_dim, indices):
+    """Extract a 2-D slice from a sweep cube.
+       Input parameters:
+       * cube     - Sweep cube returned by make_sweep_cube
+       * quantity - Name of the quantity to slice (see SWEEP_QUANTITIES)
+       * x_dim    - Name of the axis to display along x
+       * y_dim    - Name of the axis to display along y
+       * indices  - Dict mapping the remaining axis names to the index along
+                    that axis. Missing axes default to index 0.
+       Returns:
+       x values, y values, and a 2-D array with shape (len(y), len(x))."""
+    selection = []
+    for name in cube['dims']:
+        if name in (x_dim, y_dim):
+            selection.append(slice(None))
+        else:
+            selection.append(indices.get(name, 0))
+    values = np.asarray(cube[quantity])[tuple(selection)]
+    # After slicing, the remaining axes are in cube order
+    if cube['dims'].index(x_dim) < cube['dims'].index(y_dim):
+        values = values.T
+    return cube['coords'][x_dim], cube['coords'][y_dim], values
+
+def make_sweep_figure(cube, quantity, x_dim, y_dim, indices):
+    """Generate a plotly figure showing a 2-D slice through a sweep cube as a
+       heatmap. See slice_sweep_cube for a description of the inputs."""
+    xaxis, yaxis, values = slice_sweep_cube(cube, quantity, x_dim, y_dim, indices)
+    # Describe the fixed values of the axes that are not displayed
+    fixed = []
+    for name in cube['dims']:
+        if name not in (x_dim, y_dim):
+            value = cube['coords'][name][indices.get(name, 0)]
+            fixed.append('{}={:g}'.format(name, value))
+    data = [Heatmap(x=xaxis, y=yaxis, z=values.tolist(),
+                    colorbar={'title':SWEEP_LABELS[quantity]})]
+    layout = {'xaxis':{'title':SWEEP_LABELS[x_dim]},
+              'yaxis':{'title':SWEEP_LABELS[y_dim]},
+              'title':'{} ({})'.format(SWEEP_LABELS[quantity], ', '.join(fixed))
+             }
+    return {'data':data, 'layout':layout}
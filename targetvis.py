@@ -1,13 +1,21 @@
 """Functions and constants for target visibility calculations"""
 
-from datetime import datetime, timedelta
-from astroquery.simbad import Simbad
+import json
+from datetime import timedelta
 from astropy.coordinates import SkyCoord
 from astropy import units as u
-from ephem import Observer, FixedBody, Sun, Moon, Jupiter
 import numpy as np
 from plotly.graph_objs import Scatter
 from plotly.graph_objects import Table
+from plotly.utils import PlotlyJSONEncoder
+import skycoords as sc
+import elevation as el
+import ephemeris as eph
+import events as ev
+import atlas as at
+import stations as st
+import resolver
+from backend import TILE_BEAM_SIZE
 
 # Define coordinates of calibrators
 CALIB_COORDINATES = {
@@ -25,33 +33,16 @@ ATEAM_COORDINATES = {
     'VirA':'12h30m49.4233s +12d23m28.043s'
     }
 
-# FWHM of HBA tile beam in deg
-TILE_BEAM_SIZE = 20
+# Calibrator and A-team catalogs as SkyCoord arrays in the order of the names
+CALIB_NAMES = list(CALIB_COORDINATES)
+CALIB_SKYCOORDS = sc.get_sky_coords(CALIB_COORDINATES.values())
+ATEAM_NAMES = list(ATEAM_COORDINATES)
+ATEAM_SKYCOORDS = sc.get_sky_coords(ATEAM_COORDINATES.values())
 
 # TODO: FWHM of LBA dipole beam in deg
 
-def get_dutch_lofar_object():
-    """Return an ephem.Observer() object with details containing the Dutch
-       Lofar array"""
-    lofar = Observer()
-    lofar.lon = '6.869882'
-    lofar.lat = '52.915129'
-    lofar.elevation = 15.
-    return lofar
-
-def get_lv_lofar_object():
-    """Return an ephem.Observer() object with details containing the LV station"""
-    lv = Observer()
-    lv.lon = '21.854916'
-    lv.lat = '57.553493'
-    return lv
-
-def get_ie_lofar_object():
-    """Return an ephem.Observer() object with details containing the IE station"""
-    ie = Observer()
-    ie.lon = '-7.921790'
-    ie.lat = '53.094967'
-    return ie
+# Number of 5 minute steps in an hour. Distances are computed hourly.
+HOURLY_STEP = 12
 
 def get_station_beam_size(n_core, n_remote, n_int, antenna_mode):
     """Return FWHM of station beam for a given antenna list and array mode"""
@@ -75,20 +66,16 @@ def get_station_beam_size(n_core, n_remote, n_int, antenna_mode):
     return station_beam
 
 def get_tile_beam(coord):
-    """Returns the midpoint between the different pointings in coord.
-       If coord has one item, midpoint is the same as that item.
-       Note that the midpoint on the sky for large angular separation
-       is ill-defined. In our case, it is almost always within ~7 degrees
-       and so this should be fine. For more details, see
-       https://github.com/astropy/astropy/issues/5766"""
-    temp_ra = 0.
-    temp_dec = 0.
-    n_beams = len(coord)
-    for c in coord:
-        this_coord = SkyCoord(c)
-        temp_ra += this_coord.ra.degree
-        temp_dec += this_coord.dec.degree
-    t_beam = SkyCoord(temp_ra/n_beams, temp_dec/n_beams, unit=u.deg)
+    """Returns the spherical centroid of the different pointings in coord,
+       i.e. the direction of the mean of their unit vectors. If coord has one
+       item, the centroid is the same as that item. Unlike the average of
+       RA and Dec, this is correct for pointings on both sides of RA=0.
+       The centroid is ill-defined for pointings spread over the whole sky,
+       but in our case they are always within the tile beam. For more
+       details, see https://github.com/astropy/astropy/issues/5766"""
+    ra, dec = sc.get_radec(coord)
+    t_ra, t_dec = sc.get_centroid(ra, dec)
+    t_beam = SkyCoord(t_ra, t_dec, unit=u.deg)
     return t_beam
 
 def get_axes_range(layout):
@@ -130,26 +117,24 @@ def find_beam_layout(src_name, coord, n_core, n_remote, n_int, antenna_mode):
 
     label_offset = 0.5
     # Iterate over coord and plot the station beam
-    index = 0
-    for c in coord_list:
-        s_beam = SkyCoord(c)
+    beam_ra, beam_dec = sc.get_radec(coord_list)
+    for index, (ra, dec) in enumerate(zip(beam_ra, beam_dec)):
         layout['shapes'].append({
             'type':'circle',
             'xref':'x',
             'yref':'y',
-            'x0': s_beam.ra.deg-station_beam_size,
-            'x1': s_beam.ra.deg+station_beam_size,
-            'y0': s_beam.dec.deg-station_beam_size,
-            'y1': s_beam.dec.deg+station_beam_size,
+            'x0': ra-station_beam_size,
+            'x1': ra+station_beam_size,
+            'y0': dec-station_beam_size,
+            'y1': dec+station_beam_size,
             'line': {'color':'rgba(50, 171, 96, 1)'}
         })
         data.append(
-            Scatter(x=[s_beam.ra.deg],
-                    y=[s_beam.dec.deg+station_beam_size+label_offset],
+            Scatter(x=[ra],
+                    y=[dec+station_beam_size+label_offset],
                     text=[src_name_list[index]],
                     mode='text')
         )
-        index += 1
 
     # If antenna_mode is hba, plot the tile beam
     if 'hba' in antenna_mode:
@@ -180,37 +165,23 @@ def find_beam_layout(src_name, coord, n_core, n_remote, n_int, antenna_mode):
     layout['yaxis']['range'] = [ymin-bufsize, ymax+bufsize]
     return {'layout': layout, 'data':data}
 
-def resolve_lotss_source(name):
-    """Check if a given source name is a LoTSS pointing? If it is, return its
-       coordinates in (hourangle, deg) units. Else, return None."""
-    coord = None
-    with open('lotss_pointings.txt', newline='\n') as f:
-        text = f.readlines()
-        for line in text:
-            if name == line.split()[0]:
-                coord = {'RA':[line.split()[3]], 'DEC':[line.split()[4]]}
-                break
-    return coord
-
 def resolve_source(names):
-    """For a given source name, use astroquery to find its coordinates.
-        The source name can be a single source or a comma separated list."""
-    return_string = []
-    try:
-        for name in names.split(','):
-            query = Simbad.query_object(name)
-            if query is None:
-                # Source is not a valid Simbad object. Is it a LoTSS pointing?
-                query = resolve_lotss_source(name)
-            ra = query['RA'][0]
-            dec = query['DEC'][0]
-            coord = SkyCoord('{} {}'.format(ra, dec), unit=(u.hourangle, u.deg))
-            return_string.append(coord.to_string('hmsdms'))
-        # Convert the list to a comma separated list before returning
-        return_string = ','.join(return_string)
-    except:
-        return_string = None
-    return return_string
+    """For a given source name, find its coordinates. Names are looked up in
+       the local name cache first and then with astroquery (see resolver.py).
+       The source name can be a single source or a comma separated list, whose
+       names are resolved concurrently.
+       Returns the coordinates as a comma separated list, or None if any of
+       the names cannot be resolved, and the results of the names that could
+       not be resolved (see resolver.resolve_names). Their error tells an
+       unknown name apart from an unreachable name resolver."""
+    if not isinstance(names, str):
+        return None, []
+    results = resolver.resolve_names(names.split(','))
+    failed = [result for result in results if result['coord'] is None]
+    if failed:
+        return None, failed
+    # Convert the list to a comma separated list before returning
+    return ','.join(result['coord'] for result in results), []
 
 def get_elevation_solar(obs_date, offender):
     """For a given observation date and bright solar system object, return its
@@ -222,147 +193,128 @@ def get_elevation_solar(obs_date, offender):
        Returns:
        List of elevations in degrees. If offender is invalid, return None.
     """
-    # Create the telescope object
-    lofar = get_dutch_lofar_object()
-    if offender == 'Sun':
-        obj = Sun()
-    elif offender == 'Moon':
-        obj = Moon()
-    elif offender == 'Jupiter':
-        obj = Jupiter()
-    else:
+    if offender not in el.SOLAR_BODIES:
         return None
-
-    yaxis = []
-    for time in obs_date:
-        lofar.date = time
-        obj.compute(lofar)
-        elevation = float(obj.alt)*180./np.pi
-        if elevation < 0:
-            elevation = np.nan
-        yaxis.append(elevation)
-
-    return yaxis
-
-def get_elevation_target(target, obs_date, n_int):
-    """For a given target and list of times, return a list of its elevation.
-       If n_int is 0, compute elevation with respect to the NL array. If n_int>0,
-       elevation needs to take into account the entire European array.
-       Input Parameters:
-       * target: An ephem.FixedBody() object
-       * obs_date: List of datetime.datetime objects
-       * n_int: Number of international stations to use in the observation.
-    """
-    lofar = get_dutch_lofar_object()
-    yaxis = []
-    if n_int == 0:
-        # We are observing with the Dutch array
-        for time in obs_date:
-            lofar.date = time
-            target.compute(lofar)
-            elevation = float(target.alt)*180./np.pi
-            if elevation < 0:
-                elevation = np.nan
-            yaxis.append(elevation)
+    if obs_date == el.get_time_axis(obs_date[0].strftime('%Y-%m-%d')):
+        # The default time axis of a day is available in the shared ephemeris
+        ephemeris = eph.get_ephemeris(obs_date[0].strftime('%Y-%m-%d'), 'NL')
+        elevation = ephemeris['alt'][eph.get_body_index(offender)]
     else:
-        # We are observing with the entire ILT array
-        # In addition to lofar, we also need IE and LV Observer() objects
-        lv = get_lv_lofar_object()
-        ie = get_ie_lofar_object()
-        elevation = [0, 0, 0]
-        for time in obs_date:
-            lofar.date = time
-            lv.date = time
-            ie.date = time
-            target.compute(lofar)
-            elevation[0] = float(target.alt)*180./np.pi
-            target.compute(lv)
-            elevation[1] = float(target.alt)*180./np.pi
-            target.compute(ie)
-            elevation[2] = float(target.alt)*180./np.pi
-            if np.min(elevation) < 0:
-                yaxis.append(np.nan)
-            else:
-                yaxis.append(np.min(elevation))
-    return yaxis
+        elevation = el.compute_body_elevation(offender, obs_date, el.DUTCH_SITES)[0]
+    return np.where(elevation < 0, np.nan, elevation).tolist()
+
+def get_stations(n_int, stations=None):
+    """Return stations if it is given. Else, return the Dutch array plus the
+       first n_int international stations."""
+    return st.select_stations(n_int=n_int) if stations is None else stations
 
-def find_target_elevation(src_name, coord, obs_date, n_int):
+def find_target_elevation(src_name, coord, obs_date, n_int, stations=None):
     """For a given date and coordinate, find the elevation of the source every
-       10 mins. Return both the datetime object array and the elevation array"""
-    # Find the start and the end times
-    d = obs_date.split('-')
-    start_time = datetime(int(d[0]), int(d[1]), int(d[2]), 0, 0, 0)
-    end_time = start_time + timedelta(days=1)
+       5 mins as seen by all stations in the observation, i.e. the lowest
+       elevation over the stations (see get_stations). Return both the
+       datetime object array and the elevation array"""
     # Get a list of values along the time axis
-    xaxis = []
-    temp_time = start_time
-    while temp_time < end_time:
-        xaxis.append(temp_time)
-        temp_time += timedelta(minutes=5)
+    xaxis = el.get_time_axis(obs_date)
 
-    # Create a target object
+    # Get the elevation of all targets at all times from the cache, computing
+    # the missing ones in one go
     return_data = []
     src_name_list = src_name.split(',')
+    if len(coord) > 0:
+        target_ra, target_dec = sc.get_radec(coord)
+        elevation = el.get_elevation_curves(target_ra, target_dec, obs_date,
+                                            get_stations(n_int, stations),
+                                            compute=at.compute_elevation)
     for i in range(len(coord)):
-        target = FixedBody()
-        target._epoch = '2000'
-        coord_target = SkyCoord(coord[i])
-        target._ra = coord_target.ra.radian
-        target._dec = coord_target.dec.radian
-
-        # Iterate over each time interval and estimate the elevation of the target
-        yaxis = get_elevation_target(target, xaxis, n_int)
         # Create a Plotly Scatter object that can be plotted later
-        return_data.append(Scatter(x=xaxis, y=yaxis, mode='lines',
+        return_data.append(Scatter(x=xaxis, y=elevation[i].tolist(), mode='lines',
                                    line={}, name=src_name_list[i]))
 
     # We should also plot Sun, Moon, and Jupiter by default
-    yaxis = get_elevation_solar(xaxis, 'Sun')
-    return_data.append(Scatter(x=xaxis, y=yaxis, mode='lines',
-                               line={}, name='Sun'))
-    yaxis = get_elevation_solar(xaxis, 'Moon')
-    return_data.append(Scatter(x=xaxis, y=yaxis, mode='lines',
-                               line={}, name='Moon'))
-    yaxis = get_elevation_solar(xaxis, 'Jupiter')
-    return_data.append(Scatter(x=xaxis, y=yaxis, mode='lines',
-                               line={}, name='Jupiter'))
+    for name in ['Sun', 'Moon', 'Jupiter']:
+        yaxis = get_elevation_solar(xaxis, name)
+        return_data.append(Scatter(x=xaxis, y=yaxis, mode='lines',
+                                   line={}, name=name))
     return return_data
 
-def add_sun_rise_and_set_times(obs_date, n_int, elevation_fig):
+def get_target_events(src_name, coord, obs_date, n_int, elevation=0.,
+                      stations=None):
+    """For a given date and list of coordinates, find the rise, transit, and
+       set times of each target with respect to elevation (in degrees). The
+       rise and set times are those of the window in which a target is up at
+       all stations in the observation (see get_stations).
+       Return a list with a dict per target with the keys name, rise,
+       transit, set (datetime objects, or None if the target does not rise or
+       set), and max_elevation (in degrees)."""
+    if len(coord) == 0:
+        return []
+    target_ra, target_dec = sc.get_radec(coord)
+    sites = el.get_unique_sites(get_stations(n_int, stations))
+    events = ev.find_common_events(target_ra, target_dec, obs_date, sites,
+                                   elevation)
+    results = []
+    for idx, name in enumerate(src_name.split(',')[:len(coord)]):
+        result = {'name':name}
+        for event in ev.EVENTS:
+            result[event] = ev.to_datetime(events[event][idx])
+        result['max_elevation'] = float(events['max_elevation'][idx])
+        results.append(result)
+    return results
+
+def make_elevation_figure(src_name, coord, obs_date, n_int, stations=None):
+    """Generate a plotly figure showing the elevation of the targets in coord
+       and the bright solar system objects on obs_date, with the sun rise and
+       set times highlighted and the transits of the targets marked."""
+    data = find_target_elevation(src_name, coord, obs_date, n_int, stations)
+    elevation_fig = {'data':data,
+                     'layout':{
+                         'xaxis':{'title':'Time (UTC)'},
+                         'yaxis':{'title':'Elevation'},
+                         'title':'Target visibility plot',
+                         'shapes':[],
+                         'annotations':[]
+                     }
+                    }
+    elevation_fig = add_sun_rise_and_set_times(obs_date, n_int, elevation_fig,
+                                               stations)
+    return add_target_transits(get_target_events(src_name, coord, obs_date, n_int,
+                                                 stations=stations),
+                               elevation_fig)
+
+def add_target_transits(target_events, elevation_fig):
+    """Mark the transit time of each target in target_events (see
+       get_target_events) in the supplied elevation_fig if the target is
+       above the horizon at that time. Return the modified elevation_fig."""
+    for item in target_events:
+        if item['transit'] is None or item['max_elevation'] <= 0:
+            continue
+        elevation_fig['layout']['annotations'].append({
+            'x': item['transit'],
+            'y': item['max_elevation'],
+            'xref': 'x',
+            'yref': 'y',
+            'text': 'Transit {:%H:%M}'.format(item['transit']),
+            'showarrow': True,
+            'arrowhead': 2,
+            'ax': 0,
+            'ay': -25
+        })
+    return elevation_fig
+
+def add_sun_rise_and_set_times(obs_date, n_int, elevation_fig, stations=None):
     """
-    For a given obs_date, find the sun rise and set times. Add these to the supplied
-    elevation_fig and return the modified elevation_fig.
+    For a given obs_date, find the sun rise and set times at the stations in the
+    observation (see get_stations). Add these to the supplied elevation_fig and
+    return the modified elevation_fig.
     """
-    d = obs_date.split('-')
-    start_time = datetime(int(d[0]), int(d[1]), int(d[2]), 0, 0, 0)
-    sun = Sun()
-    sun._epoch = '2000'
-    if n_int == 0:
-        # Only Dutch array is being used. Calculate Sun rise and set times in NL
-        lofar = get_dutch_lofar_object()
-        lofar.date = start_time
-        sun_rise = lofar.next_rising(sun).datetime()
-        sun_set = lofar.next_setting(sun).datetime()
-        # Define a 1 hour window around Sun rise and Sun set.
-        sun_rise_beg = sun_rise - timedelta(minutes=30)
-        sun_rise_end = sun_rise + timedelta(minutes=30)
-        sun_set_beg = sun_set - timedelta(minutes=30)
-        sun_set_end = sun_set + timedelta(minutes=30)
-    else:
-        # Calculate sun rise and set times using Latvian and Irish stations
-        lv = get_lv_lofar_object()
-        ie = get_ie_lofar_object()
-        lv.date = start_time
-        ie.date = start_time
-        lv_sun_rise = lv.next_rising(sun).datetime()
-        lv_sun_set = lv.next_setting(sun).datetime()
-        ie_sun_rise = ie.next_rising(sun).datetime()
-        ie_sun_set = ie.next_setting(sun).datetime()
-        # Define a window around sun rise and sun set.
-        sun_rise_beg = lv_sun_rise - timedelta(minutes=30)
-        sun_rise_end = ie_sun_rise + timedelta(minutes=30)
-        sun_set_beg = lv_sun_set - timedelta(minutes=30)
-        sun_set_end = ie_sun_set + timedelta(minutes=30)
+    sites = el.get_unique_sites(get_stations(n_int, stations))
+    events = ev.find_body_events('Sun', obs_date, sites)
+    # Define a window from 30 minutes before the Sun rises (sets) at the first
+    # station until 30 minutes after it rises (sets) at the last station.
+    sun_rise_beg = ev.to_datetime(np.min(events['rise'])) - timedelta(minutes=30)
+    sun_rise_end = ev.to_datetime(np.max(events['rise'])) + timedelta(minutes=30)
+    sun_set_beg = ev.to_datetime(np.min(events['set'])) - timedelta(minutes=30)
+    sun_set_end = ev.to_datetime(np.max(events['set'])) + timedelta(minutes=30)
     # Add to elevation_fig
     elevation_fig['layout']['shapes'].append({
         'type': "rect",
@@ -390,45 +342,42 @@ def add_sun_rise_and_set_times(obs_date, n_int, elevation_fig):
     })
     return elevation_fig
 
-def get_distance_solar(target, obs_date, offender):
-    """Compute the angular distance in degrees between the specified target and
-       the offending radio source in the solar system on the specified observing
-       date.
-       Input parameters:
-       * target   - Coordinate of the target as an Astropy SkyCoord object
-       * obs_date  - Observing date in datetime.datetime format
-       * offender - Name of the offending bright source. Allowed values are
-                    Sun, Moon, Jupiter.
-       Returns:
-       For Moon, the minimum and maximum separation are returned. For others,
-       distance,None is returned."""
-    # Get a list of values along the time axis
-    d = obs_date.split('-')
-    start_time = datetime(int(d[0]), int(d[1]), int(d[2]), 0, 0, 0)
-    end_time = start_time + timedelta(hours=24)
-    taxis = []
-    temp_time = start_time
-    while temp_time < end_time:
-        taxis.append(temp_time)
-        temp_time += timedelta(hours=1)
-    angsep = []
-    if offender == 'Sun':
-        obj = Sun()
-    elif offender == 'Moon':
-        obj = Moon()
-    elif offender == 'Jupiter':
-        obj = Jupiter()
-    else: pass
-    # Estimate the angular distance over the entire time axis
-    for time in taxis:
-        obj.compute(time)
-        coord = SkyCoord('{} {}'.format(obj.ra, obj.dec), unit=(u.hourangle, u.deg))
-        angsep.append(coord.separation(target).deg)
-    # Return appropriate result
-    if offender == 'Moon':
-        return np.min(angsep), np.max(angsep)
-    else:
-        return np.mean(angsep), None
+def compute_target_distances(coord_list, obs_date):
+    """Compute the angular distances in degrees between each coordinate in
+       coord_list and the offending sources listed in the distance table.
+       The separations between every target, offender, and hour of the day
+       are computed in one go as an array of shape (targets, offenders, hours).
+       Returns a list with one dict per target mapping CasA, CygA, TauA, VirA,
+       Sun, and Jupiter to a distance and Moon to a (min, max) tuple."""
+    t_ra, t_dec = sc.get_radec(coord_list)
+    t_vec = sc.get_unit_vectors(t_ra, t_dec)
+    # Unit vectors of the offenders at every hour. The A-team sources do not
+    # move, so their vectors are broadcast along the time axis.
+    ephemeris = eph.get_ephemeris(obs_date, 'NL')
+    body_vec = sc.get_unit_vectors(np.degrees(ephemeris['ra'][:, ::HOURLY_STEP]),
+                                   np.degrees(ephemeris['dec'][:, ::HOURLY_STEP]))
+    ateam_ra, ateam_dec = sc.get_radec(ATEAM_COORDINATES.values())
+    ateam_vec = sc.get_unit_vectors(ateam_ra, ateam_dec)[:, np.newaxis, :]
+    ateam_vec = np.broadcast_to(ateam_vec, (len(ATEAM_NAMES),) + body_vec.shape[1:])
+    offender_vec = np.concatenate([ateam_vec, body_vec])
+    angsep = sc.get_separation(t_vec[:, np.newaxis, np.newaxis, :],
+                               offender_vec[np.newaxis, :, :, :])
+    # Reduce over the time axis
+    mean_sep = np.mean(angsep, axis=2)
+    min_sep = np.min(angsep, axis=2)
+    max_sep = np.max(angsep, axis=2)
+    offender_idx = {name:idx for idx, name in enumerate(ATEAM_NAMES)}
+    for name in eph.BODIES:
+        offender_idx[name] = len(ATEAM_NAMES) + eph.get_body_index(name)
+    distances = []
+    for t_idx in range(len(coord_list)):
+        this_target = {}
+        for name in ['CasA', 'CygA', 'TauA', 'VirA', 'Sun', 'Jupiter']:
+            this_target[name] = mean_sep[t_idx, offender_idx[name]]
+        this_target['Moon'] = (min_sep[t_idx, offender_idx['Moon']],
+                               max_sep[t_idx, offender_idx['Moon']])
+        distances.append(this_target)
+    return distances
 
 def make_distance_table(src_name_input, coord_input, obs_date):
     """Generate a plotly Table showing the distances between user-specified
@@ -447,35 +396,14 @@ def make_distance_table(src_name_input, coord_input, obs_date):
                    'Moon(min,max)', 'Jupiter']]
 
     # Iterate through each source and compute the distances
-    for idx, target in enumerate(src_name_list):
-        # Get the coordinate of this target
-        t_coord = SkyCoord(coord_list[idx])
-        # CasA
-        s_coord = SkyCoord(ATEAM_COORDINATES['CasA'])
-        d_casa = s_coord.separation(t_coord).deg
-        # CygA
-        s_coord = SkyCoord(ATEAM_COORDINATES['CygA'])
-        d_cyga = s_coord.separation(t_coord).deg
-        # TauA
-        s_coord = SkyCoord(ATEAM_COORDINATES['TauA'])
-        d_taua = s_coord.separation(t_coord).deg
-        # VirA
-        s_coord = SkyCoord(ATEAM_COORDINATES['VirA'])
-        d_vira = s_coord.separation(t_coord).deg
-        # Sun
-        d_sun, _ = get_distance_solar(t_coord, obs_date, 'Sun')
-        # Moon
-        d_moon_min, d_moon_max = get_distance_solar(t_coord, obs_date, 'Moon')
-        # Jupiter
-        d_jupiter, _ = get_distance_solar(t_coord, obs_date, 'Jupiter')
-        # Consolidate all into a list
-        this_row = ['{:0.2f}'.format(d_casa),
-                    '{:0.2f}'.format(d_cyga),
-                    '{:0.2f}'.format(d_taua),
-                    '{:0.2f}'.format(d_vira),
-                    '{:0.2f}'.format(d_sun),
-                    '{:0.2f},{:0.2f}'.format(d_moon_min, d_moon_max),
-                    '{:0.2f}'.format(d_jupiter)]
+    for dist in compute_target_distances(coord_list, obs_date):
+        this_row = ['{:0.2f}'.format(dist['CasA']),
+                    '{:0.2f}'.format(dist['CygA']),
+                    '{:0.2f}'.format(dist['TauA']),
+                    '{:0.2f}'.format(dist['VirA']),
+                    '{:0.2f}'.format(dist['Sun']),
+                    '{:0.2f},{:0.2f}'.format(*dist['Moon']),
+                    '{:0.2f}'.format(dist['Jupiter'])]
         # Add this row to the col_values table
         col_values.append(this_row)
 
@@ -484,3 +412,41 @@ def make_distance_table(src_name_input, coord_input, obs_date):
         cells=dict(values=col_values, align='left')
     )
     return tab
+
+def make_distance_figure(src_name_input, coord_input, obs_date):
+    """Generate a plotly figure containing the distance table returned by
+       make_distance_table."""
+    table_title = 'Angular distances in degrees between specified ' +\
+                 'targets and other bright sources'
+    return {'data':[make_distance_table(src_name_input, coord_input, obs_date)],
+            'layout':{'title':table_title, 'autosize':True}
+           }
+
+def make_setup_figures(setup):
+    """For an ObservationSetup with at least one target, return the elevation
+       plot, beam layout, and distance table figures. Calibrators and A-team
+       sources in the setup are plotted together with the targets in the
+       elevation plot."""
+    src_name = ','.join(setup.src_names)
+    coord = ','.join(setup.coords)
+    # Add calibrator and A-team names to the target list so that they can be
+    # plotted together.
+    all_names = list(setup.src_names) + list(setup.calib_names) + \
+                list(setup.ateam_names)
+    all_coords = list(setup.coords) + \
+                 [CALIB_COORDINATES[name] for name in setup.calib_names] + \
+                 [ATEAM_COORDINATES[name] for name in setup.ateam_names]
+    stations = st.select_stations(setup.n_core, setup.n_remote, setup.n_int)
+    elevation_fig = make_elevation_figure(','.join(all_names), all_coords,
+                                          setup.obs_date, setup.n_int, stations)
+    # Find the position of the station and tile beam
+    beam_fig = find_beam_layout(src_name, coord, setup.n_core, setup.n_remote,
+                                setup.n_int, setup.hba_mode)
+    # Calculate distance between all the targets and offending sources
+    distance_fig = make_distance_figure(src_name, coord, setup.obs_date)
+    return elevation_fig, beam_fig, distance_fig
+
+def figure_to_dict(figure):
+    """Convert a figure containing plotly objects into plain JSON types, the
+       same way Dash sends it to the browser"""
+    return json.loads(json.dumps(figure, cls=PlotlyJSONEncoder))
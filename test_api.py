@@ -0,0 +1,107 @@
+"""Tests for the JSON API in api.py, through the Flask test client"""
+
+import time
+import flask
+import pytest
+import api
+
+@pytest.fixture
+def client():
+    app = flask.Flask(__name__)
+    app.register_blueprint(api.api)
+    return app.test_client()
+
+SETUP = {'id':'a', 'n_sb':'244', 'src_name':'3C196',
+         'coord':'08h13m36.033s +48d13m02.56s', 'obs_date':'2026-03-01'}
+
+def test_calculate(client):
+    response = client.post('/luci/api/v1/calculate',
+                           json={'setups':[SETUP, {'id':'b', 'n_sb':'1000'}]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [item['id'] for item in results] == ['a', 'b']
+    assert [item['valid'] for item in results] == [True, False]
+    assert results[0]['im_noise'] > 0. and results[0]['elevation'] is None
+    # A single setup does not have to be wrapped in a list
+    response = client.post('/luci/api/v1/calculate',
+                           json={'setups':SETUP, 'visibility':True})
+    result = response.get_json()['results'][0]
+    assert result['elevation'][0]['name'] == '3C196'
+    assert result['distances'][0]['Sun'] is not None
+
+def test_invalid_requests(client):
+    for body in [[SETUP], {'setup':[SETUP]}, {'setups':[1]}, {'setups':1}]:
+        response = client.post('/luci/api/v1/calculate', json=body)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+def test_request_limits(client):
+    response = client.post('/luci/api/v1/calculate',
+                           json={'setups':[{}]*(api.MAX_REQUEST_ITEMS+1)})
+    assert response.status_code == 413
+    response = client.post('/luci/api/v1/calculate',
+                           json={'setups':[{}]*(api.MAX_VISIBILITY_SETUPS+1),
+                                 'visibility':True})
+    assert response.status_code == 413
+    response = client.post('/luci/api/v1/resolve',
+                           data=' '*(api.MAX_REQUEST_BYTES+1),
+                           content_type='application/json')
+    assert response.status_code == 413
+    response = client.post('/luci/api/v1/distances',
+                           json={'targets':['08h13m36s +48d13m02s']*
+                                           (api.MAX_REQUEST_ITEMS+1)})
+    assert response.status_code == 413
+
+def test_visibility(client):
+    response = client.post('/luci/api/v1/visibility',
+                           json={'targets':[{'name':'3C196',
+                                             'coord':SETUP['coord']}],
+                                 'date':'2026-03-01', 'n_int':2,
+                                 'elevation_limit':10.})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['date'] == '2026-03-01'
+    assert [item['name'] for item in data['results']][:1] == ['3C196']
+    assert len(data['results'][0]['elevation']) == len(data['times'])
+    assert data['events'][0]['max_elevation'] > 10.
+    response = client.post('/luci/api/v1/visibility',
+                           json={'targets':[SETUP['coord']], 'n_int':'x'})
+    assert response.status_code == 400
+
+def test_distances(client):
+    response = client.post('/luci/api/v1/distances',
+                           json={'targets':[SETUP['coord']], 'date':'2026-03-01'})
+    assert response.status_code == 200
+    result = response.get_json()['results'][0]
+    assert result['name'] == 'Target 1' and len(result['Moon']) == 2
+    response = client.post('/luci/api/v1/distances', json={'targets':['nowhere']})
+    assert response.status_code == 400
+
+def test_resolve(client):
+    response = client.post('/luci/api/v1/resolve', json={'names':['3C196', 'xyz']})
+    assert response.status_code == 200
+    known, unknown = response.get_json()['results']
+    assert known['coord'] is not None and known['error'] is None
+    assert unknown['coord'] is None and unknown['error']
+
+def test_lotss(client):
+    response = client.post('/luci/api/v1/lotss',
+                           json={'coord':SETUP['coord'], 'n':3})
+    assert response.status_code == 200
+    distances = [item['distance'] for item in response.get_json()['results']]
+    assert len(distances) == 3 and distances == sorted(distances)
+
+def test_pdf_job(client):
+    response = client.post('/luci/api/v1/pdf',
+                           json={'setups':[SETUP, {'n_sb':'0'}]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[1]['job'] is None and results[1]['msg']
+    job_url = '/luci/api/v1/pdf/{}'.format(results[0]['job'])
+    for _ in range(600):
+        job = client.get(job_url).get_json()
+        if job['status'] != 'pending':
+            break
+        time.sleep(0.1)
+    assert job['status'] == 'done' and job['pdf'].endswith('.pdf')
+    assert client.get('/luci/api/v1/pdf/unknown').status_code == 404
@@ -0,0 +1,61 @@
+"""Tests for the precomputed elevation atlas in atlas.py"""
+
+import numpy as np
+import atlas as at
+import elevation as el
+import stations as st
+
+RA = np.array([0., 123.4, 250., 10., 300., 190.])
+DEC = np.array([-30., 48.2, -5., 85., 20., 52.9])
+TIMES = el.get_time_axis('2026-03-01')
+
+def test_atlas_matches_direct_computation():
+    for sites in [['NL'], st.select_stations(24, 0, 0), ['IE', 'LV']]:
+        atlas_elevation = at.compute_atlas_elevation(RA, DEC, TIMES, sites)
+        direct = el.compute_common_elevation(RA, DEC, TIMES, sites)
+        assert atlas_elevation.shape == direct.shape == (len(RA), len(TIMES))
+        # Only compare away from the horizon, where NaN starts, and the zenith
+        compare = (direct > 1.) & (direct < 80.)
+        assert compare.sum() > 100
+        assert np.allclose(atlas_elevation[compare], direct[compare],
+                           rtol=0., atol=0.005)
+
+def test_compute_elevation_picks_the_faster_path():
+    assert np.array_equal(at.compute_elevation(RA, DEC, TIMES, ['NL']),
+                          at.compute_atlas_elevation(RA, DEC, TIMES, ['NL']),
+                          equal_nan=True)
+    stations = st.select_stations(24, 14, 0)
+    assert np.array_equal(at.compute_elevation(RA, DEC, TIMES, stations),
+                          el.compute_common_elevation(RA, DEC, TIMES, stations),
+                          equal_nan=True)
+
+def test_sidereal_table():
+    jd = el.get_julian_dates(TIMES)
+    assert np.allclose(at.get_sidereal_times(jd), el.get_apparent_sidereal_time(jd),
+                       rtol=0., atol=1e-6)
+    # Dates outside the table are computed directly
+    jd = jd - 365.25*30
+    assert np.array_equal(at.get_sidereal_times(jd),
+                          el.get_apparent_sidereal_time(jd))
+
+def test_tables_are_memory_mapped_and_read_only():
+    for table in [at.get_atlas(), at.get_sidereal_table()]:
+        assert isinstance(table, np.memmap)
+        assert not table.flags.writeable
+    dec_axis, ha_axis = at.get_atlas_axes()
+    assert at.get_atlas().shape == (len(dec_axis), len(ha_axis),
+                                    len(at.get_atlas_sites()))
+
+def test_load_or_build(tmp_path):
+    calls = []
+    def build():
+        calls.append(1)
+        return np.arange(4.)
+    path = str(tmp_path/'table.npy')
+    for _ in range(2):
+        assert np.array_equal(at.load_or_build(path, build), np.arange(4.))
+    assert calls == [1]
+    assert [item.name for item in tmp_path.iterdir()] == ['table.npy']
+    # Without a writable directory the table is only kept in memory
+    array = at.load_or_build(str(tmp_path/'table.npy'/'other.npy'), build)
+    assert np.array_equal(array, np.arange(4.)) and not array.flags.writeable
@@ -0,0 +1,122 @@
+"""Tests for the sensitivity and data size calculations in backend.py"""
+
+import pickle
+import numpy as np
+import pytest
+import backend as bk
+
+def test_obs_time_for_noise_round_trip():
+    obs_t = bk.calculate_obs_time_for_noise(100., 24, 14, 14, 'hbadualinner', 244)
+    assert np.isclose(bk.calculate_im_noise_batch(24, 14, 14, 'hbadualinner', obs_t,
+                                                  244), 100.)
+
+def test_n_sb_for_noise_round_trip():
+    n_sb = bk.calculate_n_sb_for_noise(2000., 24, 14, 0, 'lba', 3600.)
+    assert bk.calculate_im_noise_batch(24, 14, 0, 'lba', 3600., n_sb) <= 2000.
+    assert bk.calculate_im_noise_batch(24, 14, 0, 'lba', 3600., n_sb-1) > 2000.
+
+def test_stations_for_noise_round_trip():
+    for station_type, idx in [('core', 0), ('remote', 1), ('int', 2)]:
+        n_stations = [24, 14, 14]
+        n_stations[idx] = 0
+        n_req = bk.calculate_stations_for_noise(11., *n_stations, 'hbadualinner',
+                                                28800., 488, station_type)
+        n_stations[idx] = int(n_req)
+        assert bk.calculate_im_noise_batch(*n_stations, 'hbadualinner', 28800.,
+                                           488) <= 11.
+        n_stations[idx] -= 1
+        assert bk.calculate_im_noise_batch(*n_stations, 'hbadualinner', 28800.,
+                                           488) > 11.
+
+def test_stations_for_noise_keeps_a_valid_array():
+    # The other stations already reach the target
+    assert bk.calculate_stations_for_noise(1000., 24, 14, 14, 'hbadualinner',
+                                           28800., 488, 'core') == 0.
+    # A single station has no baselines
+    assert bk.calculate_stations_for_noise(1000., 0, 0, 0, 'hbadualinner',
+                                           28800., 488, 'core') == bk.MIN_STATIONS
+    assert bk.calculate_stations_for_noise(20000., 0, 1, 0, 'lba', 28800., 488,
+                                           'int') == 1.
+    # Out of reach
+    assert np.isnan(bk.calculate_stations_for_noise(1., 0, 14, 14, 'lba', 60.,
+                                                    1, 'core'))
+
+def test_solvers_without_baselines():
+    assert np.isinf(bk.calculate_obs_time_for_noise(100., 0, 0, 1, 'lba', 100))
+    assert np.isinf(bk.calculate_n_sb_for_noise(100., 0, 0, 1, 'lba', 3600.))
+
+# Setups covering all antenna sets, with and without each station type
+NOISE_SETUPS = np.array([(24, 14, 14, 'hbadualinner', 28800., 244),
+                         (24, 14, 0, 'hbadual', 3600., 488),
+                         (0, 14, 14, 'hbadual', 600., 1),
+                         (24, 0, 0, 'lbaouter', 28800., 244),
+                         (2, 0, 0, 'lbaouter', 100., 10)],
+                        dtype=bk.NOISE_SETUP_DTYPE)
+
+def test_im_noise_batch_matches_scalar():
+    batch = bk.calculate_im_noise_setups(NOISE_SETUPS)
+    assert batch.shape == (len(NOISE_SETUPS),)
+    for setup, noise in zip(NOISE_SETUPS, batch):
+        assert bk.calculate_im_noise(*setup.tolist()) == '{:0.2f}'.format(noise)
+        assert noise == bk.calculate_im_noise_batch(*setup.tolist())
+
+def test_im_noise_batch_broadcasts():
+    obs_t = np.array([600., 3600., 28800.])
+    n_sb = np.array([[1], [244]])
+    noise = bk.calculate_im_noise_batch(24, 14, 14, 'hbadualinner', obs_t, n_sb)
+    assert noise.shape == (2, 3)
+    assert noise[1, 2] == bk.calculate_im_noise_batch(24, 14, 14, 'hbadualinner',
+                                                      28800., 244)
+
+def test_baselines_batch_matches_scalar():
+    n_baselines = bk.compute_baselines(NOISE_SETUPS['n_core'],
+                                       NOISE_SETUPS['n_remote'],
+                                       NOISE_SETUPS['n_int'],
+                                       NOISE_SETUPS['hba_mode'])
+    for setup, value in zip(NOISE_SETUPS, n_baselines):
+        assert bk.compute_baselines(*setup.tolist()[:4]) == value
+    # Each HBA core station is split into two sub-stations
+    assert bk.compute_baselines(24, 0, 0, 'hbadual') == 48*49/2
+    assert bk.compute_baselines(24, 0, 0, 'lbaouter') == 24*25/2
+
+def parse_default_setup(**kwargs):
+    """Parse the default setup of the web interface with some fields changed"""
+    fields = dict(obs_t='28800', cal_t='600', n_cal='2', n_core='24', n_remote='14',
+                  n_int='14', n_sb='244', integ_t='1', t_avg='1', f_avg='4',
+                  src_name='A,B', coord='08h13m36s +48d13m02s,08h20m00s +46d00m00s',
+                  hba_mode='hbadualinner', pipe_type='preprocessing',
+                  ateam_names=['CasA'], obs_date='2026-03-01')
+    fields.update(kwargs)
+    return bk.parse_setup(**fields)
+
+def test_observation_setup_round_trip():
+    setup, msg = parse_default_setup()
+    assert msg == ''
+    assert setup.n_core == 24 and setup.obs_t == 28800. and setup.n_sap == 2
+    assert setup.coords == ('08h13m36s +48d13m02s', '08h20m00s +46d00m00s')
+    assert setup.ateam_names == ('CasA',) and setup.calib_names == ()
+    data = setup.to_dict()
+    assert data['src_names'] == ['A', 'B']
+    restored = bk.ObservationSetup.from_dict(data)
+    assert restored == setup and hash(restored) == hash(setup)
+    assert restored.key() == setup.key()
+    assert pickle.loads(pickle.dumps(setup)) == setup
+    assert {setup:1}[parse_default_setup()[0]] == 1
+    assert parse_default_setup(n_sb='61')[0] != setup
+    with pytest.raises(AttributeError):
+        setup.n_sb = 1
+
+def test_parse_setup_messages():
+    assert parse_default_setup(n_core='25')[0] is None
+    setup, msg = parse_default_setup(n_core='1', n_remote='0', n_int='0')
+    assert setup is None and 'At least 2' in msg
+    setup, msg = parse_default_setup(n_sb='489')
+    assert setup is None and str(bk.MAX_BEAMLETS) in msg
+    setup, msg = parse_default_setup(n_sb='245')
+    assert setup is None and 'targets times number of subbands' in msg
+    setup, msg = parse_default_setup(obs_t='x',
+                                     ateam_names=['CasA', 'CygA', 'TauA'])
+    assert 'observation time' in msg and 'A-team' in msg
+    assert bk.validate_inputs('28800', '600', '2', '24', '14', '14', '244', '1',
+                              '1', '4', '', '', 'lbaouter', 'none',
+                              None) == (True, '')
@@ -0,0 +1,75 @@
+"""Tests for the command-line batch tool in batch.py"""
+
+import io
+import json
+import pytest
+import backend as bk
+import batch
+
+SETUPS = [{'id':'a'},
+          {'id':'b', 'n_core':'12', 'n_int':0, 'pipe_type':'preprocessing',
+           'ateam_names':'CasA; CygA'},
+          {'id':'c', 'n_sb':'1000'},
+          {'id':'d', 'obs_mode':'Beamformed', 'stokes':'IQUV', 'n_sb':'10'}]
+
+def test_normalize_setup():
+    norm = batch.normalize_setup({'n_core':'', 'n_remote':None, 'n_int':'2',
+                                  'calib_names':'3C48;;3C196', 'unknown':'x'})
+    assert norm['n_core'] == batch.SETUP_DEFAULTS['n_core']
+    assert norm['n_remote'] == batch.SETUP_DEFAULTS['n_remote']
+    assert norm['n_int'] == '2'
+    assert norm['calib_names'] == ['3C48', '3C196']
+    assert norm['ateam_names'] is None and norm['obs_date'] is not None
+    assert 'unknown' not in norm
+
+def test_evaluate_setup():
+    results = [batch.evaluate_setup(setup) for setup in SETUPS]
+    assert [item['id'] for item in results] == ['a', 'b', 'c', 'd']
+    assert [item['valid'] for item in results] == [True, True, False, True]
+    assert 'subbands' in results[2]['msg']
+    parsed, _ = batch.parse_setup_fields(SETUPS[1])
+    assert parsed.ateam_names == ('CasA', 'CygA')
+    for key, value in bk.calculate_results(parsed).items():
+        assert results[1][key] == value
+    assert results[0]['proc_size'] is None and results[1]['proc_size'] > 0.
+
+def test_evaluate_setup_rejects_non_objects():
+    assert batch.evaluate_setup(None)['msg'] == batch.UNREADABLE_ROW_MSG
+    assert batch.evaluate_setup([1])['msg'] == batch.SETUP_TYPE_MSG
+
+def test_read_setups_reports_bad_rows():
+    infile = io.StringIO('{"id":"a"}\n\n{"id":\n[1]\n{"id":"d"}\n')
+    errors = []
+    setups = list(batch.read_setups(infile, 'jsonl',
+                                    lambda row, msg: errors.append(row)))
+    assert setups == [{'id':'a'}, None, None, {'id':'d'}]
+    assert errors == [1, 2]
+    infile.seek(0)
+    with pytest.raises(ValueError):
+        list(batch.read_setups(infile, 'jsonl'))
+
+def test_read_setups_csv():
+    infile = io.StringIO('id,n_core,ateam_names\na,12,CasA;CygA\nb,,\n')
+    setups = list(batch.read_setups(infile, 'csv'))
+    assert [setup['id'] for setup in setups] == ['a', 'b']
+    result = batch.evaluate_setup(setups[0])
+    assert result['valid'] and result['id'] == 'a'
+
+def test_run_batch_keeps_order():
+    serial = list(batch.run_batch(SETUPS*3))
+    parallel = list(batch.run_batch(SETUPS*3, processes=2, chunk_size=2,
+                                    max_pending=2))
+    assert [item['row'] for item in parallel] == list(range(len(SETUPS)*3))
+    assert parallel == serial
+
+def test_main_continues_after_bad_rows(tmp_path, capsys):
+    infile = tmp_path/'setups.jsonl'
+    infile.write_text('{"id":"a"}\nnot json\n{"id":"c"}\n')
+    outfile = tmp_path/'results.jsonl'
+    with pytest.raises(SystemExit) as exc:
+        batch.main([str(infile), '-o', str(outfile)])
+    assert exc.value.code == 1
+    assert 'Unable to read row 1' in capsys.readouterr().err
+    results = [json.loads(line) for line in outfile.read_text().splitlines()]
+    assert [item['valid'] for item in results] == [True, False, True]
+    assert results[1]['msg'] == batch.UNREADABLE_ROW_MSG
@@ -0,0 +1,48 @@
+"""Tests for the PDF download route of the Dash app in calculator.py"""
+
+import pytest
+import backend as bk
+import calculator
+import pdfjobs as pj
+import pdfstore as ps
+
+PDF_DATA = b'%PDF-1.3\nTest file\n%%EOF\n'
+KEY = 'ab'*32
+
+@pytest.fixture(params=['disk', 'memory'])
+def client(request, tmp_path, monkeypatch):
+    directory = str(tmp_path/'store') if request.param == 'disk' else None
+    store = ps.PdfStore(directory)
+    store.put(KEY, PDF_DATA)
+    monkeypatch.setattr(ps, 'PDF_STORE', store)
+    return calculator.server.test_client()
+
+def test_pdf_is_streamed_with_an_etag(client):
+    response = client.get('/luci/static/{}'.format(ps.get_pdf_name(KEY)))
+    assert response.status_code == 200
+    assert response.data == PDF_DATA
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['Content-Length'] == str(len(PDF_DATA))
+    assert response.headers['ETag'] == '"{}"'.format(KEY)
+    # A client that already has the file gets no body
+    response = client.get('/luci/static/{}'.format(ps.get_pdf_name(KEY)),
+                          headers={'If-None-Match':'"{}"'.format(KEY)})
+    assert response.status_code == 304 and response.data == b''
+
+def test_unknown_pdf_is_not_found(client):
+    response = client.get('/luci/static/{}'.format(ps.get_pdf_name('cd'*32)))
+    assert response.status_code == 404
+
+def test_memory_store_needs_no_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv(ps.PDF_STORE_ENV, 'memory')
+    monkeypatch.chdir(tmp_path)
+    store = ps.get_pdf_store()
+    assert store.directory is None and store.max_bytes == ps.PDF_MEMORY_MAX_BYTES
+    monkeypatch.setattr(ps, 'PDF_STORE', store)
+    setup, _ = bk.parse_setup('28800', '600', '1', '24', '14', '0', '244', '1', '1',
+                              '4', '', '', 'hbadual', 'none', None,
+                              obs_date='2026-03-01')
+    path = pj.make_pdf(setup, {}, {})
+    response = calculator.server.test_client().get('/luci/{}'.format(path))
+    assert response.status_code == 200 and response.data.startswith(b'%PDF-')
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,99 @@
+"""Tests for the vectorized elevation engine and curve cache in elevation.py"""
+
+import numpy as np
+from ephem import Observer, FixedBody, degrees
+import elevation as el
+
+OBS_DATE = '2026-03-01'
+
+def get_observer(site):
+    """Return an ephem.Observer at a site in el.SITES"""
+    lon, lat, height = el.SITES[site]
+    observer = Observer()
+    observer.lon, observer.lat = str(lon), str(lat)
+    observer.elevation = height
+    return observer
+
+def get_ephem_elevation(body, times, site):
+    """Compute the elevation of an ephem body in degrees with ephem"""
+    observer = get_observer(site)
+    elevation = []
+    for time in times:
+        observer.date = time
+        body.compute(observer)
+        elevation.append(np.degrees(float(body.alt)))
+    return np.array(elevation)
+
+def test_target_elevation_matches_ephem():
+    ra, dec = np.array([123.4, 250., 10.]), np.array([48.2, -20., 85.])
+    times = el.get_time_axis(OBS_DATE)[::6]
+    sites = ['NL', 'LV', 'IE']
+    elevation = el.compute_target_elevation(ra, dec, times, sites)
+    assert elevation.shape == (3, 3, len(times))
+    for idx in range(len(ra)):
+        body = FixedBody()
+        body._ra = degrees(np.radians(ra[idx]))
+        body._dec = degrees(np.radians(dec[idx]))
+        body._epoch = '2000'
+        for site_idx, site in enumerate(sites):
+            reference = get_ephem_elevation(body, times, site)
+            # Compare above the horizon, where the refraction models agree
+            up = reference > 1.
+            assert np.allclose(elevation[idx, site_idx, up], reference[up],
+                               rtol=0., atol=0.01)
+
+def test_body_elevation_matches_ephem():
+    times = el.get_time_axis(OBS_DATE)[::6]
+    for name, body in el.SOLAR_BODIES.items():
+        elevation = el.compute_body_elevation(name, times, ['NL'])[0]
+        reference = get_ephem_elevation(body(), times, 'NL')
+        up = reference > 1.
+        assert np.allclose(elevation[up], reference[up], rtol=0., atol=0.02)
+
+def test_common_elevation():
+    ra, dec = np.array([123.4, 250., 10.]), np.array([48.2, -20., 85.])
+    times = el.get_time_axis(OBS_DATE)
+    sites = ['NL', 'LV', 'IE']
+    common = el.compute_common_elevation(ra, dec, times, sites)
+    combined = el.combine_sites(el.compute_target_elevation(ra, dec, times, sites))
+    assert np.array_equal(np.isnan(common), np.isnan(combined))
+    assert np.allclose(common[~np.isnan(common)], combined[~np.isnan(combined)],
+                       rtol=0., atol=1e-9)
+
+def test_elevation_cache_evicts_least_recently_used():
+    cache = el.ElevationCache(max_curves=2)
+    keys = [cache.make_key(ra, 10., OBS_DATE, ['NL']) for ra in [1., 2., 3.]]
+    cache.put(keys[0], np.zeros(3))
+    cache.put(keys[1], np.ones(3))
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], np.ones(3))
+    # keys[1] was used least recently
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.info() == {'hits':3, 'misses':1, 'curves':2, 'max_curves':2}
+    assert not cache.get(keys[0]).flags.writeable
+
+def test_elevation_cache_keys():
+    # Coordinates are rounded, and sites at the same position share curves
+    make_key = el.ElevationCache.make_key
+    assert make_key(10.00001, 20., OBS_DATE, ['CS001', 'CS002', 'RS106']) == \
+           make_key(10., 20.00001, OBS_DATE, ['RS106', 'CS001'])
+    assert make_key(10., 20., OBS_DATE, ['NL']) != \
+           make_key(10., 20., OBS_DATE, ['IE'])
+
+def test_elevation_curves_are_cached():
+    cache = el.ElevationCache()
+    calls = []
+    def compute(ra, dec, times, sites):
+        calls.append(len(ra))
+        return el.compute_common_elevation(ra, dec, times, sites)
+    ra, dec = np.array([10., 20.]), np.array([50., 60.])
+    first = el.get_elevation_curves(ra, dec, OBS_DATE, ['NL'], cache, compute)
+    second = el.get_elevation_curves(np.array([20., 30.]), np.array([60., 70.]),
+                                     OBS_DATE, ['NL'], cache, compute)
+    # Only the new target is computed the second time
+    assert calls == [2, 1]
+    assert np.array_equal(first[1], second[0], equal_nan=True)
+    reference = el.compute_common_elevation(ra, dec, el.get_time_axis(OBS_DATE),
+                                            ['NL'])
+    assert np.array_equal(first, reference, equal_nan=True)
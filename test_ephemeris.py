@@ -0,0 +1,48 @@
+"""Tests for the shared solar system ephemeris store in ephemeris.py"""
+
+import os
+import numpy as np
+from ephem import Sun, Moon
+import ephemeris as eph
+
+def test_ephemeris_positions():
+    ephemeris = eph.compute_ephemeris('2026-03-01', 'NL')
+    assert sorted(ephemeris) == sorted(eph.EPHEMERIS_FIELDS)
+    assert ephemeris['alt'].shape == (len(eph.BODIES), len(ephemeris['jd']))
+    # Every hourly sample is as computed by ephem
+    for name, body in [('Sun', Sun()), ('Moon', Moon())]:
+        idx = eph.get_body_index(name)
+        for step in [0, 12, 144]:
+            body.compute(eph.jd_to_datetime(ephemeris['jd'][step]))
+            assert np.isclose(ephemeris['ra'][idx, step], float(body.g_ra),
+                              rtol=0., atol=1e-9)
+            assert np.isclose(ephemeris['dec'][idx, step], float(body.g_dec),
+                              rtol=0., atol=1e-9)
+
+def test_ephemeris_store(tmp_path):
+    store = eph.EphemerisStore(str(tmp_path), max_entries=1)
+    first = store.get('2026-03-01', 'NL')
+    assert store.get('2026-03-01', 'NL') is first
+    assert not first['ra'].flags.writeable
+    store.get('2026-03-02', 'NL')
+    # The first date was evicted from memory, and is read back from disk
+    again = store.get('2026-03-01', 'NL')
+    assert again is not first
+    for name in eph.EPHEMERIS_FIELDS:
+        assert np.array_equal(again[name], first[name])
+    assert store.info() == {'hits':1, 'loads':1, 'misses':2, 'entries':1,
+                            'max_entries':1}
+    # A new store finds the files written by the first one
+    other = eph.EphemerisStore(str(tmp_path))
+    other.get('2026-03-02', 'NL')
+    assert other.info()['loads'] == 1 and other.info()['misses'] == 0
+    # No temporary files are left behind
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+           [os.path.basename(store.get_path(obs_date, 'NL')) \
+            for obs_date in ['2026-03-01', '2026-03-02']]
+
+def test_ephemeris_store_in_memory():
+    store = eph.EphemerisStore(None)
+    store.get('2026-03-01', 'IE')
+    store.get('2026-03-01', 'IE')
+    assert store.info()['misses'] == 1 and store.info()['hits'] == 1
@@ -0,0 +1,58 @@
+"""Regression tests for the rise, transit, and set times in events.py"""
+
+from datetime import datetime
+import numpy as np
+import elevation as el
+import events as ev
+import stations as st
+
+def get_lowest_elevation(ra, dec, obs_date, sites, step_seconds=10.):
+    """Sample the lowest apparent elevation over sites of J2000 coordinates
+       during two days from the start of obs_date. Returns the Julian dates
+       and the elevation with shape (targets, times)."""
+    jd0 = ev.get_day_start(obs_date)
+    jd = jd0 + np.arange(0., 2., step_seconds/86400.)
+    date_ra, date_dec = el.precess_to_date(np.asarray(ra), np.asarray(dec),
+                                           jd0 + 0.5)
+    lon, lat = el.get_site_arrays(sites)
+    gast = el.get_apparent_sidereal_time(jd)
+    alt = el.compute_altitude(date_ra[:, np.newaxis, np.newaxis],
+                              date_dec[:, np.newaxis, np.newaxis],
+                              gast[np.newaxis, np.newaxis, :],
+                              lon[np.newaxis, :, np.newaxis],
+                              lat[np.newaxis, :, np.newaxis]).min(axis=1)
+    return jd, alt + el.get_refraction(alt)
+
+def test_common_events_straddling_midnight():
+    # With the full array on this date, the targets at RA 19h and 20h rise
+    # before midnight at the western stations and after midnight at the
+    # eastern ones, and the targets at RA 3h and 4h set at the eastern
+    # stations before they set at the western ones.
+    sites = el.get_unique_sites(st.select_stations(24, 14, 14))
+    ra, dec = np.array([285., 300., 45., 60.]), np.full(4, 20.)
+    obs_date = '2026-03-01'
+    events = ev.find_common_events(ra, dec, obs_date, sites)
+    jd, elevation = get_lowest_elevation(ra, dec, obs_date, sites)
+    up = elevation >= 0.
+    for idx in range(len(ra)):
+        rise = jd[np.argmax(~up[idx, :-1] & up[idx, 1:]) + 1]
+        set_ = jd[np.argmax(up[idx, :-1] & ~up[idx, 1:]) + 1]
+        assert abs(events['rise'][idx] - rise)*86400. < 30.
+        assert abs(events['set'][idx] - set_)*86400. < 30.
+        day = elevation[idx, jd < jd[0] + 1.]
+        assert abs(events['max_elevation'][idx] - day.max()) < 0.01
+    assert ev.to_datetime(events['rise'][0]) > datetime(2026, 3, 1, 0, 30)
+    assert ev.to_datetime(events['set'][2]) > datetime(2026, 3, 1, 22, 30)
+
+def test_common_events_without_window():
+    # Never above the horizon at all stations, and always above it
+    sites = el.get_unique_sites(st.select_stations(24, 14, 14))
+    events = ev.find_common_events([150., 150.], [-60., 85.], '2026-03-01', sites)
+    assert np.all(np.isnan(events['rise'])) and np.all(np.isnan(events['set']))
+    assert events['max_elevation'][0] < 0. < events['max_elevation'][1]
+
+def test_common_events_single_site():
+    common = ev.find_common_events([150.], [20.], '2026-03-01')
+    single = ev.find_target_events([150.], [20.], '2026-03-01')
+    for event in ev.EVENTS + ['max_elevation']:
+        assert np.isclose(common[event][0], single[event][0, 0], rtol=0., atol=1e-6)
@@ -0,0 +1,94 @@
+"""Tests for the summary PDF files and reports in generatepdf.py"""
+
+import re
+import zlib
+import pytest
+import backend as bk
+import generatepdf as g
+
+def parse_setup(src_name, coord, n_sb='244'):
+    setup, msg = bk.parse_setup('28800', '600', '1', '24', '14', '0', n_sb, '1',
+                                '1', '4', src_name, coord, 'hbadual',
+                                'preprocessing', None, obs_date='2026-03-01')
+    assert msg == ''
+    return setup
+
+@pytest.fixture(scope='module')
+def setups():
+    return [parse_setup('3C196', '08h13m36s +48d13m02s'),
+            parse_setup('<i>M31</i> & co', '00h42m44s +41d16m09s', n_sb='61')]
+
+def get_page_text(data):
+    """Return the decompressed content streams of a PDF file"""
+    text = ''
+    for stream in re.findall(rb'stream\r?\n(.*?)\r?\nendstream', data, re.S):
+        try:
+            text += zlib.decompress(stream).decode('latin-1')
+        except zlib.error:
+            pass
+    return text
+
+def test_text_is_written_literally(setups):
+    pdf = g.MyFPDF('P', 'mm', 'A4')
+    page = g.prepare_report_page(setups[1])
+    g.add_setup_page(pdf, setups[1], page['results'], page['elevation_fig'],
+                     page['distance_table'], title='<b>Setup</b> &amp; 1',
+                     image=page['image'], events=page['events'])
+    text = get_page_text(pdf.output(dest='S').encode('latin-1'))
+    assert '(<b>Setup</b> &amp; 1)' in text
+    assert '(<i>M31</i> & co)' in text
+
+def test_events_are_computed_by_the_worker(setups, monkeypatch):
+    pages = list(g.iter_report_pages(setups, processes=1))
+    for setup, page in zip(setups, pages):
+        assert page['events'] == g.get_setup_events(setup)
+        assert page['results'] == bk.calculate_results(setup)
+    def fail(*args, **kwargs):
+        raise AssertionError('Target events computed in the parent process')
+    monkeypatch.setattr(g.tv, 'get_target_events', fail)
+    pdf = g.MyFPDF('P', 'mm', 'A4')
+    for idx, (setup, page) in enumerate(zip(setups, pages)):
+        g.add_setup_page(pdf, setup, page['results'], page['elevation_fig'],
+                         page['distance_table'], image=page['image'],
+                         image_name='plot_{}'.format(idx), events=page['events'])
+    text = get_page_text(pdf.output(dest='S').encode('latin-1'))
+    assert '(3C196)' in text and '(<i>M31</i> & co)' in text
+
+def test_report_pages_keep_their_order(setups):
+    many = setups*3
+    pages = list(g.iter_report_pages(many, processes=2))
+    assert [page['results'] for page in pages] == \
+           [bk.calculate_results(setup) for setup in many]
+    data = g.build_report(many, ['A', 'B', 'C', 'D', 'E', 'F'], processes=1)
+    assert data.startswith(b'%PDF-')
+    text = get_page_text(data)
+    # The name of each setup is written above its page and in the summary
+    for name in ['A', 'B', 'C', 'D', 'E', 'F']:
+        assert text.count('({})'.format(name)) == 2
+    assert '(Summary of 6 setups)' in text
+
+def test_rendered_images_match_the_fpdf_image_table(setups, tmp_path):
+    # add_pdf_image fills in the internal image table of fpdf. Compare its
+    # entries with those fpdf makes itself from a PNG file, so that this
+    # fails if an fpdf upgrade changes the layout of the table. The PNG has
+    # extra optional entries: its row filter (dp) and alpha channel (smask).
+    fig = g.make_pdf_plot(g.prepare_report_page(setups[0])['elevation_fig'])
+    image = g.render_pdf_image(fig)
+    png_file = str(tmp_path/'plot.png')
+    fig.savefig(png_file, dpi=g.PLOT_DPI)
+    pdf = g.MyFPDF('P', 'mm', 'A4')
+    pdf.add_page()
+    pdf.image(png_file, w=100)
+    g.add_pdf_image(pdf, 'plot', image)
+    reference, rendered = pdf.images[png_file], pdf.images['plot']
+    assert set(rendered) == set(reference) - {'dp', 'smask'}
+    for key in ['w', 'h', 'cs', 'bpc', 'f']:
+        assert rendered[key] == reference[key]
+    assert rendered['i'] == reference['i'] + 1
+    assert len(zlib.decompress(rendered['data'])) == image['w']*image['h']*3
+    pdf.image('plot', w=100)
+    data = pdf.output(dest='S').encode('latin-1')
+    # The PNG file and the rendered image, without the alpha channel
+    header = '/Width {}\n/Height {}\n/ColorSpace /DeviceRGB'.format(image['w'],
+                                                                  image['h'])
+    assert data.count(header.encode('latin-1')) == 2
@@ -0,0 +1,39 @@
+"""Tests for the LoTSS pointing catalogue in lotss.py"""
+
+import numpy as np
+from astropy.coordinates import SkyCoord
+import lotss
+
+def test_catalogue_does_not_depend_on_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    catalogue = lotss.LotssCatalogue()
+    assert len(catalogue) > 0
+    row = catalogue.lookup(str(catalogue.names[10]))
+    assert row == 10 and catalogue.lookup('not a pointing') is None
+    coord = SkyCoord(catalogue.get_coord_string(row))
+    assert np.isclose(coord.ra.deg, catalogue.ra[row], atol=1e-3)
+    assert np.isclose(coord.dec.deg, catalogue.dec[row], atol=1e-3)
+
+def test_cone_search_matches_brute_force():
+    catalogue = lotss.get_catalogue()
+    rng = np.random.default_rng(14)
+    positions = [(0.2, 30.), (359.9, 50.), (180., 89.5), (123.4, 45.6)] + \
+                list(zip(rng.uniform(0., 360., 10), rng.uniform(-10., 90., 10)))
+    for ra, dec in positions:
+        distances = SkyCoord(catalogue.ra, catalogue.dec, unit='deg').separation(
+            SkyCoord(ra, dec, unit='deg')).deg
+        for radius in [1., 3., 10.]:
+            rows, found = catalogue.cone_search(ra, dec, radius)
+            assert set(rows) == set(np.flatnonzero(distances <= radius))
+            assert np.allclose(found, distances[rows], rtol=0., atol=1e-9)
+            assert np.all(np.diff(found) >= 0)
+        rows, found = catalogue.nearest(ra, dec, 5)
+        assert np.allclose(found, np.sort(distances)[:5], rtol=0., atol=1e-9)
+
+def test_find_pointings():
+    nearest = lotss.find_nearest_pointings('14h11m20.519s +52d12m09.97s', 3)
+    assert len(nearest) == 3
+    within = lotss.find_pointings_within('14h11m20.519s +52d12m09.97s',
+                                         nearest[-1]['distance'])
+    assert [item['name'] for item in within[:3]] == \
+           [item['name'] for item in nearest]
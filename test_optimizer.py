@@ -0,0 +1,51 @@
+"""Tests for the station and correlator setup search in optimizer.py"""
+
+import numpy as np
+import backend as bk
+import optimizer as op
+
+def get_pareto_costs(costs):
+    """Brute-force the set of cost tuples on the Pareto front"""
+    front = set()
+    for point in costs:
+        dominated = np.any(np.all(costs <= point, axis=1) & \
+                           np.any(costs < point, axis=1))
+        if not dominated:
+            front.add(tuple(point))
+    return front
+
+def test_pareto_mask():
+    rng = np.random.default_rng(3)
+    # Integers, so that there are ties and duplicates
+    costs = rng.integers(0, 6, size=(300, 3)).astype(float)
+    mask = op.get_pareto_mask(costs)
+    assert set(map(tuple, costs[mask])) == get_pareto_costs(costs)
+    # Duplicates are selected once
+    assert mask.sum() == len(get_pareto_costs(costs))
+
+def test_pareto_configs_match_brute_force():
+    corr = {'n_chan':[64, 128], 'integ_t':[1., 4.], 't_avg':[1, 4], 'f_avg':[1, 16]}
+    configs = op.find_pareto_configs(50., 2000., 100., 28800., 244,
+                                     antenna_sets=['hbadual', 'lbaouter'], **corr)
+    assert len(configs) > 0
+    grid = [item.ravel() for item in np.meshgrid(
+        np.arange(25), np.arange(15), np.arange(15), ['hbadual', 'lbaouter'],
+        *corr.values(), indexing='ij')]
+    n_core, n_remote, n_int = [item.astype(int) for item in grid[:3]]
+    hba_mode, n_chan, integ_t, t_avg, f_avg = grid[3], *[item.astype(float) \
+                                                         for item in grid[4:]]
+    n_baselines = bk.compute_baselines(n_core, n_remote, n_int, hba_mode)
+    im_noise = bk.calculate_im_noise_batch(n_core, n_remote, n_int, hba_mode,
+                                           28800., 244)
+    raw_size = bk.calculate_raw_size_batch(28800., 0., 0, integ_t, n_baselines,
+                                           n_chan, 244, 1)
+    proc_size = bk.calculate_proc_size_batch(28800., 0., 0, integ_t, n_baselines,
+                                             n_chan.astype(int), 244, 1, t_avg,
+                                             f_avg.astype(int), 'enable')
+    valid = (n_core + n_remote + n_int >= 2) & (f_avg <= n_chan) & \
+            (im_noise <= 50.) & (raw_size <= 2000.) & (proc_size <= 100.)
+    costs = np.stack([im_noise, raw_size, proc_size], axis=1)[valid]
+    expected = get_pareto_costs(costs)
+    found = set(zip(configs['im_noise'], configs['raw_size'], configs['proc_size']))
+    assert found == expected
+    assert np.all(np.diff(configs['im_noise']) >= 0)
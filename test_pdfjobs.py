@@ -0,0 +1,52 @@
+"""Tests for the background PDF job queue in pdfjobs.py"""
+
+import time
+from threading import Event
+import pdfjobs as pj
+
+def wait_for(queue, job_id, timeout=5.):
+    """Poll the status of a job until it is no longer pending"""
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id)['status'] == pj.JOB_PENDING:
+        assert time.monotonic() < deadline, 'Job did not finish in time'
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+def fail(message):
+    raise ValueError(message)
+
+def test_jobs_report_their_status():
+    queue = pj.PdfJobQueue(make=lambda name: 'static/{}.pdf'.format(name))
+    job_id = queue.submit('a')
+    assert wait_for(queue, job_id) == {'status':pj.JOB_DONE,
+                                       'path':'static/a.pdf', 'error':''}
+    job_id = queue.submit('Broken setup', make=fail)
+    assert wait_for(queue, job_id) == {'status':pj.JOB_FAILED, 'path':None,
+                                       'error':'Broken setup'}
+    assert queue.get('unknown') is None
+    assert queue.info() == {pj.JOB_PENDING:0, pj.JOB_DONE:1, pj.JOB_FAILED:1}
+
+def test_submit_returns_before_the_job_runs():
+    release = Event()
+    queue = pj.PdfJobQueue(n_workers=1, make=lambda: release.wait(5.) and 'x.pdf')
+    first, second = queue.submit(), queue.submit()
+    # The pool is bounded, so the second job waits for the first one
+    assert queue.info()[pj.JOB_PENDING] == 2
+    release.set()
+    assert wait_for(queue, first)['path'] == 'x.pdf'
+    assert wait_for(queue, second)['path'] == 'x.pdf'
+
+def test_old_jobs_are_forgotten():
+    release = Event()
+    queue = pj.PdfJobQueue(n_workers=1, max_jobs=3, make=lambda name: name)
+    done = [queue.submit('done{}'.format(idx)) for idx in range(2)]
+    for job_id in done:
+        wait_for(queue, job_id)
+    pending = queue.submit('blocked', make=lambda name: release.wait(5.) and name)
+    newer = [queue.submit('new{}'.format(idx)) for idx in range(2)]
+    # The oldest finished jobs are forgotten first, and pending jobs are kept
+    assert queue.get(done[0]) is None and queue.get(done[1]) is None
+    assert queue.get(pending)['status'] == pj.JOB_PENDING
+    release.set()
+    assert [wait_for(queue, job_id)['path'] for job_id in newer] == ['new0', 'new1']
+    assert sum(queue.info().values()) == 3
@@ -0,0 +1,84 @@
+"""Tests for the content-addressed PDF store in pdfstore.py"""
+
+import os
+import pytest
+import backend as bk
+import pdfjobs as pj
+import pdfstore as ps
+
+def make_key(idx):
+    return '{:064x}'.format(idx)
+
+@pytest.fixture(params=['disk', 'memory'])
+def store(request, tmp_path):
+    directory = str(tmp_path/'store') if request.param == 'disk' else None
+    return ps.PdfStore(directory, max_bytes=30)
+
+def read(pdf_file):
+    if isinstance(pdf_file, str):
+        with open(pdf_file, 'rb') as infile:
+            return infile.read()
+    return pdf_file.read()
+
+def test_store_evicts_least_recently_used(store):
+    for idx in range(3):
+        store.put(make_key(idx), bytes([idx])*10)
+    assert read(store.get(make_key(0))) == bytes(10)
+    store.put(make_key(3), b'3'*10)
+    # Key 1 was used least recently
+    assert store.get(make_key(1)) is None
+    for idx in [0, 2, 3]:
+        assert store.get(make_key(idx)) is not None
+    assert store.info() == {'hits':4, 'misses':1, 'evictions':1, 'files':3,
+                            'bytes':30, 'max_bytes':30}
+    # A file larger than the cap replaces everything else
+    store.put(make_key(4), b'4'*40)
+    assert store.info()['files'] == 1 and read(store.get(make_key(4))) == b'4'*40
+
+def test_store_on_disk(tmp_path):
+    directory = str(tmp_path/'store')
+    store = ps.PdfStore(directory, max_bytes=30)
+    for idx in range(3):
+        store.put(make_key(idx), bytes([idx])*10)
+        # The eviction order is kept in the modification times
+        os.utime(store.get_path(make_key(idx)), (idx, idx))
+    # Files are renamed into place, so no temporary files are left behind
+    assert sorted(os.listdir(directory)) == \
+           sorted('{}.pdf'.format(make_key(idx)) for idx in range(3))
+    # A new store, e.g. after a restart, picks up the files and their order
+    restarted = ps.PdfStore(directory, max_bytes=30)
+    assert restarted.get(make_key(0)) == restarted.get_path(make_key(0))
+    restarted.put(make_key(3), b'3'*10)
+    assert not os.path.exists(restarted.get_path(make_key(1)))
+    # A file removed behind the store's back is a miss
+    os.remove(restarted.get_path(make_key(2)))
+    assert restarted.get(make_key(2)) is None
+
+def test_pdf_keys():
+    setup, _ = bk.parse_setup('28800', '600', '1', '24', '14', '0', '244', '1', '1',
+                              '4', '', '', 'hbadual', 'none', None,
+                              obs_date='2026-03-01')
+    results = bk.calculate_results(setup)
+    key = ps.get_pdf_key(setup, results, {}, {})
+    assert ps.KEY_PATTERN.match(key)
+    assert key == ps.get_pdf_key(bk.ObservationSetup.from_dict(setup.to_dict()),
+                                 dict(results), {}, {})
+    assert key != ps.get_pdf_key(setup, results, {'data':[]}, {})
+    assert ps.parse_pdf_name(ps.get_pdf_name(key)) == key
+    for name in ['summary_1234.pdf', 'summary_{}.pdf.tmp'.format(key), '../x.pdf']:
+        assert ps.parse_pdf_name(name) is None
+    assert ps.get_report_key([setup], ['A']) != ps.get_report_key([setup], ['B'])
+
+def test_identical_summaries_are_generated_once(tmp_path):
+    store = ps.PdfStore(str(tmp_path/'store'))
+    setup, _ = bk.parse_setup('28800', '600', '1', '24', '14', '0', '244', '1', '1',
+                              '4', '', '', 'hbadual', 'none', None,
+                              obs_date='2026-03-01')
+    paths = [pj.make_pdf(setup, {}, {}, store) for _ in range(2)]
+    assert paths[0] == paths[1]
+    key = ps.parse_pdf_name(os.path.basename(paths[0]))
+    with open(store.get(key), 'rb') as pdf_file:
+        assert pdf_file.read(5) == b'%PDF-'
+    assert store.info()['files'] == 1
+    # One miss, then the file is found in the store each time
+    assert store.info()['misses'] == 1 and store.info()['hits'] == 2
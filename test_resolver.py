@@ -0,0 +1,137 @@
+"""Tests for the name resolver and its cache in resolver.py. The offline
+LocalResolver stands in for Simbad."""
+
+from threading import Barrier, Event, Thread
+import resolver
+
+NAMES = {'3C196':'08h13m36.033s +48d13m02.56s', 'M31':'00h42m44.3s +41d16m09s'}
+
+class SlowResolver(resolver.LocalResolver):
+    """LocalResolver that only answers once release is set"""
+
+    def __init__(self, names):
+        super().__init__(names)
+        self.release = Event()
+
+    def __call__(self, name):
+        self.release.wait(5.)
+        return super().__call__(name)
+
+class BarrierResolver(resolver.LocalResolver):
+    """LocalResolver that only answers once n_parties lookups are waiting, so
+       lookups that run one after another break the barrier"""
+
+    def __init__(self, names, n_parties):
+        super().__init__(names)
+        self.barrier = Barrier(n_parties, timeout=5.)
+
+    def __call__(self, name):
+        self.barrier.wait()
+        return super().__call__(name)
+
+def unreachable_resolver(name):
+    """Upstream resolver that cannot be reached"""
+    raise OSError('Network is unreachable')
+
+def make_cache(**kwargs):
+    return resolver.NameCache(':memory:', **kwargs)
+
+def test_resolved_names_are_cached():
+    cache, upstream = make_cache(), resolver.LocalResolver(NAMES)
+    results = resolver.resolve_names([' 3C196', 'M31', '3C196'], cache=cache,
+                                     upstream=upstream)
+    assert [item['coord'] for item in results] == \
+           [NAMES['3C196'], NAMES['M31'], NAMES['3C196']]
+    assert [item['error'] for item in results] == ['', '', '']
+    # Each name was looked up once, and the second call is served by the cache
+    assert upstream.n_queries == 2
+    resolver.resolve_names(['3C196', 'M31'], cache=cache, upstream=upstream)
+    assert upstream.n_queries == 2
+    assert resolver.resolve_name('M31', cache, upstream) == NAMES['M31']
+    assert cache.info()['names'] == 2
+
+def test_expired_names_are_looked_up_again():
+    cache, upstream = make_cache(positive_ttl=0.), resolver.LocalResolver(NAMES)
+    for _ in range(2):
+        result = resolver.resolve_names(['M31'], cache=cache, upstream=upstream)[0]
+        assert result['coord'] == NAMES['M31']
+    assert upstream.n_queries == 2
+
+def test_unknown_names_are_cached():
+    cache, upstream = make_cache(), resolver.LocalResolver(NAMES)
+    for _ in range(2):
+        result = resolver.resolve_names(['nowhere'], cache=cache,
+                                        upstream=upstream)[0]
+        assert result['coord'] is None
+        assert result['error'] == resolver.UNKNOWN_NAME_MSG
+    assert upstream.n_queries == 1
+    # Negative entries expire after their own TTL
+    cache, upstream = make_cache(negative_ttl=0.), resolver.LocalResolver(NAMES)
+    for _ in range(2):
+        resolver.resolve_names(['nowhere'], cache=cache, upstream=upstream)
+    assert upstream.n_queries == 2
+
+def test_preloaded_names_do_not_expire():
+    cache = make_cache(positive_ttl=0., preload={'P214+40':'14h12m00s +40d00m00s'})
+    result = resolver.resolve_names(['P214+40'], cache=cache,
+                                    upstream=unreachable_resolver)[0]
+    assert result == {'name':'P214+40', 'coord':'14h12m00s +40d00m00s', 'error':''}
+    # The default preload includes the calibrators, A-team, and LoTSS pointings
+    names = resolver.get_preloaded_names()
+    assert '3C196' in names and 'CasA' in names and len(names) > 100
+
+def test_unreachable_resolver():
+    cache = make_cache(positive_ttl=0.)
+    resolver.resolve_names(['M31'], cache=cache,
+                           upstream=resolver.LocalResolver(NAMES))
+    results = resolver.resolve_names(['M31', '3C196'], cache=cache,
+                                     upstream=unreachable_resolver)
+    # The expired entry is served, and the failure is not cached
+    assert results[0]['coord'] == NAMES['M31'] and results[0]['error'] == ''
+    assert results[1]['coord'] is None
+    assert results[1]['error'] == resolver.UNREACHABLE_MSG
+    assert cache.get('3C196', allow_expired=True) == (False, None)
+    upstream = resolver.LocalResolver(NAMES)
+    assert resolver.resolve_name('3C196', cache, upstream) == NAMES['3C196']
+
+def test_lookups_in_flight_are_shared():
+    cache, upstream = make_cache(), SlowResolver(NAMES)
+    first = resolver.submit_lookup('M31', cache, upstream)
+    second = resolver.submit_lookup('M31', cache, upstream)
+    assert first is second
+    # A list of names that is still being looked up times out
+    result = resolver.resolve_names(['M31'], timeout=0.01, cache=cache,
+                                    upstream=upstream)[0]
+    assert result['coord'] is None and result['error'] == resolver.TIMEOUT_MSG
+    upstream.release.set()
+    assert first.result(5.) == (NAMES['M31'], '')
+    assert upstream.n_queries == 1
+    result = resolver.resolve_names(['M31'], cache=cache, upstream=upstream)[0]
+    assert result['coord'] == NAMES['M31'] and upstream.n_queries == 1
+
+def test_names_are_looked_up_concurrently():
+    names = ['N{}'.format(i) for i in range(resolver.RESOLVE_WORKERS)]
+    upstream = BarrierResolver({name:'00h00m00s +00d00m00s' for name in names},
+                               len(names))
+    results = resolver.resolve_names(names, cache=make_cache(), upstream=upstream)
+    assert [item['error'] for item in results] == ['']*len(names)
+    assert upstream.n_queries == len(names)
+
+def test_concurrent_sessions_share_lookups():
+    cache, upstream = make_cache(), SlowResolver(NAMES)
+    results = []
+    sessions = [Thread(target=lambda: results.append(resolver.resolve_names(
+        ['M31', '3C196', 'nowhere'], cache=cache, upstream=upstream))) \
+                for _ in range(4)]
+    for session in sessions:
+        session.start()
+    upstream.release.set()
+    for session in sessions:
+        session.join()
+    assert len(results) == 4
+    for result in results:
+        assert [item['coord'] for item in result] == \
+               [NAMES['M31'], NAMES['3C196'], None]
+        assert result[2]['error'] == resolver.UNKNOWN_NAME_MSG
+    # One query per distinct name
+    assert upstream.n_queries == 3
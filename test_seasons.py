@@ -0,0 +1,73 @@
+"""Tests for the best observing dates finder in seasons.py"""
+
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from ephem import FixedBody, Moon, Sun, degrees, separation
+import elevation as el
+import seasons as se
+
+RA, DEC = np.array([123.4, 250., 10.]), np.array([48.2, -20., 85.])
+
+def test_season_matches_one_day_engine():
+    sites = ['NL', 'IE']
+    season = se.compute_season(RA, DEC, '2026-03-01', n_days=3, sites=sites)
+    assert season['dates'] == ['2026-03-01', '2026-03-02', '2026-03-03']
+    for name in se.SEASON_QUANTITIES:
+        assert season[name].shape == (3, 3)
+    step_hours = se.SEASON_STEP/timedelta(hours=1)
+    for day, date in enumerate(season['dates']):
+        start = datetime.strptime(date, '%Y-%m-%d')
+        times = [start + idx*se.SEASON_STEP for idx in range(int(24/step_hours))]
+        elevation = el.compute_target_elevation(RA, DEC, times, sites).min(axis=1)
+        above = elevation >= se.DEFAULT_ELEVATION_LIMIT
+        night = el.compute_body_elevation('Sun', times, sites).max(axis=0) < \
+                se.NIGHT_SUN_ELEVATION
+        # Targets are precessed once per day, which may move one sample
+        assert np.allclose(season['hours_up'][:, day], above.sum(axis=1)*step_hours,
+                           rtol=0., atol=step_hours)
+        assert np.allclose(season['night_hours'][:, day],
+                           (above & night).sum(axis=1)*step_hours,
+                           rtol=0., atol=step_hours)
+        assert abs(season['joint_night_hours'][day] - \
+                   (above.all(axis=0) & night).sum()*step_hours) <= step_hours
+
+def test_season_separations_match_ephem():
+    season = se.compute_season(RA, DEC, '2026-03-01', n_days=2)
+    for day, date in enumerate(season['dates']):
+        start = datetime.strptime(date, '%Y-%m-%d')
+        sun, moon = Sun(start + timedelta(hours=12)), Moon()
+        for idx in range(len(RA)):
+            target = FixedBody()
+            target._ra, target._dec = degrees(np.radians(RA[idx])), \
+                                      degrees(np.radians(DEC[idx]))
+            target.compute(start + timedelta(hours=12))
+            assert np.isclose(season['sun_separation'][idx, day],
+                              np.degrees(separation(target, sun)), atol=0.05)
+            moon_separation = []
+            for minutes in range(0, 24*60, 10):
+                time = start + timedelta(minutes=minutes)
+                moon.compute(time)
+                target.compute(time)
+                moon_separation.append(np.degrees(separation(target, moon)))
+            assert np.isclose(season['moon_separation'][idx, day],
+                              min(moon_separation), atol=0.05)
+
+def test_season_period_is_bounded():
+    for n_days in [0, se.MAX_N_DAYS+1]:
+        with pytest.raises(ValueError):
+            se.compute_season(RA, DEC, '2026-03-01', n_days=n_days)
+
+def test_best_dates_and_dict_round_trip():
+    season = se.compute_season(RA[:2], DEC[:2], '2026-01-01', n_days=60)
+    best = se.find_best_dates(season)
+    assert len(best) == se.N_BEST_DATES
+    scores = [score for _, score in best]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == season['joint_night_hours'].max()
+    names, restored = se.season_from_dict(se.season_to_dict(['A', 'B'], season))
+    assert names == ['A', 'B'] and restored['dates'] == season['dates']
+    for name in se.SEASON_QUANTITIES + ['joint_night_hours']:
+        assert np.array_equal(restored[name], season[name])
+    figure = se.make_season_figure(names, restored)
+    assert list(figure['data'][0].y) == ['A', 'B', 'All targets']
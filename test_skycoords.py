@@ -0,0 +1,68 @@
+"""Tests for the coordinate parsing and angular distances in skycoords.py"""
+
+import numpy as np
+import pytest
+from astropy.coordinates import SkyCoord
+import skycoords as sc
+
+COORD_STRINGS = ['08h13m36.033s +48d13m02.56s', '00h00m00s -00d30m00s',
+                 '23h59m59.999s -89d59m59.9s', '14h11m20.519s +52d12m09.97s',
+                 '123.4d +45.6d', '0.5d -10d', '359.99d +90d']
+
+def test_parse_matches_skycoord():
+    ra, dec = sc.parse_coord_strings(COORD_STRINGS)
+    for text, ra_deg, dec_deg in zip(COORD_STRINGS, ra, dec):
+        coord = SkyCoord(text)
+        assert ra_deg == coord.ra.deg and dec_deg == coord.dec.deg
+
+def test_parse_falls_back_to_skycoord():
+    strings = ['123.4deg 45.6deg', '08h13m36.033s +48d13m02.56s',
+               '10h70m00s +10d00m00s', '12h00m00s +91d00m00s']
+    ra, dec = sc.parse_coord_strings(strings)
+    # Other formats and out of range values are left to SkyCoord
+    assert np.isnan(ra[0]) and np.isnan(ra[2]) and np.isnan(ra[3])
+    assert not np.isnan(ra[1])
+    ra, dec = sc.get_radec(strings[:2])
+    coord = SkyCoord(strings[0])
+    assert ra[0] == coord.ra.deg and dec[0] == coord.dec.deg
+    for text in ['10h70m00s +10d00m00s', '12h00m00s +91d00m00s', 'nowhere']:
+        with pytest.raises(ValueError):
+            sc.get_radec([text])
+
+def test_parse_coord_is_cached():
+    sc.parse_coord.cache_clear()
+    assert sc.parse_coord(COORD_STRINGS[0]) == sc.parse_coord(COORD_STRINGS[0])
+    info = sc.get_cache_info()['coord']
+    assert info.hits == 1 and info.misses == 1
+
+def test_sky_coords():
+    coords = sc.get_sky_coords(COORD_STRINGS)
+    assert sc.get_sky_coords(list(COORD_STRINGS)) is coords
+    reference = SkyCoord(COORD_STRINGS)
+    assert np.all(coords.separation(reference).arcsec < 1e-6)
+    assert sc.get_sky_coord(COORD_STRINGS[1]).separation(reference[1]).arcsec < 1e-6
+
+def test_separation_matrix_matches_skycoord():
+    rng = np.random.default_rng(9)
+    ra = np.concatenate([rng.uniform(0., 360., 40), [359.9, 0.1, 180.]])
+    dec = np.concatenate([np.degrees(np.arcsin(rng.uniform(-1., 1., 40))),
+                          [10., 10., -90.]])
+    matrix = sc.get_separation_matrix(ra, dec)
+    coords = SkyCoord(ra, dec, unit='deg')
+    reference = coords[:, np.newaxis].separation(coords[np.newaxis, :]).deg
+    assert np.allclose(matrix, reference, rtol=0., atol=1e-9)
+    assert np.allclose(np.diag(matrix), 0.) and np.allclose(matrix, matrix.T)
+
+def test_beam_containment():
+    # Pointings on both sides of RA=0 have their centroid near RA=0
+    centroid, offsets, inside = sc.check_beam_containment(np.array([358., 2.]),
+                                                          np.array([0., 0.]), 5.)
+    assert min(centroid[0], 360. - centroid[0]) < 1e-9 and abs(centroid[1]) < 1e-9
+    assert np.allclose(offsets, 2.) and np.all(inside)
+    centroid, offsets, inside = sc.check_beam_containment(np.array([10., 30., 20.]),
+                                                          np.array([40., 40., 60.]),
+                                                          10.)
+    reference = SkyCoord([10., 30., 20.], [40., 40., 60.], unit='deg').separation(
+        SkyCoord(*centroid, unit='deg')).deg
+    assert np.allclose(offsets, reference, rtol=0., atol=1e-9)
+    assert list(inside) == list(reference <= 10.)
@@ -0,0 +1,44 @@
+"""Tests for the station table and station selection in stations.py"""
+
+import numpy as np
+import pytest
+import elevation as el
+import stations as st
+
+def test_station_table():
+    assert len(st.CORE_STATIONS) == 24
+    assert len(st.STATIONS) == len(st.CORE_STATIONS) + len(st.REMOTE_STATIONS) + \
+                               len(st.INTERNATIONAL_STATIONS)
+    for name, (lon, lat, _) in st.STATIONS.items():
+        assert -180. <= lon <= 180. and 0. <= lat <= 90., name
+        assert name in el.SITES
+
+def test_select_stations():
+    assert st.select_stations(2, 1, 1) == ('CS001', 'CS002', st.REMOTE_STATIONS[0],
+                                           st.INTERNATIONAL_STATIONS[0])
+    assert len(st.select_stations()) == \
+           len(st.CORE_STATIONS) + len(st.REMOTE_STATIONS)
+    assert st.select_stations('24', '0', '0') == tuple(st.CORE_STATIONS)
+    assert st.select_stations(0, 0, 0) == (st.CORE_STATIONS[0],)
+    for counts in [(25, 0, 0), (0, len(st.REMOTE_STATIONS)+1, 0), (-1, 0, 0),
+                   (0, 0, len(st.INTERNATIONAL_STATIONS)+1)]:
+        with pytest.raises(ValueError):
+            st.select_stations(*counts)
+
+def test_elevation_of_the_station_subset():
+    ra, dec = np.array([123.4, 250., 10., 300.]), np.array([48.2, -5., 85., 20.])
+    times = el.get_time_axis('2026-03-01')
+    stations = st.select_stations(24, 14, len(st.INTERNATIONAL_STATIONS))
+    common = el.compute_common_elevation(ra, dec, times, stations)
+    # Brute force over every station, one at a time
+    per_station = np.stack([el.compute_target_elevation(ra, dec, times,
+                                                        [name])[:, 0] \
+                            for name in stations], axis=1)
+    reference = el.combine_sites(per_station)
+    assert np.array_equal(np.isnan(common), np.isnan(reference))
+    up = ~np.isnan(common)
+    assert np.allclose(common[up], reference[up], rtol=0., atol=1e-9)
+    # More stations can only lower the common elevation
+    dutch = el.compute_common_elevation(ra, dec, times,
+                                        st.select_stations(24, 14, 0))
+    assert np.all(np.nan_to_num(common, nan=-1.) <= np.nan_to_num(dutch, nan=-1.))
@@ -0,0 +1,69 @@
+"""Tests for the trade-off cubes in sweep.py"""
+
+import numpy as np
+import pytest
+import backend as bk
+import sweep as sw
+
+def test_parse_axis_range():
+    assert sw.parse_axis_range('1,2,4') == [1., 2., 4.]
+    assert sw.parse_axis_range(' 3600:28800:3 ') == [3600., 16200., 28800.]
+    assert sw.parse_axis_range(8) == [8.]
+    for text in ['', '1:2', 'a,b', '1:2:0']:
+        with pytest.raises(ValueError):
+            sw.parse_axis_range(text)
+
+def test_parse_axis_range_is_bounded():
+    assert len(sw.parse_axis_range('1:2:{}'.format(sw.MAX_AXIS_POINTS))) == \
+           sw.MAX_AXIS_POINTS
+    with pytest.raises(ValueError):
+        sw.parse_axis_range('1:2:{}'.format(sw.MAX_AXIS_POINTS+1))
+    with pytest.raises(ValueError):
+        sw.parse_axis_range(','.join(['1']*(sw.MAX_AXIS_POINTS+1)))
+
+def test_sweep_cube_is_bounded():
+    axis = list(range(1, 31))
+    with pytest.raises(ValueError):
+        sw.make_sweep_cube(axis, axis, axis, 1, 1)
+
+def test_sweep_cube_matches_backend():
+    cube = sw.make_sweep_cube([3600., 28800.], [61, 244], [1., 2.], [1, 4], [1, 8],
+                              n_core=24, n_remote=14, n_int=0, hba_mode='hbadual',
+                              cal_t=600., n_cal=1, n_beams=2, ateam_names=['CasA'])
+    assert cube['dims'] == sw.SWEEP_AXES
+    n_baselines = bk.compute_baselines(24, 14, 0, 'hbadual')
+    for idx in np.ndindex(2, 2, 2, 2, 2):
+        obs_t, n_sb, integ_t, t_avg, f_avg = \
+            [cube['coords'][name][i] for name, i in zip(sw.SWEEP_AXES, idx)]
+        n_sb, t_avg, f_avg = int(n_sb), int(t_avg), int(f_avg)
+        assert '{:0.2f}'.format(cube['im_noise'][idx]) == \
+               bk.calculate_im_noise(24, 14, 0, 'hbadual', obs_t, n_sb)
+        assert '{:0.2f}'.format(cube['raw_size'][idx]) == \
+               bk.calculate_raw_size(obs_t, 600., 1, integ_t, n_baselines, 64,
+                                     n_sb, 2)
+        assert '{:0.2f}'.format(cube['proc_size'][idx]) == \
+               bk.calculate_proc_size(obs_t, 600., 1, integ_t, n_baselines, 64,
+                                      n_sb, 2, 'preprocessing', t_avg, f_avg,
+                                      'enable')
+        assert np.isclose(cube['pipe_time'][idx],
+                          bk.calculate_pipe_time(obs_t, 600., 1, n_sb, 2, 'hbadual',
+                                                 ['CasA'], 'preprocessing'))
+
+def test_sweep_cube_without_pipeline():
+    cube = sw.make_sweep_cube([3600., 28800.], 244, 1., 1, 1, pipe_type='none')
+    for name in sw.PIPELINE_QUANTITIES:
+        assert name not in cube
+    data = sw.sweep_cube_to_dict(cube)
+    assert sorted(sw.sweep_cube_from_dict(data)) == sorted(cube)
+
+def test_sweep_cube_dict_and_slice():
+    cube = sw.make_sweep_cube([3600., 7200., 28800.], [61, 244], 1., 1,
+                              [1, 2, 4, 8])
+    restored = sw.sweep_cube_from_dict(sw.sweep_cube_to_dict(cube))
+    for name in sw.SWEEP_QUANTITIES:
+        assert np.array_equal(restored[name], cube[name])
+    xaxis, yaxis, values = sw.slice_sweep_cube(restored, 'raw_size', 'obs_t',
+                                               'f_avg', {'n_sb':1})
+    assert xaxis == [3600., 7200., 28800.] and yaxis == [1., 2., 4., 8.]
+    assert values.shape == (4, 3)
+    assert values[2, 1] == cube['raw_size'][1, 1, 0, 0, 2]
@@ -0,0 +1,52 @@
+"""Tests for the visibility plots and distance table in targetvis.py"""
+
+from datetime import datetime, timedelta
+import numpy as np
+from astropy.coordinates import SkyCoord
+from astropy import units as u
+import elevation as el
+import resolver
+import targetvis as tv
+
+OBS_DATE = '2026-03-01'
+COORDS = ['08h13m36.033s +48d13m02.56s', '23h50m00s +60d00m00s',
+          '12h30m49s +12d23m28s']
+
+def get_reference_distances(coord, obs_date):
+    """Compute the distance table of one target with SkyCoord and ephem"""
+    target = SkyCoord(coord)
+    distances = {name:target.separation(SkyCoord(value)).deg \
+                 for name, value in tv.ATEAM_COORDINATES.items()}
+    start = datetime.strptime(obs_date, '%Y-%m-%d')
+    times = [start + timedelta(hours=hour) for hour in range(24)]
+    for name, body_class in el.SOLAR_BODIES.items():
+        body = body_class()
+        ra, dec = [], []
+        for time in times:
+            body.compute(time)
+            ra.append(float(body.g_ra))
+            dec.append(float(body.g_dec))
+        angsep = SkyCoord(ra, dec, unit=u.rad).separation(target).deg
+        distances[name] = (angsep.min(), angsep.max()) if name == 'Moon' else \
+                          angsep.mean()
+    return distances
+
+def test_target_distances_match_skycoord():
+    distances = tv.compute_target_distances(COORDS, OBS_DATE)
+    assert len(distances) == len(COORDS)
+    for coord, result in zip(COORDS, distances):
+        reference = get_reference_distances(coord, OBS_DATE)
+        assert sorted(result) == sorted(reference)
+        for name, value in reference.items():
+            assert np.allclose(result[name], value, rtol=0., atol=1e-4)
+
+def test_resolve_source_reports_each_name():
+    coords, failed = tv.resolve_source('3C196, CasA')
+    assert coords == ','.join([tv.CALIB_COORDINATES['3C196'],
+                               tv.ATEAM_COORDINATES['CasA']])
+    assert failed == []
+    coords, failed = tv.resolve_source('3C196,not a source')
+    assert coords is None
+    assert failed == [{'name':'not a source', 'coord':None,
+                       'error':resolver.UNKNOWN_NAME_MSG}]
+    assert tv.resolve_source(None) == (None, [])